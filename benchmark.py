@@ -0,0 +1,455 @@
+"""Benchmark das principais rotas da biblioteca.
+
+Cria um banco SQLite temporário com dados sintéticos, exercita as rotas reais
+pelo test client do Flask e por um servidor WSGI com várias threads, e mostra
+vazão, latência (p50/p95/p99) e quantidade de consultas SQL por rota. Também
+mede a partida a frio (processo novo importando o app, como um worker do
+gunicorn sem --preload) e confere que ela não toca no banco, a compilação dos
+templates com e sem o cache de bytecode, e o tempo até o primeiro byte e o pico
+de memória de uma tabela grande enviada em fluxo.
+
+    python benchmark.py --livros 20000 --usuarios 2000 --salvar base.json
+    python benchmark.py --comparar base.json     # sai com código 1 se houve regressão
+"""
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import CookieJar
+from itertools import count
+import argparse
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+SENHA = 'senha-benchmark'
+
+
+def argumentos():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--usuarios', type=int, default=1000, help='alunos cadastrados')
+    parser.add_argument('--livros', type=int, default=20000, help='livros no catálogo')
+    parser.add_argument('--reservas', type=int, default=2000, help='reservas pendentes')
+    parser.add_argument('--requisicoes', type=int, default=200, help='requisições por rota')
+    parser.add_argument('--threads', type=int, default=8, help='clientes simultâneos no servidor WSGI')
+    parser.add_argument('--modo', choices=['cliente', 'servidor', 'ambos'], default='ambos')
+    parser.add_argument('--partidas', type=int, default=10, help='partidas a frio medidas (0 para pular)')
+    parser.add_argument('--tabela', type=int, default=50000, help='linhas da tabela grande em fluxo (0 para pular)')
+    parser.add_argument('--salvar', help='grava o resultado como linha de base (JSON)')
+    parser.add_argument('--comparar', help='compara com uma linha de base gravada antes')
+    parser.add_argument('--tolerancia', type=float, default=0.20,
+                        help='piora aceita em p95/vazão antes de acusar regressão (padrão 20%%)')
+    parser.add_argument('--semente', type=int, default=42)
+    return parser.parse_args()
+
+
+# DADOS SINTÉTICOS #
+
+def popular_banco(app, usuarios, livros, reservas, semente):
+    """Cria o esquema e grava os dados em lote (executemany), direto nas tabelas."""
+    from werkzeug.security import generate_password_hash
+    from biblioteca import modelos
+    from biblioteca.extensoes import db
+
+    aleatorio = random.Random(semente)
+    with app.app_context():
+        modelos.criar_esquema()
+        hash_senha = generate_password_hash(SENHA, method=app.config['SENHA_METODO'])
+        db.session.execute(db.insert(modelos.Usuario.__table__), [
+            dict(id=i, nome=f'Aluno {i}', email=f'aluno{i}@aluno-faeterj.com', cpf='00000000000',
+                 senha=hash_senha, tipo_usuario='aluno', status=False)
+            for i in range(1, usuarios + 1)
+        ])
+        db.session.execute(db.insert(modelos.Aluno.__table__), [
+            dict(id=i, matricula=f'{20240000 + i}', curso=aleatorio.choice(['ADS', 'SI', 'CC']))
+            for i in range(1, usuarios + 1)
+        ])
+        db.session.execute(db.insert(modelos.Usuario.__table__), [
+            dict(id=usuarios + 1, nome='Bibliotecário', email='lib@lib-faeterj.com', cpf='0',
+                 senha=hash_senha, tipo_usuario='bibliotecario', status=False)
+        ])
+        db.session.execute(db.insert(modelos.Livro.__table__), [
+            dict(id=i, autor=f'Autor {i % 997}', titulo=f'Título {i}', isbn=9780000000000 + i,
+                 editora=f'Editora {i % 53}', assunto=f'Assunto {i % 31}', edicao='1',
+                 disponivel=True, reservado=i <= reservas, exemplares_disponiveis=int(i > reservas))
+            for i in range(1, livros + 1)
+        ])
+        # Um exemplar por título, com o mesmo id do livro
+        db.session.execute(db.insert(modelos.Exemplar.__table__), [
+            dict(id=i, livro_id=i, disponivel=True, reservado=i <= reservas)
+            for i in range(1, livros + 1)
+        ])
+        if reservas:
+            db.session.execute(db.insert(modelos.Reserva.__table__), [
+                dict(livro_id=i, exemplar_id=i, usuario_id=aleatorio.randint(1, usuarios), status='pendente')
+                for i in range(1, reservas + 1)
+            ])
+        db.session.commit()
+
+
+# CENÁRIOS #
+
+def cenarios(usuarios, livros, reservas):
+    """Cada cenário: (nome, método, função que gera a URL, dados do formulário ou None)."""
+    livros_livres = count(reservas + 1)
+    alvos_bloqueio = count(1)
+    return [
+        ('entrar', 'POST', lambda: '/entrar',
+         lambda: {'email': f'aluno{random.randint(1, usuarios)}@aluno-faeterj.com', 'senha': SENHA}),
+        ('painel-principal', 'GET', lambda: '/painel-principal', None),
+        ('painel-principal (página)', 'GET',
+         lambda: f'/painel-principal?apos={random.randint(1, max(livros - 100, 1))}', None),
+        ('solicitar-reserva', 'POST', lambda: f'/solicitar-reserva/{next(livros_livres)}', lambda: {}),
+        ('lib-solicitacoes', 'GET', lambda: '/lib/solicitacoes', None),
+        ('bloquear-usuario', 'POST', lambda: f'/bloquear-usuario/{next(alvos_bloqueio) % usuarios + 1}', lambda: {}),
+        ('desbloquear-usuario', 'POST', lambda: f'/desbloquear-usuario/{next(alvos_bloqueio) % usuarios + 1}',
+         lambda: {}),
+    ]
+
+
+# MEDIÇÃO #
+
+def medir_partida(pasta, partidas):
+    """Processos novos importando o app; o banco apontado não pode ser criado nem aberto."""
+    banco = os.path.join(pasta, 'partida.db')
+    codigo = ('import time; inicio = time.perf_counter(); import app; '
+              'print(time.perf_counter() - inicio)')
+    ambiente = dict(os.environ, DATABASE_URL=f'sqlite:///{banco}')
+    latencias, erros = [], 0
+    inicio = time.perf_counter()
+    for _ in range(partidas):
+        processo = subprocess.run([sys.executable, '-c', codigo], env=ambiente, capture_output=True, text=True,
+                                  cwd=os.path.dirname(os.path.abspath(__file__)))
+        if processo.returncode:
+            print(processo.stderr, file=sys.stderr)
+            erros += 1
+            continue
+        latencias.append(float(processo.stdout.split()[-1]))
+    # Uma conexão SQLite criaria o arquivo: partida com DDL ou consulta é erro
+    erros += os.path.exists(banco)
+    resultado = {'importar app': resumo(latencias, time.perf_counter() - inicio, 0, erros)}
+
+    # Compilação de todos os templates num processo novo, sem e com o bytecode em disco
+    codigo = ('import time; import app; ambiente = app.app.jinja_env; inicio = time.perf_counter(); '
+              '[ambiente.get_template(nome) for nome in ambiente.list_templates()]; '
+              'print(time.perf_counter() - inicio)')
+    for nome, extras in (('templates sem cache', {'JINJA_CACHE': '0'}),
+                         ('templates com cache', {'JINJA_CACHE_PASTA': os.path.join(pasta, 'jinja')})):
+        latencias, erros = [], 0
+        inicio = time.perf_counter()
+        for numero in range(partidas + 1):
+            processo = subprocess.run([sys.executable, '-c', codigo], env=dict(ambiente, **extras),
+                                      capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+            if processo.returncode:
+                print(processo.stderr, file=sys.stderr)
+                erros += 1
+            elif numero:  # A primeira rodada só preenche o cache
+                latencias.append(float(processo.stdout.split()[-1]))
+        resultado[nome] = resumo(latencias, time.perf_counter() - inicio, 0, erros)
+    return resultado
+
+
+def medir_tabela_grande(pasta, linhas, semente, repeticoes=3):
+    """Tempo até o primeiro byte, tempo total e pico de memória de /painel-lib com `linhas` livros numa página.
+
+    Compara a resposta em fluxo (stream_template + yield_per) com a página
+    montada inteira antes do envio (lista + render_template).
+    """
+    import tracemalloc
+    from flask import render_template
+    from biblioteca import create_app
+    from biblioteca.consultas import paginar_por_chave
+    from biblioteca.extensoes import db
+    from biblioteca.modelos import Livro
+
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.join(pasta, "tabela.db")}',
+        'TAREFAS_NO_PROCESSO': False,
+        'LIVROS_POR_PAGINA_MAX': linhas,
+    })
+    popular_banco(app, 1, linhas, 0, semente)
+    url = f'/painel-lib?por_pagina={linhas}'
+    cliente = app.test_client()
+
+    def em_fluxo():
+        inicio = time.perf_counter()
+        resposta = cliente.get(url, buffered=False)
+        corpo = iter(resposta.response)
+        next(corpo)
+        primeiro_byte = time.perf_counter() - inicio
+        for _ in corpo:
+            pass
+        resposta.close()
+        return primeiro_byte, time.perf_counter() - inicio
+
+    def inteira():
+        inicio = time.perf_counter()
+        with app.test_request_context(url):
+            pagina = paginar_por_chave(Livro.query, Livro.id)
+            render_template('painel-lib.html', livros=pagina.itens, pagina=pagina)
+        duracao = time.perf_counter() - inicio
+        return duracao, duracao  # Nada é enviado antes da página inteira
+
+    resultado = {}
+    for nome, medir in (('em fluxo', em_fluxo), ('inteira', inteira)):
+        medir()  # Aquecimento (templates compilados, páginas do banco no cache)
+        tempos = sorted(medir() for _ in range(repeticoes))
+        tracemalloc.start()
+        medir()
+        pico = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        mediana = tempos[len(tempos) // 2]
+        resultado[nome] = {'primeiro_byte_ms': mediana[0] * 1000, 'total_ms': mediana[1] * 1000,
+                           'pico_mb': pico / 2 ** 20}
+    with app.app_context():
+        db.engine.dispose()
+    return resultado
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, max(0, round(p / 100 * len(ordenados)) - 1))
+    return ordenados[indice]
+
+
+def resumo(latencias, duracao, consultas, erros):
+    return {
+        'requisicoes': len(latencias),
+        'erros': erros,
+        'vazao': len(latencias) / duracao if duracao else 0.0,
+        'p50_ms': percentil(latencias, 50) * 1000,
+        'p95_ms': percentil(latencias, 95) * 1000,
+        'p99_ms': percentil(latencias, 99) * 1000,
+        'consultas': consultas,
+    }
+
+
+class ContadorDeConsultas:
+    """Conta os comandos SQL de cada requisição e agrupa pela rota do benchmark.
+
+    A rota vem no cabeçalho X-Benchmark-Rota; o contador é por thread porque o
+    servidor atende cada requisição em uma thread própria.
+    """
+
+    def __init__(self, app, engine):
+        from sqlalchemy import event
+        self.local = threading.local()
+        self.por_rota = {}
+        event.listen(engine, 'before_cursor_execute', self._contar)
+        app.before_request(self._zerar)
+        app.after_request(self._registrar)
+
+    def _contar(self, *args):
+        self.local.total = getattr(self.local, 'total', 0) + 1
+
+    def _zerar(self):
+        self.local.total = 0
+
+    def _registrar(self, resposta):
+        from flask import request
+        rota = request.headers.get('X-Benchmark-Rota')
+        if rota:
+            self.por_rota.setdefault(rota, []).append(getattr(self.local, 'total', 0))
+        return resposta
+
+    def consultas(self, rota):
+        """A quantidade mais frequente de consultas da rota (ignora os primeiros acessos ao cache)."""
+        valores = self.por_rota.pop(rota, None) or [0]
+        return max(set(valores), key=valores.count)
+
+
+def medir_com_cliente(app, contador, lista_de_cenarios, requisicoes):
+    """Uma requisição por vez, dentro do processo: mede o custo da rota sem rede."""
+    resultados = {}
+    cliente = app.test_client()
+    cliente.post('/entrar', data={'email': 'aluno1@aluno-faeterj.com', 'senha': SENHA})
+    for nome, metodo, url, dados in lista_de_cenarios:
+        latencias, erros = [], 0
+        inicio = time.perf_counter()
+        for _ in range(requisicoes):
+            t = time.perf_counter()
+            resposta = cliente.open(url(), method=metodo, data=dados() if dados else None,
+                                    headers={'X-Benchmark-Rota': nome})
+            latencias.append(time.perf_counter() - t)
+            erros += resposta.status_code >= 400
+        resultados[nome] = resumo(latencias, time.perf_counter() - inicio, contador.consultas(nome), erros)
+    return resultados
+
+
+def medir_com_servidor(app, contador, lista_de_cenarios, requisicoes, threads):
+    """Vários clientes HTTP simultâneos contra um servidor WSGI com threads."""
+    from werkzeug.serving import make_server
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)  # Sem uma linha de log por requisição
+    servidor = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{servidor.server_port}'
+
+    class SemRedirecionar(urllib.request.HTTPRedirectHandler):
+        def redirect_request(self, *args, **kwargs):
+            return None
+
+    def novo_cliente():
+        abridor = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()), SemRedirecionar())
+        dados = urllib.parse.urlencode({'email': 'aluno1@aluno-faeterj.com', 'senha': SENHA}).encode()
+        try:
+            abridor.open(base + '/entrar', dados)
+        except urllib.error.HTTPError:
+            pass  # 302 após o login
+        return abridor
+
+    clientes = [novo_cliente() for _ in range(threads)]
+    resultados = {}
+    try:
+        for nome, metodo, url, dados in lista_de_cenarios:
+            fila = iter(range(requisicoes))
+            trava = threading.Lock()
+
+            def trabalhador(abridor):
+                latencias, erros = [], 0
+                while True:
+                    with trava:
+                        if next(fila, None) is None:
+                            return latencias, erros
+                        caminho = url()
+                        corpo = urllib.parse.urlencode(dados()).encode() if dados else None
+                    pedido = urllib.request.Request(base + caminho, data=corpo, method=metodo,
+                                                    headers={'X-Benchmark-Rota': nome})
+                    t = time.perf_counter()
+                    try:
+                        with abridor.open(pedido) as resposta:
+                            resposta.read()
+                    except urllib.error.HTTPError as erro:
+                        erros += erro.code >= 400
+                    latencias.append(time.perf_counter() - t)
+
+            inicio = time.perf_counter()
+            with ThreadPoolExecutor(threads) as executor:
+                partes = list(executor.map(trabalhador, clientes))
+            duracao = time.perf_counter() - inicio
+            latencias = [l for parte, _ in partes for l in parte]
+            resultados[nome] = resumo(latencias, duracao, contador.consultas(nome), sum(e for _, e in partes))
+    finally:
+        servidor.shutdown()
+    return resultados
+
+
+# RELATÓRIO #
+
+def imprimir(titulo, resultados):
+    print(f'\n{titulo}')
+    print(f'{"rota":<28}{"req/s":>9}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"SQL":>6}{"erros":>7}')
+    for nome, r in resultados.items():
+        print(f'{nome:<28}{r["vazao"]:>9.1f}{r["p50_ms"]:>9.2f}{r["p95_ms"]:>9.2f}'
+              f'{r["p99_ms"]:>9.2f}{r["consultas"]:>6}{r["erros"]:>7}')
+
+
+def imprimir_tabela(titulo, resultados):
+    print(f'\n{titulo}')
+    print(f'{"resposta":<28}{"1º byte ms":>12}{"total ms":>12}{"pico MB":>10}')
+    for nome, r in resultados.items():
+        print(f'{nome:<28}{r["primeiro_byte_ms"]:>12.1f}{r["total_ms"]:>12.1f}{r["pico_mb"]:>10.1f}')
+
+
+def comparar(atual, base, tolerancia):
+    """Lista as rotas que pioraram além da tolerância em relação à linha de base."""
+    regressoes = []
+    for nome, r in atual.get('tabela', {}).items():
+        anterior = base.get('tabela', {}).get(nome)
+        if not anterior:
+            continue
+        for medida in ('primeiro_byte_ms', 'pico_mb'):
+            if r[medida] > anterior[medida] * (1 + tolerancia):
+                regressoes.append(f'tabela/{nome}: {medida} {anterior[medida]:.1f} -> {r[medida]:.1f}')
+    for modo, rotas in atual.items():
+        if modo == 'tabela':
+            continue
+        for nome, r in rotas.items():
+            anterior = base.get(modo, {}).get(nome)
+            if not anterior:
+                continue
+            if r['p95_ms'] > anterior['p95_ms'] * (1 + tolerancia):
+                regressoes.append(f'{modo}/{nome}: p95 {anterior["p95_ms"]:.2f} -> {r["p95_ms"]:.2f} ms')
+            if r['vazao'] < anterior['vazao'] * (1 - tolerancia):
+                regressoes.append(f'{modo}/{nome}: vazão {anterior["vazao"]:.1f} -> {r["vazao"]:.1f} req/s')
+            if r['consultas'] > anterior['consultas']:
+                regressoes.append(f'{modo}/{nome}: consultas {anterior["consultas"]} -> {r["consultas"]}')
+    return regressoes
+
+
+def main():
+    args = argumentos()
+    random.seed(args.semente)
+
+    with tempfile.TemporaryDirectory() as pasta:
+        from biblioteca import create_app
+        from biblioteca.extensoes import db
+
+        resultado = {}
+        if args.partidas:
+            resultado['partida'] = medir_partida(pasta, args.partidas)
+            imprimir(f'partida a frio ({args.partidas} processos; req/s = partidas por segundo)',
+                     resultado['partida'])
+        if args.tabela:
+            print(f'\npopulando a tabela grande: {args.tabela} livros...')
+            resultado['tabela'] = medir_tabela_grande(pasta, args.tabela, args.semente)
+            imprimir_tabela(f'/painel-lib com {args.tabela} linhas numa página', resultado['tabela'])
+
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.join(pasta, "benchmark.db")}',
+            # Sem a thread de tarefas: só o trabalho das requisições entra na medição
+            'TAREFAS_NO_PROCESSO': False,
+            # Todos os logins do benchmark vêm do mesmo IP
+            'LOGIN_LIMITE_IP': 1000000000,
+            # Os clientes simultâneos esperam a vaga de hash: mede a vazão do login, não os 503
+            'SENHA_HASH_ESPERA': 60,
+        })
+
+        print(f'populando: {args.usuarios} alunos, {args.livros} livros, {args.reservas} reservas...')
+        popular_banco(app, args.usuarios, args.livros, args.reservas, args.semente)
+        with app.app_context():
+            contador = ContadorDeConsultas(app, db.engine)
+
+        total_reservas = args.reservas
+        if args.modo in ('cliente', 'ambos'):
+            resultado['cliente'] = medir_com_cliente(
+                app, contador, cenarios(args.usuarios, args.livros, total_reservas), args.requisicoes)
+            imprimir('test client (uma requisição por vez)', resultado['cliente'])
+            total_reservas += args.requisicoes
+        if args.modo in ('servidor', 'ambos'):
+            resultado['servidor'] = medir_com_servidor(
+                app, contador, cenarios(args.usuarios, args.livros, total_reservas),
+                args.requisicoes, args.threads)
+            imprimir(f'servidor WSGI ({args.threads} clientes simultâneos)', resultado['servidor'])
+
+        app.extensions['historico'].parar()
+        with app.app_context():
+            db.engine.dispose()
+
+    if args.salvar:
+        with open(args.salvar, 'w', encoding='utf-8') as arquivo:
+            json.dump({'parametros': vars(args), **resultado}, arquivo, indent=2)
+        print(f'\nlinha de base gravada em {args.salvar}')
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arquivo:
+            base = json.load(arquivo)
+        regressoes = comparar(resultado, base, args.tolerancia)
+        if regressoes:
+            print('\nREGRESSÕES:')
+            for linha in regressoes:
+                print('  ' + linha)
+            sys.exit(1)
+        print('\nsem regressões em relação à linha de base')
+
+
+if __name__ == '__main__':
+    main()
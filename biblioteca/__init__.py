@@ -0,0 +1,126 @@
+"""Sistema de biblioteca da FAETERJ.
+
+`create_app` monta um app novo a cada chamada: lê a configuração, liga as
+extensões e registra os blueprints. Nada aqui abre conexão com o banco nem
+executa DDL; o esquema é criado por `flask init-db` (banco novo) ou
+`flask db upgrade` (migrações), então cada worker do gunicorn sobe sem tocar
+no banco.
+"""
+import atexit
+import os
+import threading
+import weakref
+
+from flask import Flask
+from jinja2 import FileSystemBytecodeCache
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from . import rotinas  # noqa: F401  Registra as funções de cada tipo de tarefa
+from .ativos import asset_url, bp as ativos, carregar_manifest
+from .cache import criar_cache
+from .comandos import bp as comandos
+from .config import Configuracao, opcoes_do_engine
+from .eventos import criar_barramento
+from .extensoes import configurar_sqlite, db, migrate
+from .historico import GravadorDeHistorico
+from .limitador import criar_limitador
+from .metricas import Metricas
+from .modelos import Tarefa
+from .rotas import BLUEPRINTS
+from .tarefas import ExecutorDeTarefas
+
+# Threads dos apps deste processo (tarefas, histórico), encerradas uma única vez na saída.
+# Referências fracas: um app descartado (testes, auditoria) não fica preso aqui.
+_ao_encerrar = weakref.WeakSet()
+
+
+@atexit.register
+def encerrar_threads():
+    for servico in list(_ao_encerrar):
+        servico.parar(5)
+
+
+def create_app(config=None):
+    """Cria o app. `config`: dicionário ou objeto com valores que substituem os de Configuracao."""
+    # Telas, arquivos estáticos e instance/ continuam na raiz do projeto
+    app = Flask(__name__, template_folder='../templates', static_folder='../static')
+    app.config.from_object(Configuracao)
+    if isinstance(config, dict):
+        app.config.update(config)
+    elif config is not None:
+        app.config.from_object(config)
+    app.secret_key = app.config['SECRET_KEY']
+    # Atrás do nginx, request.remote_addr (limite de login por IP) seria o do proxy
+    if app.config['PROXY_SALTOS']:
+        saltos = app.config['PROXY_SALTOS']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=saltos, x_proto=saltos, x_host=saltos)
+    if 'SQLALCHEMY_ENGINE_OPTIONS' not in app.config:
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = opcoes_do_engine(app.config['SQLALCHEMY_DATABASE_URI'])
+
+    db.init_app(app)
+    migrate.init_app(app, db)
+    with app.app_context():
+        configurar_sqlite(db.engine, app.config)
+
+    # Cache do catálogo e limites de login (locais ou compartilhados via Redis)
+    app.extensions['cache'] = criar_cache(app.config['CACHE_URL'], app.config['CACHE_MAX_ITENS'],
+                                          app.config['CACHE_TTL'])
+    app.extensions['limite_por_ip'] = criar_limitador(
+        app.config['LIMITE_URL'], limite=app.config['LOGIN_LIMITE_IP'], janela=app.config['LOGIN_JANELA_IP'],
+        bloqueio=app.config['LOGIN_BLOQUEIO_IP'], max_chaves=app.config['LIMITE_MAX_CHAVES'],
+        prefixo='biblioteca:login-ip:',
+    )
+    app.extensions['limite_por_email'] = criar_limitador(
+        app.config['LIMITE_URL'], limite=app.config['LOGIN_LIMITE_EMAIL'], janela=app.config['LOGIN_JANELA_EMAIL'],
+        bloqueio=app.config['LOGIN_BLOQUEIO_EMAIL'], max_chaves=app.config['LIMITE_MAX_CHAVES'],
+        prefixo='biblioteca:login-email:',
+    )
+    # Barramento das atualizações ao vivo (rota /eventos)
+    app.extensions['eventos'] = criar_barramento(app.config['EVENTOS_URL'], max_fila=app.config['EVENTOS_MAX_FILA'],
+                                                 max_conexoes=app.config['EVENTOS_MAX_CONEXOES'])
+    # Histórico das reservas, gravado em lotes por uma thread; a fila é gravada ao encerrar o processo
+    app.extensions['historico'] = GravadorDeHistorico(app, max_fila=app.config['HISTORICO_MAX_FILA'],
+                                                      lote=app.config['HISTORICO_LOTE'],
+                                                      intervalo=app.config['HISTORICO_INTERVALO'])
+    _ao_encerrar.add(app.extensions['historico'])
+    # Limita os hashes de senha simultâneos (ver senhas.vaga_de_hash)
+    app.extensions['vagas_de_hash'] = threading.BoundedSemaphore(app.config['SENHA_HASH_CONCORRENCIA'])
+
+    # Instrumentação das requisições e consultas
+    metricas = Metricas(
+        consulta_lenta=app.config['METRICAS_CONSULTA_LENTA_MS'] / 1000,
+        limite_n_mais_um=app.config['METRICAS_LIMITE_N_MAIS_UM'],
+        server_timing=app.config['METRICAS_SERVER_TIMING'],
+    )
+    with app.app_context():
+        metricas.instalar(app, db.engine)
+    app.extensions['metricas'] = metricas
+
+    # Tarefas em segundo plano (expiração de reservas, e-mails, manutenção): um executor por app
+    tarefas = ExecutorDeTarefas(app, db, Tarefa)
+    tarefas.periodica('expirar-reservas', app.config['EXPIRACAO_INTERVALO'])
+    tarefas.periodica('atualizar-estatisticas', app.config['ESTATISTICAS_INTERVALO'])
+    tarefas.periodica('manutencao-do-banco', app.config['MANUTENCAO_INTERVALO'])
+    app.extensions['tarefas'] = tarefas
+    _ao_encerrar.add(tarefas)
+
+    @app.before_request
+    def iniciarTarefas():
+        # A thread só sobe em processos que atendem requisições (não em `flask db ...`)
+        if app.config['TAREFAS_NO_PROCESSO']:
+            tarefas.iniciar()
+
+    # Bytecode dos templates em disco: workers novos não recompilam (antes do primeiro uso de jinja_env)
+    if app.config['JINJA_CACHE']:
+        pasta = app.config['JINJA_CACHE_PASTA'] or os.path.join(app.instance_path, 'jinja')
+        os.makedirs(pasta, exist_ok=True)
+        app.jinja_options = {**app.jinja_options, 'bytecode_cache': FileSystemBytecodeCache(pasta)}
+
+    # CSS/JS com hash no nome (flask construir-ativos); as telas usam asset_url(...)
+    carregar_manifest(app)
+    app.jinja_env.globals['asset_url'] = asset_url
+
+    for blueprint in BLUEPRINTS + (ativos, comandos):
+        app.register_blueprint(blueprint)
+    return app
+
@@ -0,0 +1,125 @@
+"""Arquivos estáticos com impressão digital (fingerprint), comprimidos e com cache longo.
+
+`flask construir-ativos` gera em static/dist/, para cada CSS/JS de static/:
+a versão minificada (CSS) com o hash do conteúdo no nome, as cópias .gz e .br
+(brotli é opcional) e o manifest.json que liga o nome original ao gerado. As
+telas usam `asset_url('painel-principal.css')`; como o nome muda quando o
+conteúdo muda, a resposta pode ser `immutable` por um ano e o navegador não
+revalida mais nada.
+
+Sem manifest (ambiente de desenvolvimento, antes do build) `asset_url` aponta
+para o arquivo original em /static, servido como sempre.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+
+from flask import Blueprint, abort, current_app, request, send_from_directory, url_for
+
+EXTENSOES = ('.css', '.js')
+PASTA_DO_BUILD = 'dist'
+ANO = 365 * 24 * 3600
+
+bp = Blueprint('ativos', __name__)
+
+############################################################################################################################
+
+# BUILD
+
+def minificar_css(texto):
+    """Remove comentários e espaços supérfluos (as folhas de estilo do projeto não têm strings com esses caracteres)."""
+    texto = re.sub(r'/\*.*?\*/', '', texto, flags=re.S)
+    texto = re.sub(r'\s+', ' ', texto)
+    texto = re.sub(r'\s*([{}:;,>])\s*', r'\1', texto)
+    return texto.replace(';}', '}').strip()
+
+def construir_ativos(origem, destino=None):
+    """Gera os arquivos de static/dist e o manifest; devolve o manifest.
+
+    Builds anteriores não são apagados: páginas em cache ainda podem apontar
+    para eles, e o nome com hash nunca é reaproveitado para outro conteúdo.
+    """
+    try:
+        import brotli  # Dependência opcional: sem ela só são gerados os .gz
+    except ImportError:
+        brotli = None
+
+    destino = destino or os.path.join(origem, PASTA_DO_BUILD)
+    os.makedirs(destino, exist_ok=True)
+    manifest = {}
+    for nome in sorted(os.listdir(origem)):
+        raiz, extensao = os.path.splitext(nome)
+        if extensao not in EXTENSOES:
+            continue
+        with open(os.path.join(origem, nome), encoding='utf-8') as arquivo:
+            texto = arquivo.read()
+        if extensao == '.css':
+            texto = minificar_css(texto)
+        conteudo = texto.encode('utf-8')
+        gerado = '%s.%s%s' % (raiz, hashlib.sha256(conteudo).hexdigest()[:12], extensao)
+
+        versoes = {gerado: conteudo, gerado + '.gz': gzip.compress(conteudo, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            versoes[gerado + '.br'] = brotli.compress(conteudo, quality=11)
+        for caminho, dados in versoes.items():
+            with open(os.path.join(destino, caminho), 'wb') as arquivo:
+                arquivo.write(dados)
+        manifest[nome] = {
+            'arquivo': gerado,
+            'codificacoes': [c for c, sufixo in (('br', '.br'), ('gzip', '.gz')) if gerado + sufixo in versoes],
+        }
+
+    # Escrito por último (e trocado de uma vez): o manifest nunca aponta para arquivos que ainda não existem
+    temporario = os.path.join(destino, 'manifest.json.tmp')
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump(manifest, arquivo, indent=2, sort_keys=True)
+    os.replace(temporario, os.path.join(destino, 'manifest.json'))
+    return manifest
+
+############################################################################################################################
+
+# URLS E ENTREGA
+
+def carregar_manifest(app):
+    """Lê static/dist/manifest.json uma vez por processo (vazio se o build não foi feito)."""
+    caminho = os.path.join(app.static_folder, PASTA_DO_BUILD, 'manifest.json')
+    try:
+        with open(caminho, encoding='utf-8') as arquivo:
+            manifest = json.load(arquivo)
+    except FileNotFoundError:
+        manifest = {}
+    app.extensions['ativos'] = {
+        'manifest': manifest,
+        # arquivo gerado -> codificações disponíveis; só esses nomes são servidos
+        'arquivos': {item['arquivo']: item['codificacoes'] for item in manifest.values()},
+    }
+
+def asset_url(nome):
+    """URL do arquivo estático: a versão com hash, se houver build, ou o original em /static."""
+    item = current_app.extensions['ativos']['manifest'].get(nome)
+    if item is None:
+        return url_for('static', filename=nome)
+    return url_for('ativos.arquivoAtivo', nome=item['arquivo'])
+
+@bp.route('/static/dist/<nome>')
+def arquivoAtivo(nome):
+    codificacoes = current_app.extensions['ativos']['arquivos'].get(nome)
+    if codificacoes is None:
+        abort(404)
+    pasta = os.path.join(current_app.static_folder, PASTA_DO_BUILD)
+    aceitas = request.accept_encodings
+    for codificacao in codificacoes:  # br antes de gzip
+        if aceitas[codificacao]:
+            resposta = send_from_directory(pasta, nome + ('.br' if codificacao == 'br' else '.gz'), max_age=ANO,
+                                           mimetype=mimetypes.guess_type(nome)[0], download_name=nome)
+            resposta.content_encoding = codificacao
+            break
+    else:
+        resposta = send_from_directory(pasta, nome, max_age=ANO)
+    resposta.vary.add('Accept-Encoding')
+    resposta.cache_control.public = True
+    resposta.cache_control.immutable = True
+    return resposta
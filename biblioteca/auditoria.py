@@ -0,0 +1,205 @@
+"""Auditoria dos planos de consulta das rotas mais usadas.
+
+Cada cenário faz uma requisição real (test client) num banco de teste com
+dados sintéticos; os comandos SQL emitidos são capturados e, para cada um, o
+banco explica o plano: EXPLAIN QUERY PLAN no SQLite, EXPLAIN com
+enable_seqscan=off no PostgreSQL (assim uma leitura sequencial só aparece se
+nenhum índice atende a consulta). Um plano que percorre a tabela inteira, sem
+índice, é uma falha.
+
+No SQLite, `SCAN tabela` sem ordenação temporária numa consulta com LIMIT e
+sem WHERE é aceito: é a leitura na ordem da chave primária que para após N
+linhas (ex.: a primeira página do catálogo). Com qualquer filtro a varredura é
+uma falha, porque as linhas que o filtro descarta também são lidas.
+"""
+from collections import namedtuple
+from datetime import datetime, timedelta
+import json
+import re
+
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+
+from . import create_app
+from .estatisticas import atualizar_estatisticas
+from .extensoes import db
+from .historico import limpar_historico
+from .modelos import Aluno, Exemplar, FilaEspera, Livro, Reserva, Usuario, criar_esquema
+from .rotinas import expirar_reservas
+
+SENHA = 'senha-auditoria'
+LIVROS = 500
+ALUNOS = 100
+BIBLIOTECARIO = ALUNOS + 1  # Usuário logado nos cenários da API
+PENDENTES = range(1, 21)  # Livros com o único exemplar separado para uma reserva pendente
+EMPRESTADOS = range(21, 31)  # Livros com o exemplar emprestado (reserva aceita)
+
+Cenario = namedtuple('Cenario', 'nome metodo url dados usuario_id')
+Problema = namedtuple('Problema', 'cenario instrucao plano')
+
+# Rotas (e tarefas) auditadas; usuario_id é o usuário logado na sessão
+CENARIOS = [
+    Cenario('entrar', 'POST', '/entrar', {'email': 'aluno2@aluno-faeterj.com', 'senha': SENHA}, None),
+    Cenario('painel-principal', 'GET', '/painel-principal', None, 2),
+    Cenario('painel-principal (página)', 'GET', '/painel-principal?apos=100', None, 2),
+    Cenario('painel-principal (disponíveis)', 'GET', '/painel-principal?disponivel=1&apos=100', None, 2),
+    Cenario('painel-principal (voltar)', 'GET', '/painel-principal?reservado=1&antes=300', None, 2),
+    Cenario('buscar', 'GET', '/buscar?q=titulo+7', None, 2),
+    Cenario('solicitar-reserva', 'POST', '/solicitar-reserva/100', {}, 2),
+    Cenario('solicitar-reserva (fila)', 'POST', '/solicitar-reserva/1', {}, 3),
+    Cenario('sair-da-fila', 'POST', '/sair-da-fila/1', {}, 3),
+    Cenario('lib-solicitacoes', 'GET', '/lib/solicitacoes', None, None),
+    Cenario('lib-solicitacoes (empréstimos)', 'GET', '/lib/solicitacoes?status=aceito', None, None),
+    Cenario('aceitar-reserva', 'POST', '/gerenciar-reserva/2/aceitar', {}, None),
+    Cenario('recusar-reserva', 'POST', '/gerenciar-reserva/3/recusar', {}, None),
+    Cenario('devolver-livro', 'POST', '/gerenciar-reserva/21/devolver', {}, None),
+    Cenario('painel-lib', 'GET', '/painel-lib?apos=50', None, None),
+    Cenario('listar-usuarios', 'GET', '/listar-usuarios', None, None),
+    Cenario('adicionar-exemplares', 'POST', '/adicionar-exemplares/5', {'quantidade': '2'}, None),
+    Cenario('indisponibilizar-livro', 'POST', '/indisponibilizar-livro/200', {}, None),
+    Cenario('disponibilizar-livro', 'POST', '/disponibilizar-livro/200', {}, None),
+    Cenario('disponibilidade-em-lote (assunto)', 'POST', '/livros/disponibilidade-em-lote',
+            {'acao': 'indisponibilizar', 'assunto': 'Assunto 3'}, None),
+    Cenario('disponibilidade-em-lote (marcados ou assunto)', 'POST', '/livros/disponibilidade-em-lote',
+            {'acao': 'disponibilizar', 'livro_ids': ['7', '8'], 'assunto': 'Assunto 3'}, None),
+    Cenario('bloquear-usuario', 'POST', '/bloquear-usuario/50', {}, None),
+    Cenario('desbloquear-usuario', 'POST', '/desbloquear-usuario/50', {}, None),
+    Cenario('bloqueio-em-lote (curso)', 'POST', '/usuarios/bloqueio-em-lote', {'acao': 'bloquear', 'curso': 'SI'}, None),
+    Cenario('bloqueio-em-lote (marcados ou curso)', 'POST', '/usuarios/bloqueio-em-lote',
+            {'acao': 'desbloquear', 'usuario_ids': ['3', '4'], 'curso': 'SI'}, None),
+    Cenario('api livros', 'GET', '/api/v1/livros?disponivel=1&apos=10', None, BIBLIOTECARIO),
+    Cenario('api livro', 'GET', '/api/v1/livros/10', None, BIBLIOTECARIO),
+    Cenario('api reservas', 'GET', '/api/v1/reservas?status=pendente', None, BIBLIOTECARIO),
+    Cenario('api usuarios', 'GET', '/api/v1/usuarios?tipo_usuario=aluno', None, BIBLIOTECARIO),
+    Cenario('api decidir reservas', 'POST', '/api/v1/reservas/lote', {'ids': [4, 5], 'acao': 'recusar'},
+            BIBLIOTECARIO),
+    Cenario('painel-estatisticas', 'GET', '/painel-admin/estatisticas', None, None),
+    # Tarefas em segundo plano
+    Cenario('tarefa expirar-reservas', 'TAREFA', expirar_reservas, None, None),
+    Cenario('tarefa atualizar-estatisticas', 'TAREFA', atualizar_estatisticas, None, None),
+    Cenario('tarefa limpeza do histórico', 'TAREFA', lambda: limpar_historico(db.session, 30, 1000), None, None),
+]
+
+
+def popular(app):
+    """Dados sintéticos: alunos de dois cursos, livros com um exemplar, reservas pendentes e aceitas."""
+    agora = datetime.utcnow()
+    senha = generate_password_hash(SENHA, method=app.config['SENHA_METODO'])
+    with app.app_context():
+        criar_esquema()
+        db.session.execute(db.insert(Usuario.__table__), [
+            dict(id=i, nome=f'Aluno {i}', email=f'aluno{i}@aluno-faeterj.com', cpf='0', senha=senha,
+                 tipo_usuario='aluno', status=False)
+            for i in range(1, ALUNOS + 1)
+        ] + [dict(id=BIBLIOTECARIO, nome='Bibliotecário', email='lib@lib-faeterj.com', cpf='0', senha=senha,
+                  tipo_usuario='bibliotecario', status=False)])
+        db.session.execute(db.insert(Aluno.__table__), [
+            dict(id=i, matricula=f'{20240000 + i}', curso=('ADS', 'SI')[i % 2]) for i in range(1, ALUNOS + 1)
+        ])
+        ocupados = set(PENDENTES) | set(EMPRESTADOS)
+        db.session.execute(db.insert(Livro.__table__), [
+            dict(id=i, autor=f'Autor {i % 37}', titulo=f'Título {i}', isbn=9780000000000 + i,
+                 editora=f'Editora {i % 11}', assunto=f'Assunto {i % 7}', edicao='1', data_inclusao=agora,
+                 disponivel=True, reservado=i in ocupados, exemplares_disponiveis=int(i not in ocupados))
+            for i in range(1, LIVROS + 1)
+        ])
+        db.session.execute(db.insert(Exemplar.__table__), [
+            dict(id=i, livro_id=i, data_inclusao=agora, disponivel=i not in EMPRESTADOS, reservado=i in PENDENTES)
+            for i in range(1, LIVROS + 1)
+        ])
+        db.session.execute(db.insert(Reserva.__table__), [
+            dict(id=i, livro_id=i, exemplar_id=i, usuario_id=i + 10,
+                 status='pendente' if i in PENDENTES else 'aceito',
+                 data_inclusao=agora - timedelta(days=i), data_decisao=None if i in PENDENTES else agora)
+            for i in list(PENDENTES) + list(EMPRESTADOS)
+        ])
+        db.session.execute(db.insert(FilaEspera.__table__), [
+            dict(livro_id=21, usuario_id=40, prioridade=1, data_inclusao=agora),
+        ])
+        db.session.commit()
+
+
+def problemas_no_plano(conexao, instrucao, parametros):
+    """Explica a instrução e devolve (plano em texto, se percorre uma tabela inteira)."""
+    cursor = conexao.cursor()
+    try:
+        if conexao.__class__.__module__.startswith('sqlite3'):
+            cursor.execute('EXPLAIN QUERY PLAN ' + instrucao, parametros)
+            linhas = [linha[-1] for linha in cursor.fetchall()]
+            ordena = any('USE TEMP B-TREE' in linha for linha in linhas)
+            # Só a leitura sem filtro nenhum pode parar após N linhas; com WHERE, as linhas
+            # descartadas pelo filtro também são lidas
+            primeiras = (re.search(r'\bLIMIT\b', instrucao, re.I) is not None and not ordena
+                         and re.search(r'\bWHERE\b', instrucao, re.I) is None)
+            varreduras = [linha for linha in linhas if re.match(r'SCAN \w+$', linha) and not primeiras]
+            return '\n'.join(linhas), bool(varreduras)
+        cursor.execute('SET enable_seqscan = off')
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + instrucao, parametros)
+        plano = cursor.fetchone()[0]
+        texto = json.dumps(plano, indent=1)
+        return texto, '"Seq Scan"' in texto
+    finally:
+        cursor.close()
+
+
+def auditar(uri=None, mostrar_planos=False, avisar=print):
+    """Roda os cenários e devolve a lista de problemas (vazia quando todas as consultas usam índice)."""
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': uri,
+        'TAREFAS_NO_PROCESSO': False,
+        'SENHA_METODO': 'pbkdf2:sha256:1000',  # O custo do hash não interessa aqui
+        'LOGIN_LIMITE_IP': 1000000000,
+    })
+    popular(app)
+
+    capturadas = []
+    cenario_atual = []
+
+    def capturar(conexao, cursor, instrucao, parametros, contexto, executemany):
+        if not cenario_atual or re.match(r'\s*(INSERT|PRAGMA|SAVEPOINT|RELEASE|ROLLBACK)\b', instrucao, re.I):
+            return
+        if executemany:
+            parametros = parametros[0]
+        capturadas.append((cenario_atual[0], instrucao, parametros))
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', capturar)
+    cliente = app.test_client()
+    for cenario in CENARIOS:
+        cenario_atual[:] = [cenario.nome]
+        if cenario.metodo == 'TAREFA':
+            with app.app_context():
+                cenario.url()
+            continue
+        with cliente.session_transaction() as sessao:
+            sessao.clear()
+            if cenario.usuario_id:
+                sessao['usuario_id'] = cenario.usuario_id
+        enviar = {'json': cenario.dados} if cenario.url.startswith('/api/') else {'data': cenario.dados}
+        resposta = cliente.open(cenario.url, method=cenario.metodo, **enviar)
+        resposta.get_data()  # Telas em fluxo só consultam o banco enquanto o corpo é lido
+        resposta.close()
+        if resposta.status_code >= 400:
+            avisar(f'aviso: {cenario.nome} respondeu {resposta.status_code}')
+    cenario_atual.clear()
+    app.extensions['historico'].parar()  # Grava o histórico dos cenários antes de fechar o banco
+
+    problemas = []
+    vistas = set()
+    with app.app_context():
+        conexao = db.engine.raw_connection()
+        try:
+            for nome, instrucao, parametros in capturadas:
+                chave = (nome, instrucao)
+                if chave in vistas:
+                    continue
+                vistas.add(chave)
+                plano, varre = problemas_no_plano(conexao.driver_connection, instrucao, parametros)
+                if mostrar_planos:
+                    avisar(f'[{nome}] {" ".join(instrucao.split())}\n    ' + plano.replace('\n', '\n    '))
+                if varre:
+                    problemas.append(Problema(nome, instrucao, plano))
+        finally:
+            conexao.close()
+        db.engine.dispose()
+    return problemas
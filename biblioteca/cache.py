@@ -0,0 +1,105 @@
+"""Cache de páginas: LRU em memória com validade (TTL) ou backend compartilhado.
+
+A invalidação é feita por versão: cada grupo de páginas (ex.: 'catalogo') tem um
+contador que entra na chave. Incrementar o contador torna todas as entradas
+antigas inalcançáveis, que depois saem por LRU/TTL.
+"""
+from collections import OrderedDict
+import threading
+import time
+
+
+class CacheLRU:
+    """Cache do próprio processo, limitado em quantidade de itens e com TTL."""
+
+    def __init__(self, max_itens=512, ttl=300):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self._itens = OrderedDict()
+        self._trava = threading.Lock()
+        # As versões ficam fora do LRU (nunca são descartadas) e começam em um valor
+        # diferente a cada processo, para um ETag antigo nunca coincidir após reiniciar.
+        self._versoes = {}
+        self._versao_inicial = time.time_ns()
+
+    def get(self, chave):
+        with self._trava:
+            item = self._itens.get(chave)
+            if item is None:
+                return None
+            valor, expira_em = item
+            if expira_em < time.monotonic():
+                del self._itens[chave]
+                return None
+            self._itens.move_to_end(chave)
+            return valor
+
+    def set(self, chave, valor, ttl=None):
+        expira_em = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._trava:
+            self._itens[chave] = (valor, expira_em)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def delete(self, chave):
+        with self._trava:
+            self._itens.pop(chave, None)
+
+    def clear(self):
+        with self._trava:
+            self._itens.clear()
+
+    def versao(self, grupo):
+        with self._trava:
+            return self._versoes.get(grupo, self._versao_inicial)
+
+    def invalidar(self, grupo):
+        with self._trava:
+            self._versoes[grupo] = self._versoes.get(grupo, self._versao_inicial) + 1
+
+
+class CacheCompartilhado:
+    """Cache compartilhado entre workers, sobre um cliente no estilo Redis.
+
+    O cliente precisa de get, set(ex=), delete, incr e set(nx=); qualquer objeto
+    com essa interface (ex.: um dublê em memória nos testes) pode substituí-lo.
+    """
+
+    def __init__(self, cliente, ttl=300, prefixo='biblioteca:'):
+        self.cliente = cliente
+        self.ttl = ttl
+        self.prefixo = prefixo
+
+    def get(self, chave):
+        valor = self.cliente.get(self.prefixo + chave)
+        return valor.decode('utf-8') if isinstance(valor, bytes) else valor
+
+    def set(self, chave, valor, ttl=None):
+        self.cliente.set(self.prefixo + chave, valor, ex=self.ttl if ttl is None else ttl)
+
+    def delete(self, chave):
+        self.cliente.delete(self.prefixo + chave)
+
+    def clear(self):
+        # As entradas antigas expiram sozinhas pelo TTL
+        pass
+
+    def versao(self, grupo):
+        chave = self.prefixo + 'versao:' + grupo
+        valor = self.cliente.get(chave)
+        if valor is None:
+            self.cliente.set(chave, time.time_ns(), nx=True)
+            valor = self.cliente.get(chave)
+        return int(valor)
+
+    def invalidar(self, grupo):
+        self.cliente.incr(self.prefixo + 'versao:' + grupo)
+
+
+def criar_cache(url=None, max_itens=512, ttl=300):
+    """Cria o cache a partir de CACHE_URL: vazio para memória local, redis://... para compartilhado."""
+    if not url:
+        return CacheLRU(max_itens=max_itens, ttl=ttl)
+    import redis  # Dependência opcional, só necessária com CACHE_URL
+    return CacheCompartilhado(redis.Redis.from_url(url), ttl=ttl)
@@ -0,0 +1,279 @@
+"""Comandos de linha de comando (flask <comando>)."""
+from collections import Counter
+from datetime import datetime
+import os
+import random
+import tempfile
+import threading
+import time
+
+from flask import Blueprint, current_app
+from flask_migrate import stamp
+from sqlalchemy.exc import OperationalError
+from werkzeug.security import generate_password_hash
+import click
+
+from .ativos import construir_ativos
+from .estatisticas import atualizar_estatisticas
+from .extensoes import configurar_sqlite, db
+from .importacao import (descrever_importacao, descrever_sincronizacao, formato_do_arquivo, importar_livros,
+                         ler_registros, sincronizar_matriculas)
+from .modelos import Exemplar, HistoricoReserva, Livro, Reserva, Usuario, criar_esquema
+from .senhas import verificar_senha
+from .servicos import ReservaIndisponivel, reservar_livro
+
+bp = Blueprint('comandos', __name__, cli_group=None)
+
+@bp.cli.command('init-db')
+def iniciarBanco():
+    """Cria as tabelas de um banco novo e o marca com a última migração.
+
+    Em bancos existentes use `flask db upgrade`; o app não cria tabelas ao iniciar.
+    """
+    criar_esquema()
+    stamp()
+    click.echo('Banco criado.')
+
+@bp.cli.command('construir-ativos')
+def construirAtivos():
+    """Minifica, gera os nomes com hash e comprime os CSS/JS de static/ (em static/dist)."""
+    manifest = construir_ativos(current_app.static_folder)
+    for nome, item in manifest.items():
+        click.echo(f'{nome} -> {item["arquivo"]} ({", ".join(item["codificacoes"])})')
+    click.echo('Reinicie o servidor para usar o novo manifest.')
+
+@bp.cli.command('estresse-reservas')
+@click.option('--threads', default=32, show_default=True, help='Quantidade de threads concorrentes.')
+@click.option('--livros', default=20, show_default=True, help='Quantidade de livros disputados.')
+@click.option('--usuarios', default=400, show_default=True, help='Quantidade de usuários.')
+@click.option('--exemplares', default=1, show_default=True, help='Exemplares de cada livro.')
+def estresseReservas(threads, livros, usuarios, exemplares):
+    """Dispara reservas concorrentes em um banco temporário e verifica reservas duplas.
+
+    Sai com código 1 se algum exemplar ficou em duas reservas, se os contadores não batem
+    com os exemplares, se uma thread falhou ou se nenhuma reserva passou.
+    """
+    with tempfile.TemporaryDirectory() as pasta:
+        engine = db.create_engine(f'sqlite:///{pasta}/estresse.db', connect_args={'timeout': 30})
+        configurar_sqlite(engine, current_app.config)
+        db.metadata.create_all(engine)
+        Sessao = db.sessionmaker(bind=engine)
+
+        with Sessao() as sessao:
+            sessao.add_all(Livro(autor='Autor', titulo=f'Livro {i}', isbn=i, editora='Editora',
+                                 assunto='Assunto', edicao='1', disponivel=True, reservado=False,
+                                 exemplares_disponiveis=exemplares)
+                           for i in range(livros))
+            sessao.flush()
+            sessao.add_all(Exemplar(livro_id=livro_id, disponivel=True)
+                           for livro_id in sessao.scalars(db.select(Livro.id)).all()
+                           for _ in range(exemplares))
+            sessao.add_all(Usuario(nome=f'Usuário {i}', email=f'usuario{i}@estresse', cpf='0', senha='x')
+                           for i in range(usuarios))
+            sessao.commit()
+            ids_livros = sessao.scalars(db.select(Livro.id)).all()
+            ids_usuarios = sessao.scalars(db.select(Usuario.id)).all()
+
+        resultados = Counter()
+        erros = []
+        trava = threading.Lock()
+        barreira = threading.Barrier(threads)
+
+        def trabalhador(indice):
+            contagem = Counter()
+            barreira.wait()  # Todas as threads começam ao mesmo tempo
+            try:
+                with Sessao() as sessao:
+                    for usuario_id in ids_usuarios[indice::threads]:
+                        # Cada usuário tenta o mesmo livro duas vezes para exercitar o pedido duplicado
+                        for livro_id in random.sample(ids_livros, len(ids_livros)) * 2:
+                            try:
+                                reservar_livro(livro_id, usuario_id, sessao)
+                                contagem['aceitas'] += 1
+                            except ReservaIndisponivel:
+                                contagem['recusadas'] += 1
+                            except OperationalError:
+                                sessao.rollback()
+                                contagem['banco_ocupado'] += 1
+            except Exception as erro:  # Uma thread que morre não pode deixar o resultado passar
+                with trava:
+                    erros.append(repr(erro))
+            with trava:
+                resultados.update(contagem)
+
+        trabalhadores = [threading.Thread(target=trabalhador, args=(i,)) for i in range(threads)]
+        inicio = datetime.now()
+        for t in trabalhadores:
+            t.start()
+        for t in trabalhadores:
+            t.join()
+        duracao = (datetime.now() - inicio).total_seconds()
+
+        with Sessao() as sessao:
+            # Nenhum exemplar pode estar em duas reservas pendentes
+            duplicadas = sessao.execute(
+                db.select(Reserva.exemplar_id, db.func.count())
+                .where(Reserva.status == 'pendente')
+                .group_by(Reserva.exemplar_id)
+                .having(db.func.count() > 1)
+            ).all()
+            reservados = sessao.scalar(db.select(db.func.count()).where(Exemplar.reservado == True))  # noqa: E712
+            pendentes = sessao.scalar(db.select(db.func.count()).where(Reserva.status == 'pendente'))
+            # Toda reserva pendente segura um exemplar marcado como reservado
+            sem_exemplar = sessao.scalar(
+                db.select(db.func.count()).select_from(Reserva)
+                .outerjoin(Exemplar, Exemplar.id == Reserva.exemplar_id)
+                .where(Reserva.status == 'pendente', db.or_(Exemplar.id.is_(None), Exemplar.reservado == False))  # noqa: E712
+            )
+            # O contador de cada título precisa bater com os exemplares livres
+            livres = db.select(db.func.count()).where(
+                Exemplar.livro_id == Livro.id, Exemplar.disponivel == True, Exemplar.reservado == False,  # noqa: E712
+            ).scalar_subquery()
+            divergentes = sessao.scalar(db.select(db.func.count()).where(
+                db.or_(Livro.exemplares_disponiveis != livres, Livro.exemplares_disponiveis < 0)
+            ))
+        engine.dispose()
+
+    total = sum(resultados.values())
+    click.echo(f'{total} tentativas em {duracao:.2f}s ({total / duracao:.0f}/s) com {threads} threads')
+    click.echo(f'aceitas={resultados["aceitas"]} recusadas={resultados["recusadas"]} '
+               f'banco_ocupado={resultados["banco_ocupado"]} exemplares_reservados={reservados}')
+    falhas = []
+    if erros:
+        falhas.append(f'{len(erros)} thread(s) interrompidas: {erros[0]}')
+    if not resultados['aceitas']:
+        falhas.append('nenhuma reserva foi aceita')
+    if duplicadas or reservados > livros * exemplares:
+        falhas.append(f'exemplares reservados mais de uma vez: {duplicadas}')
+    if not resultados['aceitas'] == pendentes == reservados or sem_exemplar:
+        falhas.append(f'aceitas={resultados["aceitas"]}, reservas pendentes={pendentes}, '
+                      f'exemplares reservados={reservados}, pendentes sem exemplar={sem_exemplar}')
+    if divergentes:
+        falhas.append(f'{divergentes} livro(s) com contador de exemplares divergente')
+    for falha in falhas:
+        click.echo(f'FALHA: {falha}', err=True)
+    if falhas:
+        raise SystemExit(1)
+    click.echo('OK: nenhuma reserva dupla.')
+
+@bp.cli.command('tarefas')
+@click.option('--uma-vez', is_flag=True, help='Executa as tarefas vencidas e termina.')
+def executarTarefas(uma_vez):
+    """Executa as tarefas em segundo plano fora do servidor web (use com TAREFAS_NO_PROCESSO=0)."""
+    tarefas = current_app.extensions['tarefas']
+    if uma_vez:
+        total = 0
+        while (executadas := tarefas.executar_pendentes()):
+            total += executadas
+        click.echo(f'{total} tarefa(s) executada(s).')
+        return
+    click.echo('Executando tarefas (Ctrl+C para parar)...')
+    tarefas.iniciar()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        tarefas.parar()
+
+@bp.cli.command('atualizar-estatisticas')
+@click.option('--completo', is_flag=True, help='Refaz os resumos de todo o histórico.')
+def atualizarEstatisticas(completo):
+    """Atualiza os resumos do painel de estatísticas (normalmente feito pela tarefa periódica)."""
+    inicio = time.perf_counter()
+    dias = atualizar_estatisticas(completo)
+    click.echo(f'{dias} dia(s) recalculado(s) em {time.perf_counter() - inicio:.2f}s.')
+
+@bp.cli.command('auditar-consultas')
+@click.option('--banco', help='URL de um banco de teste vazio (padrão: SQLite temporário).')
+@click.option('--planos', is_flag=True, help='Mostra o plano de todas as consultas.')
+def auditarConsultas(banco, planos):
+    """Explica o plano de cada consulta das rotas principais e falha se alguma percorre uma tabela inteira."""
+    from .auditoria import auditar  # Cria outro app: importado só aqui para evitar o ciclo com create_app
+
+    with tempfile.TemporaryDirectory() as pasta:
+        problemas = auditar(banco or f'sqlite:///{pasta}/auditoria.db', planos)
+    for problema in problemas:
+        click.echo(f'\n[{problema.cenario}] {" ".join(problema.instrucao.split())}', err=True)
+        click.echo('    ' + problema.plano.replace('\n', '\n    '), err=True)
+    if problemas:
+        click.echo(f'\nFALHA: {len(problemas)} consulta(s) percorrem uma tabela inteira.', err=True)
+        raise SystemExit(1)
+    click.echo('OK: todas as consultas das rotas auditadas usam índice.')
+
+@bp.cli.command('benchmark-senha')
+@click.option('--threads', default=os.cpu_count() or 2, show_default=True, help='Logins simultâneos.')
+@click.option('--logins', default=200, show_default=True, help='Total de logins verificados.')
+def benchmarkSenha(threads, logins):
+    """Mede quantos logins por segundo um worker verifica com o SENHA_METODO atual."""
+    usuario = Usuario(senha=generate_password_hash('senha-de-teste', method=current_app.config['SENHA_METODO']))
+    restantes = iter(range(logins))
+    trava = threading.Lock()
+
+    def trabalhador():
+        while True:
+            with trava:
+                if next(restantes, None) is None:
+                    return
+            assert verificar_senha(usuario, 'senha-de-teste')
+
+    trabalhadores = [threading.Thread(target=trabalhador) for _ in range(threads)]
+    inicio = time.perf_counter()
+    for t in trabalhadores:
+        t.start()
+    for t in trabalhadores:
+        t.join()
+    duracao = time.perf_counter() - inicio
+
+    click.echo(f'método: {current_app.config["SENHA_METODO"]} (até {current_app.config["SENHA_HASH_CONCORRENCIA"]} hashes simultâneos)')
+    click.echo(f'{logins} logins em {duracao:.2f}s: {logins / duracao:.1f} logins/s por worker, '
+               f'{duracao / logins * 1000:.1f} ms por login')
+
+@bp.cli.command('importar-livros')
+@click.argument('arquivo', type=click.Path(exists=True, dir_okay=False))
+@click.option('--formato', type=click.Choice(['csv', 'jsonl']), help='Padrão: pela extensão do arquivo.')
+@click.option('--lote', default=None, type=int, help='Linhas por transação (IMPORTACAO_TAMANHO_LOTE).')
+def importarLivrosCli(arquivo, formato, lote):
+    """Importa (ou atualiza pelo ISBN) livros de um arquivo CSV ou JSON Lines."""
+    with open(arquivo, encoding='utf-8-sig', newline='') as texto:
+        relatorio, erros = importar_livros(ler_registros(texto, formato or formato_do_arquivo(arquivo)), lote)
+    for erro in erros:
+        click.echo(erro, err=True)
+    click.echo(descrever_importacao(relatorio))
+
+@bp.cli.command('sincronizar-matriculas')
+@click.argument('arquivo', type=click.Path(exists=True, dir_okay=False))
+@click.option('--formato', type=click.Choice(['csv', 'jsonl']), help='Padrão: pela extensão do arquivo.')
+@click.option('--lote', default=None, type=int, help='Linhas gravadas por vez na tabela temporária.')
+@click.option('--bloquear-ausentes/--manter-ausentes', default=True, show_default=True,
+              help='Bloqueia os alunos que não estão no arquivo.')
+@click.option('--simular', is_flag=True, help='Só mostra o relatório; nada é gravado.')
+def sincronizarMatriculas(arquivo, formato, lote, bloquear_ausentes, simular):
+    """Reconcilia os alunos com o arquivo da secretaria (colunas matricula, curso, email, nome e cpf opcional)."""
+    with open(arquivo, encoding='utf-8-sig', newline='') as texto:
+        relatorio, erros = sincronizar_matriculas(ler_registros(texto, formato or formato_do_arquivo(arquivo)),
+                                                  bloquear_ausentes=bloquear_ausentes, simular=simular,
+                                                  tamanho_lote=lote)
+    for erro in erros:
+        click.echo(erro, err=True)
+    click.echo(('Simulação (nada gravado): ' if simular else '') + descrever_sincronizacao(relatorio))
+
+@bp.cli.command('historico')
+@click.option('--reserva', type=int, help='Linha do tempo de uma reserva.')
+@click.option('--livro', type=int, help='Linha do tempo de um título (reservas e disponibilidade).')
+@click.option('--limite', default=50, show_default=True, help='Quantidade de linhas (as mais recentes).')
+def mostrarHistorico(reserva, livro, limite):
+    """Mostra o histórico das reservas e da disponibilidade, do mais antigo para o mais recente."""
+    h = HistoricoReserva
+    consulta = db.select(h).order_by(h.id.desc()).limit(limite)
+    if reserva:
+        consulta = consulta.where(h.reserva_id == reserva)
+    if livro:
+        consulta = consulta.where(h.livro_id == livro)
+    for linha in reversed(db.session.scalars(consulta).all()):
+        if linha.tipo == 'reserva':
+            alvo = f'reserva {linha.reserva_id} (livro {linha.livro_id}, usuário {linha.usuario_id})'
+        elif linha.tipo == 'livro':
+            alvo = f'livro {linha.livro_id}'
+        else:
+            alvo = 'disponibilidade em lote'
+        click.echo(f'{linha.momento:%Y-%m-%d %H:%M:%S} {alvo}: {linha.status} {linha.dados or ""}'.rstrip())
@@ -0,0 +1,136 @@
+"""Configuração lida do ambiente (valores padrão para rodar localmente)."""
+import os
+
+
+# Configuração do banco de dados (SQLite por padrão; PostgreSQL via DATABASE_URL)
+def uri_do_banco():
+    uri = os.environ.get('DATABASE_URL', 'sqlite:///usuarios.db')
+    if uri.startswith('postgres://'):  # Formato antigo usado por alguns provedores
+        uri = 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+def opcoes_do_engine(uri):
+    """Opções do pool de conexões, lidas do ambiente (DB_POOL_SIZE, DB_MAX_OVERFLOW, ...)."""
+    opcoes = {
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', '1') == '1',
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+    }
+    # Banco SQLite em memória usa um pool de conexão única, sem fila
+    if not (uri.startswith('sqlite') and (uri in ('sqlite://', 'sqlite:///') or ':memory:' in uri)):
+        opcoes['pool_size'] = int(os.environ.get('DB_POOL_SIZE', 5))
+        opcoes['max_overflow'] = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+        opcoes['pool_timeout'] = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+    if uri.startswith('postgresql'):
+        opcoes['connect_args'] = {
+            'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 10)),
+            'options': '-c statement_timeout=%d' % int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 30000)),
+        }
+    return opcoes
+
+
+class Configuracao:
+    SECRET_KEY = os.environ.get('SECRET_KEY', 'sua_chave_secreta')  # Necessária para sessões e mensagens flash
+
+    SQLALCHEMY_DATABASE_URI = uri_do_banco()
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Hash de senhas: método/custo do werkzeug (ex.: 'scrypt:32768:8:1' ou 'pbkdf2:sha256:600000')
+    SENHA_METODO = os.environ.get('SENHA_METODO', 'scrypt:32768:8:1')
+    # Quantos hashes podem ser calculados ao mesmo tempo e quanto tempo esperar por uma vaga
+    # (curto: sem vaga a requisição recebe 503 em vez de prender a thread)
+    SENHA_HASH_CONCORRENCIA = int(os.environ.get('SENHA_HASH_CONCORRENCIA', os.cpu_count() or 2))
+    SENHA_HASH_ESPERA = float(os.environ.get('SENHA_HASH_ESPERA', 0.1))
+
+    # Limite de tentativas de login (LIMITE_URL=redis://... para compartilhar entre workers):
+    # contam só as tentativas que falharam, por IP e por e-mail
+    LIMITE_URL = os.environ.get('LIMITE_URL')
+    LIMITE_MAX_CHAVES = int(os.environ.get('LIMITE_MAX_CHAVES', 10000))
+    LOGIN_LIMITE_IP = int(os.environ.get('LOGIN_LIMITE_IP', 20))
+    LOGIN_JANELA_IP = int(os.environ.get('LOGIN_JANELA_IP', 60))
+    LOGIN_BLOQUEIO_IP = int(os.environ.get('LOGIN_BLOQUEIO_IP', 300))
+    LOGIN_LIMITE_EMAIL = int(os.environ.get('LOGIN_LIMITE_EMAIL', 5))
+    LOGIN_JANELA_EMAIL = int(os.environ.get('LOGIN_JANELA_EMAIL', 300))
+    LOGIN_BLOQUEIO_EMAIL = int(os.environ.get('LOGIN_BLOQUEIO_EMAIL', 900))
+    # Proxies reversos confiáveis à frente do app (ex.: 1 para nginx -> gunicorn): o IP do
+    # cliente vem de X-Forwarded-For. 0 usa o endereço da conexão (sem proxy)
+    PROXY_SALTOS = int(os.environ.get('PROXY_SALTOS', 0))
+
+    # Ajustes aplicados a cada nova conexão SQLite
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+
+    # Paginação do catálogo (quantidade de livros por página)
+    LIVROS_POR_PAGINA = int(os.environ.get('LIVROS_POR_PAGINA', 50))
+    LIVROS_POR_PAGINA_MAX = int(os.environ.get('LIVROS_POR_PAGINA_MAX', 500))
+    # Telas enviadas em fluxo (painel-lib, listar-usuarios): linhas lidas do banco por vez
+    PAGINAS_LOTE_DE_LEITURA = int(os.environ.get('PAGINAS_LOTE_DE_LEITURA', 200))
+    # Templates compilados guardados em disco e reaproveitados por workers novos (padrão: instance/jinja)
+    JINJA_CACHE = os.environ.get('JINJA_CACHE', '1') == '1'
+    JINJA_CACHE_PASTA = os.environ.get('JINJA_CACHE_PASTA')
+
+    # Cache das páginas do catálogo (CACHE_URL=redis://... para compartilhar entre workers)
+    CACHE_URL = os.environ.get('CACHE_URL')
+    CACHE_MAX_ITENS = int(os.environ.get('CACHE_MAX_ITENS', 512))
+    CACHE_TTL = int(os.environ.get('CACHE_TTL', 300))
+
+    # Atualizações ao vivo (/eventos): EVENTOS_URL=redis://... entrega os eventos a todos os workers.
+    # Cada conexão aberta ocupa uma thread do worker; EVENTOS_MAX_CONEXOES é o limite por processo.
+    EVENTOS_URL = os.environ.get('EVENTOS_URL')
+    EVENTOS_MAX_CONEXOES = int(os.environ.get('EVENTOS_MAX_CONEXOES', 100))
+    EVENTOS_MAX_FILA = int(os.environ.get('EVENTOS_MAX_FILA', 100))
+    EVENTOS_PULSACAO = float(os.environ.get('EVENTOS_PULSACAO', 15))  # Comentário enviado na conexão parada (s)
+    EVENTOS_RECONEXAO_MS = int(os.environ.get('EVENTOS_RECONEXAO_MS', 3000))
+
+    # Histórico das reservas: linhas na fila em memória (acima disso são descartadas), linhas por INSERT,
+    # espera máxima para juntar um lote (s) e retenção por idade/quantidade (0 desliga), aplicada pela manutenção
+    HISTORICO_MAX_FILA = int(os.environ.get('HISTORICO_MAX_FILA', 10000))
+    HISTORICO_LOTE = int(os.environ.get('HISTORICO_LOTE', 500))
+    HISTORICO_INTERVALO = float(os.environ.get('HISTORICO_INTERVALO', 1))
+    HISTORICO_RETENCAO_DIAS = int(os.environ.get('HISTORICO_RETENCAO_DIAS', 730))
+    HISTORICO_MAX_LINHAS = int(os.environ.get('HISTORICO_MAX_LINHAS', 5000000))
+
+    # Instrumentação (/metrics): limite de consulta lenta, repetições para avisar N+1 e cabeçalho Server-Timing
+    METRICAS_CONSULTA_LENTA_MS = float(os.environ.get('METRICAS_CONSULTA_LENTA_MS', 100))
+    METRICAS_LIMITE_N_MAIS_UM = int(os.environ.get('METRICAS_LIMITE_N_MAIS_UM', 10))
+    METRICAS_SERVER_TIMING = os.environ.get('METRICAS_SERVER_TIMING', '0') == '1'
+
+    # API JSON: só bibliotecários/administradores logados ou quem enviar "Authorization: Bearer <API_TOKEN>"
+    API_TOKEN = os.environ.get('API_TOKEN')
+    # API JSON: máximo de ids por operação em lote
+    API_LOTE_MAX = int(os.environ.get('API_LOTE_MAX', 5000))
+
+    # Exportação: linhas buscadas do banco por vez
+    EXPORTACAO_TAMANHO_LOTE = int(os.environ.get('EXPORTACAO_TAMANHO_LOTE', 1000))
+
+    # Importação em lote: linhas gravadas por transação
+    IMPORTACAO_TAMANHO_LOTE = int(os.environ.get('IMPORTACAO_TAMANHO_LOTE', 5000))
+
+    # Fila de espera: prioridade por tipo de usuário (menor é atendido antes; FIFO dentro da mesma prioridade)
+    FILA_PRIORIDADES = {
+        tipo.strip(): int(prioridade)
+        for tipo, prioridade in (item.split(':') for item in
+                                 os.environ.get('FILA_PRIORIDADES', 'professor:0,aluno:1').split(',') if item.strip())
+    }
+    FILA_PRIORIDADE_PADRAO = int(os.environ.get('FILA_PRIORIDADE_PADRAO', 2))
+
+    # Tarefas em segundo plano: intervalo de busca (s), tarefas por rodada, tentativas e espera inicial entre elas (s)
+    TAREFAS_NO_PROCESSO = os.environ.get('TAREFAS_NO_PROCESSO', '1') == '1'
+    TAREFAS_INTERVALO = float(os.environ.get('TAREFAS_INTERVALO', 5))
+    TAREFAS_LOTE = int(os.environ.get('TAREFAS_LOTE', 50))
+    TAREFAS_MAX_TENTATIVAS = int(os.environ.get('TAREFAS_MAX_TENTATIVAS', 5))
+    TAREFAS_ESPERA_BASE = int(os.environ.get('TAREFAS_ESPERA_BASE', 30))
+    TAREFAS_RETENCAO_DIAS = int(os.environ.get('TAREFAS_RETENCAO_DIAS', 7))
+    # Prazos: reserva pendente expira; empréstimo atrasado recebe um lembrete
+    RESERVA_PRAZO_HORAS = int(os.environ.get('RESERVA_PRAZO_HORAS', 48))
+    EMPRESTIMO_PRAZO_DIAS = int(os.environ.get('EMPRESTIMO_PRAZO_DIAS', 14))
+    EXPIRACAO_INTERVALO = int(os.environ.get('EXPIRACAO_INTERVALO', 300))
+    MANUTENCAO_INTERVALO = int(os.environ.get('MANUTENCAO_INTERVALO', 24 * 3600))
+    # Painel de estatísticas: intervalo entre as atualizações dos resumos (s) e período padrão (dias)
+    ESTATISTICAS_INTERVALO = int(os.environ.get('ESTATISTICAS_INTERVALO', 600))
+    ESTATISTICAS_DIAS = int(os.environ.get('ESTATISTICAS_DIAS', 30))
+    # Notificações por e-mail (padrão: servidor SMTP local de testes, ex.: python -m aiosmtpd -n -l localhost:1025)
+    EMAIL_SMTP_HOST = os.environ.get('EMAIL_SMTP_HOST', 'localhost')
+    EMAIL_SMTP_PORT = int(os.environ.get('EMAIL_SMTP_PORT', 1025))
+    EMAIL_REMETENTE = os.environ.get('EMAIL_REMETENTE', 'biblioteca@faeterj.com')
+    # Validade do link enviado ao aluno da sincronização de matrículas para definir a senha
+    CADASTRO_LINK_HORAS = int(os.environ.get('CADASTRO_LINK_HORAS', 48))
@@ -0,0 +1,201 @@
+"""Consultas do catálogo: cache das páginas, paginação por chave e busca."""
+from collections import namedtuple
+from functools import wraps
+from itertools import chain
+import hashlib
+import re
+
+from flask import Response, current_app, has_app_context, request
+from sqlalchemy import event, literal_column, or_
+from sqlalchemy.orm import Session
+
+from .extensoes import db
+from .modelos import Livro, livro_fts, usa_fts
+
+############################################################################################################################
+
+# CACHE DO CATÁLOGO
+
+def cache_atual():
+    """Cache do app em uso (criado por create_app a partir de CACHE_URL)."""
+    return current_app.extensions['cache']
+
+# Tabelas cujas alterações mudam as páginas do catálogo
+TABELAS_DO_CATALOGO = {'livro', 'exemplar', 'reserva', 'fila_espera'}
+
+@event.listens_for(Session, 'after_flush')
+def marcar_catalogo_alterado(sessao, contexto):
+    alterados = chain(sessao.new, sessao.dirty, sessao.deleted)
+    if any(getattr(obj, '__tablename__', None) in TABELAS_DO_CATALOGO for obj in alterados):
+        sessao.info['catalogo_alterado'] = True
+
+@event.listens_for(Session, 'do_orm_execute')
+def marcar_catalogo_alterado_em_lote(estado):
+    # UPDATE/INSERT/DELETE em lote (ex.: reservar_livro, importação) não passam pelo flush
+    if estado.is_insert or estado.is_update or estado.is_delete:
+        tabela = getattr(estado.statement, 'table', None)
+        if getattr(tabela, 'name', None) in TABELAS_DO_CATALOGO:
+            estado.session.info['catalogo_alterado'] = True
+
+@event.listens_for(Session, 'after_commit')
+def invalidar_catalogo(sessao):
+    if sessao.info.pop('catalogo_alterado', False) and has_app_context():
+        cache_atual().invalidar('catalogo')
+
+@event.listens_for(Session, 'after_rollback')
+def descartar_alteracao_do_catalogo(sessao):
+    sessao.info.pop('catalogo_alterado', None)
+
+def cache_do_catalogo(view=None, mimetype='text/html'):
+    """Guarda o corpo da resposta por URL e responde 304 quando o ETag ainda vale.
+
+    A versão do catálogo fica no cache, então uma revalidação (If-None-Match)
+    é respondida sem nenhuma consulta ao banco. A view deve devolver uma string
+    (HTML, ou JSON com mimetype='application/json').
+    """
+    if view is None:
+        return lambda view: cache_do_catalogo(view, mimetype)
+
+    @wraps(view)
+    def envolvida(*args, **kwargs):
+        cache = cache_atual()
+        chave = 'catalogo:%s:%s' % (cache.versao('catalogo'), request.full_path)
+        etag = hashlib.sha1(chave.encode('utf-8')).hexdigest()
+        if etag in request.if_none_match:
+            resposta = Response(status=304)
+        else:
+            corpo = cache.get(chave)
+            if corpo is None:
+                corpo = view(*args, **kwargs)
+                if not isinstance(corpo, str):  # Redirecionamentos, erros etc. não vão para o cache
+                    return corpo
+                cache.set(chave, corpo)
+            resposta = Response(corpo, mimetype=mimetype)
+        resposta.set_etag(etag)
+        resposta.headers['Cache-Control'] = 'no-cache'  # O navegador sempre revalida com o ETag
+        return resposta
+    return envolvida
+
+############################################################################################################################
+
+# PAGINAÇÃO
+
+Pagina = namedtuple('Pagina', ['itens', 'anterior', 'proximo', 'por_pagina'])
+
+def parametros_de_pagina():
+    """(por_pagina, apos, antes) da requisição, com por_pagina dentro dos limites configurados."""
+    por_pagina = request.args.get('por_pagina', type=int) or current_app.config['LIVROS_POR_PAGINA']
+    por_pagina = max(1, min(por_pagina, current_app.config['LIVROS_POR_PAGINA_MAX']))
+    return por_pagina, request.args.get('apos', type=int), request.args.get('antes', type=int)
+
+def paginar_por_chave(consulta, coluna):
+    """Paginação por chave (keyset): filtra pela coluna em vez de usar OFFSET.
+
+    Lê os parâmetros `apos`/`antes` (cursor) e `por_pagina` da requisição e busca
+    uma linha a mais que o necessário para saber se existe outra página. O custo
+    de cada página é constante, independente do tamanho da tabela.
+    """
+    por_pagina, apos, antes = parametros_de_pagina()
+
+    if antes is not None:
+        # Voltando: busca em ordem decrescente e inverte o resultado
+        itens = consulta.filter(coluna < antes).order_by(coluna.desc()).limit(por_pagina + 1).all()
+        tem_mais = len(itens) > por_pagina
+        itens = list(reversed(itens[:por_pagina]))
+        anterior = getattr(itens[0], coluna.key) if itens and tem_mais else None
+        proximo = getattr(itens[-1], coluna.key) if itens else None
+    else:
+        if apos is not None:
+            consulta = consulta.filter(coluna > apos)
+        itens = consulta.order_by(coluna).limit(por_pagina + 1).all()
+        tem_mais = len(itens) > por_pagina
+        itens = itens[:por_pagina]
+        anterior = getattr(itens[0], coluna.key) if itens and apos is not None else None
+        proximo = getattr(itens[-1], coluna.key) if itens and tem_mais else None
+
+    return Pagina(itens, anterior, proximo, por_pagina)
+
+class PaginaEmFluxo:
+    """Página lida do banco aos poucos, enquanto o template é enviado (stream_template).
+
+    `itens` pode ser percorrido uma única vez; `anterior` e `proximo` só ficam
+    certos depois disso, então a paginação deve vir depois da tabela no template.
+    """
+
+    def __init__(self, consulta, coluna, apos, por_pagina, lote):
+        if apos is not None:
+            consulta = consulta.filter(coluna > apos)
+        self._linhas = consulta.order_by(coluna).limit(por_pagina + 1).yield_per(lote)
+        self._apos = apos
+        self._chave = coluna.key
+        self.por_pagina = por_pagina
+        self.anterior = None
+        self.proximo = None
+
+    @property
+    def itens(self):
+        linhas = iter(self._linhas)
+        try:
+            ultimo = None
+            for numero, item in enumerate(linhas):
+                if numero == self.por_pagina:
+                    self.proximo = ultimo  # A linha a mais só indica que existe outra página
+                    break
+                ultimo = getattr(item, self._chave)
+                if numero == 0 and self._apos is not None:
+                    self.anterior = ultimo
+                yield item
+        finally:
+            linhas.close()
+
+def paginar_em_fluxo(consulta, coluna):
+    """Como paginar_por_chave, mas sem carregar a página inteira antes de renderizar.
+
+    As linhas chegam em lotes de PAGINAS_LOTE_DE_LEITURA (yield_per) e cada uma
+    é escrita na resposta assim que lida. Voltando (`antes`) a ordem precisa ser
+    invertida, então essa página é carregada de uma vez, como antes.
+    """
+    por_pagina, apos, antes = parametros_de_pagina()
+    if antes is not None:
+        return paginar_por_chave(consulta, coluna)
+    return PaginaEmFluxo(consulta, coluna, apos, por_pagina, current_app.config['PAGINAS_LOTE_DE_LEITURA'])
+
+############################################################################################################################
+
+# BUSCA
+
+def termos_de_busca(termo):
+    """Separa o texto digitado em palavras (letras e números)."""
+    return re.findall(r'\w+', termo or '')
+
+def filtrar_disponibilidade(consulta):
+    """Aplica os filtros opcionais `disponivel` e `reservado` (0/1) da requisição."""
+    for nome in ('disponivel', 'reservado'):
+        valor = request.args.get(nome)
+        if valor in ('0', '1'):
+            consulta = consulta.filter(getattr(Livro, nome) == (valor == '1'))
+    return consulta
+
+def buscar_livros(termo, limite):
+    """Busca no catálogo por título, autor, assunto, editora ou ISBN.
+
+    No SQLite usa o índice FTS5 (prefixo em cada palavra, ordenado por relevância
+    bm25); nos outros bancos recorre a ILIKE.
+    """
+    termos = termos_de_busca(termo)
+    if not termos:
+        return []
+    consulta = filtrar_disponibilidade(Livro.query)
+
+    if usa_fts():
+        expressao = ' '.join('"%s"*' % t for t in termos)
+        consulta = (consulta.join(livro_fts, livro_fts.c.rowid == Livro.id)
+                    .filter(literal_column('livro_fts').op('MATCH')(expressao))
+                    .order_by(livro_fts.c.rank))
+    else:
+        campos = (Livro.titulo, Livro.autor, Livro.assunto, Livro.editora, db.cast(Livro.isbn, db.String))
+        for t in termos:
+            consulta = consulta.filter(or_(*(c.ilike('%' + t + '%') for c in campos)))
+        consulta = consulta.order_by(Livro.titulo)
+
+    return consulta.limit(limite).all()
@@ -0,0 +1,169 @@
+"""Estatísticas de reservas para o painel do administrador.
+
+O painel lê apenas as tabelas resumo_reserva_* (uma linha por dia e título,
+curso ou hora), então o tempo de resposta não depende do tamanho do histórico.
+Os resumos são recalculados por dia: as reservas criadas ou decididas depois da
+marca d'água dizem quais dias mudaram, e só esses dias são apagados e
+reinseridos com um INSERT ... SELECT agrupado. Recalcular um dia é idempotente,
+então a margem que cobre transações ainda abertas na rodada anterior não
+duplica nada.
+"""
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from .extensoes import db
+from .modelos import (Aluno, Livro, MarcaDeAtualizacao, Reserva, ResumoReservaCurso, ResumoReservaHora,
+                      ResumoReservaLivro, Usuario)
+
+NOME_DA_MARCA = 'resumo_reserva'
+# Transações que gravaram uma data anterior ao início da rodada, mas só fizeram commit depois dela
+MARGEM = timedelta(minutes=5)
+# Dias recalculados por transação
+DIAS_POR_LOTE = 31
+
+TABELAS_DE_RESUMO = (ResumoReservaLivro, ResumoReservaCurso, ResumoReservaHora)
+
+############################################################################################################################
+
+# ATUALIZAÇÃO DOS RESUMOS
+
+def dia_de(coluna):
+    if db.engine.dialect.name == 'sqlite':
+        return db.func.date(coluna, type_=db.Date)
+    return db.cast(coluna, db.Date)
+
+def hora_de(coluna):
+    if db.engine.dialect.name == 'sqlite':
+        return db.cast(db.func.strftime('%H', coluna), db.Integer)
+    return db.cast(db.extract('hour', coluna), db.Integer)
+
+def contagens():
+    """solicitadas, aceitas, recusadas e expiradas das reservas agrupadas."""
+    def com_status(*status):
+        return db.func.coalesce(db.func.sum(db.case((Reserva.status.in_(status), 1), else_=0)), 0)
+    return [db.func.count(Reserva.id), com_status('aceito', 'devolvido'), com_status('recusado'),
+            com_status('expirado')]
+
+def recalcular_dias(sessao, dias):
+    """Apaga e reinsere os resumos dos dias informados (na transação da sessão)."""
+    dias = sorted(dias)
+    dia = dia_de(Reserva.data_inclusao)
+    # O intervalo usa o índice de data_inclusao; o IN descarta os dias que não mudaram
+    do_periodo = db.and_(
+        Reserva.data_inclusao >= datetime.combine(dias[0], datetime.min.time()),
+        Reserva.data_inclusao < datetime.combine(dias[-1] + timedelta(days=1), datetime.min.time()),
+        dia.in_(dias),
+    )
+    for modelo in TABELAS_DE_RESUMO:
+        sessao.execute(db.delete(modelo).where(modelo.dia.in_(dias)))
+
+    sessao.execute(db.insert(ResumoReservaLivro).from_select(
+        ['dia', 'livro_id', 'solicitadas', 'aceitas', 'recusadas', 'expiradas'],
+        db.select(dia, Reserva.livro_id, *contagens()).where(do_periodo).group_by(dia, Reserva.livro_id),
+    ))
+    aluno = Aluno.__table__
+    curso = db.func.coalesce(aluno.c.curso, Usuario.tipo_usuario, '-')
+    sessao.execute(db.insert(ResumoReservaCurso).from_select(
+        ['dia', 'curso', 'solicitadas', 'aceitas', 'recusadas', 'expiradas'],
+        db.select(dia, curso, *contagens())
+        .select_from(Reserva)
+        .join(Usuario, Usuario.id == Reserva.usuario_id)
+        .outerjoin(aluno, aluno.c.id == Reserva.usuario_id)
+        .where(do_periodo)
+        .group_by(dia, curso),
+    ))
+    hora = hora_de(Reserva.data_inclusao)
+    sessao.execute(db.insert(ResumoReservaHora).from_select(
+        ['dia', 'hora', 'solicitadas'],
+        db.select(dia, hora, db.func.count(Reserva.id)).where(do_periodo).group_by(dia, hora),
+    ))
+
+def atualizar_estatisticas(completo=False, sessao=None):
+    """Recalcula os dias com reservas novas ou decididas desde a última rodada. Devolve quantos dias.
+
+    Com completo=True (ou na primeira rodada) refaz os resumos de todo o histórico.
+    """
+    sessao = sessao or db.session
+    inicio = datetime.utcnow()
+    marca = sessao.get(MarcaDeAtualizacao, NOME_DA_MARCA)
+    dia = dia_de(Reserva.data_inclusao)
+    consulta = db.select(dia).where(Reserva.data_inclusao.is_not(None)).distinct()
+    if marca is None or completo:
+        for modelo in TABELAS_DE_RESUMO:
+            sessao.execute(db.delete(modelo))
+    else:
+        desde = marca.atualizado_ate - MARGEM
+        consulta = consulta.where(db.or_(Reserva.data_inclusao >= desde, Reserva.data_decisao >= desde))
+    dias = sessao.scalars(consulta).all()
+
+    for inicio_do_lote in range(0, len(dias), DIAS_POR_LOTE):
+        recalcular_dias(sessao, dias[inicio_do_lote:inicio_do_lote + DIAS_POR_LOTE])
+        sessao.commit()
+
+    if marca is None:
+        marca = MarcaDeAtualizacao(nome=NOME_DA_MARCA, atualizado_ate=inicio)
+        sessao.add(marca)
+    marca.atualizado_ate = inicio
+    sessao.commit()
+    return len(dias)
+
+############################################################################################################################
+
+# CONSULTAS DO PAINEL
+
+Painel = namedtuple('Painel', 'desde atualizado_ate totais taxa_de_aceitacao mais_solicitados por_assunto '
+                              'por_curso por_dia por_hora')
+
+def painel_de_estatisticas(dias=30, limite=10):
+    """Agregados dos últimos `dias` dias, lidos só das tabelas de resumo."""
+    desde = datetime.utcnow().date() - timedelta(days=dias - 1)  # Os dias dos resumos são em UTC
+    r = ResumoReservaLivro
+    no_periodo = r.dia >= desde
+    somas = [db.func.sum(r.solicitadas).label('solicitadas'), db.func.sum(r.aceitas).label('aceitas'),
+             db.func.sum(r.recusadas).label('recusadas'), db.func.sum(r.expiradas).label('expiradas')]
+
+    totais = db.session.execute(db.select(*somas).where(no_periodo)).one()
+    decididas = (totais.aceitas or 0) + (totais.recusadas or 0) + (totais.expiradas or 0)
+    mais_solicitados = db.session.execute(
+        db.select(Livro.id, Livro.titulo, Livro.autor, *somas)
+        .join(Livro, Livro.id == r.livro_id)
+        .where(no_periodo)
+        .group_by(Livro.id, Livro.titulo, Livro.autor)
+        .order_by(db.desc('solicitadas'), Livro.id)
+        .limit(limite)
+    ).all()
+    por_assunto = db.session.execute(
+        db.select(Livro.assunto, *somas)
+        .join(Livro, Livro.id == r.livro_id)
+        .where(no_periodo)
+        .group_by(Livro.assunto)
+        .order_by(db.desc('solicitadas'))
+    ).all()
+    c = ResumoReservaCurso
+    por_curso = db.session.execute(
+        db.select(c.curso, db.func.sum(c.solicitadas).label('solicitadas'), db.func.sum(c.aceitas).label('aceitas'),
+                  db.func.sum(c.recusadas).label('recusadas'), db.func.sum(c.expiradas).label('expiradas'))
+        .where(c.dia >= desde)
+        .group_by(c.curso)
+        .order_by(db.desc('solicitadas'))
+    ).all()
+    por_dia = db.session.execute(db.select(r.dia, *somas).where(no_periodo).group_by(r.dia).order_by(r.dia)).all()
+    h = ResumoReservaHora
+    por_hora = db.session.execute(
+        db.select(h.hora, db.func.sum(h.solicitadas).label('solicitadas'))
+        .where(h.dia >= desde)
+        .group_by(h.hora)
+        .order_by(h.hora)
+    ).all()
+    marca = db.session.get(MarcaDeAtualizacao, NOME_DA_MARCA)
+    return Painel(
+        desde=desde,
+        atualizado_ate=marca.atualizado_ate if marca else None,
+        totais=totais,
+        taxa_de_aceitacao=(totais.aceitas or 0) / decididas if decididas else None,
+        mais_solicitados=mais_solicitados,
+        por_assunto=por_assunto,
+        por_curso=por_curso,
+        por_dia=por_dia,
+        por_hora=por_hora,
+    )
@@ -0,0 +1,165 @@
+"""Barramento publish/subscribe das atualizações ao vivo (Server-Sent Events).
+
+Cada conexão em /eventos é uma assinatura com fila própria e limitada; publicar
+nunca bloqueia quem publica. Um assinante lento que enche a fila perde os
+eventos seguintes e recebe um 'recarregar' no lugar. Os últimos eventos ficam
+num histórico curto, repetido para quem reconecta com Last-Event-ID.
+
+Sem EVENTOS_URL o barramento é do próprio processo. Com redis://... as
+publicações passam pelo PUBLISH do Redis e uma thread de cada processo as
+repassa aos assinantes locais, então todos os workers (e o processo de
+`flask tarefas`) enxergam os mesmos eventos.
+"""
+from collections import deque, namedtuple
+import json
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger('biblioteca.eventos')
+
+Evento = namedtuple('Evento', 'id canal tipo dados')
+
+# Sem canal: vai para todos os assinantes. A página busca de novo o que mudou.
+RECARREGAR = Evento(None, None, 'recarregar', {})
+
+
+class LimiteDeConexoes(Exception):
+    """O processo já tem o máximo de assinaturas abertas (EVENTOS_MAX_CONEXOES)."""
+
+
+class Assinatura:
+    """Eventos dos canais assinados, entregues na ordem em que foram publicados."""
+
+    def __init__(self, barramento, canais, max_fila):
+        self.barramento = barramento
+        self.canais = canais
+        self._fila = queue.Queue(max_fila)
+        self._atrasada = False
+
+    def receber(self, evento):
+        if evento.canal is not None and evento.canal not in self.canais:
+            return
+        try:
+            self._fila.put_nowait(evento)
+        except queue.Full:
+            self._atrasada = True
+
+    def proximo(self, espera):
+        """Próximo evento, ou None se nada chegou em `espera` segundos."""
+        if self._atrasada:
+            # A fila encheu: os eventos guardados já não bastam, a página recarrega os dados
+            self._atrasada = False
+            while not self._fila.empty():
+                self._fila.get_nowait()
+            return RECARREGAR
+        try:
+            return self._fila.get(timeout=espera)
+        except queue.Empty:
+            return None
+
+    def cancelar(self):
+        self.barramento.remover(self)
+
+
+class Barramento:
+    """Barramento do próprio processo."""
+
+    def __init__(self, max_fila=100, max_conexoes=100, historico=500):
+        self.max_fila = max_fila
+        self.max_conexoes = max_conexoes
+        self._assinantes = set()
+        self._historico = deque(maxlen=historico)
+        self._sequencia = 0
+        self._trava = threading.Lock()
+        # Os ids começam com a origem, para um Last-Event-ID de outro processo ou
+        # de antes de reiniciar nunca coincidir com um id daqui
+        self._origem = '%x' % time.time_ns()
+
+    def publicar(self, canal, tipo, dados):
+        self.entregar(canal, tipo, dados)
+
+    def entregar(self, canal, tipo, dados):
+        """Numera o evento e coloca na fila de cada assinante."""
+        with self._trava:
+            self._sequencia += 1
+            evento = Evento(f'{self._origem}-{self._sequencia}', canal, tipo, dados)
+            self._historico.append((self._sequencia, evento))
+            for assinatura in self._assinantes:
+                assinatura.receber(evento)
+
+    def assinar(self, canais, ultimo_id=None):
+        """Abre uma assinatura; com `ultimo_id` repete o que foi perdido (ou manda recarregar)."""
+        assinatura = Assinatura(self, frozenset(canais), self.max_fila)
+        with self._trava:
+            if len(self._assinantes) >= self.max_conexoes:
+                raise LimiteDeConexoes('Muitas conexões de atualização ao vivo abertas. Tente novamente.')
+            if ultimo_id:
+                perdidos = self._depois_de(ultimo_id)
+                for evento in ([RECARREGAR] if perdidos is None else perdidos):
+                    assinatura.receber(evento)
+            self._assinantes.add(assinatura)
+        return assinatura
+
+    def remover(self, assinatura):
+        with self._trava:
+            self._assinantes.discard(assinatura)
+
+    def conexoes(self):
+        with self._trava:
+            return len(self._assinantes)
+
+    def _depois_de(self, ultimo_id):
+        """Eventos publicados depois de `ultimo_id`, ou None se não estão mais no histórico."""
+        origem, _, sequencia = ultimo_id.rpartition('-')
+        if origem != self._origem or not sequencia.isdigit():
+            return None
+        sequencia = int(sequencia)
+        if self._historico and self._historico[0][0] > sequencia + 1:
+            return None
+        return [evento for numero, evento in self._historico if numero > sequencia]
+
+
+class BarramentoCompartilhado(Barramento):
+    """Barramento entre processos sobre o PUBLISH/SUBSCRIBE de um cliente no estilo Redis."""
+
+    def __init__(self, cliente, canal='biblioteca:eventos', **opcoes):
+        super().__init__(**opcoes)
+        self.cliente = cliente
+        self.canal = canal
+        self._ouvinte = None
+
+    def publicar(self, canal, tipo, dados):
+        self.cliente.publish(self.canal, json.dumps({'canal': canal, 'tipo': tipo, 'dados': dados}))
+
+    def assinar(self, canais, ultimo_id=None):
+        # A thread sobe com o primeiro assinante, já no worker (depois do fork do --preload)
+        with self._trava:
+            if self._ouvinte is None or not self._ouvinte.is_alive():
+                self._ouvinte = threading.Thread(target=self._repassar, name='eventos', daemon=True)
+                self._ouvinte.start()
+        return super().assinar(canais, ultimo_id)
+
+    def _repassar(self):
+        while True:
+            try:
+                pubsub = self.cliente.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.canal)
+                for mensagem in pubsub.listen():
+                    if mensagem['type'] == 'message':
+                        dados = json.loads(mensagem['data'])
+                        self.entregar(dados['canal'], dados['tipo'], dados['dados'])
+            except Exception:
+                logger.exception('Conexão com o barramento de eventos perdida; reconectando')
+                # O que foi publicado enquanto a conexão estava fora não chega: as páginas recarregam
+                self.entregar(None, RECARREGAR.tipo, RECARREGAR.dados)
+                time.sleep(1)
+
+
+def criar_barramento(url=None, max_fila=100, max_conexoes=100):
+    """Cria o barramento a partir de EVENTOS_URL: vazio para o próprio processo, redis://... para compartilhado."""
+    if not url:
+        return Barramento(max_fila=max_fila, max_conexoes=max_conexoes)
+    import redis  # Dependência opcional, só necessária com EVENTOS_URL
+    return BarramentoCompartilhado(redis.Redis.from_url(url), max_fila=max_fila, max_conexoes=max_conexoes)
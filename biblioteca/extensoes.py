@@ -0,0 +1,24 @@
+"""Extensões compartilhadas, ligadas a cada app por create_app."""
+import sqlite3
+
+from flask_migrate import Migrate
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+
+db = SQLAlchemy()
+migrate = Migrate()
+
+
+def configurar_sqlite(engine, config):
+    """Liga os ajustes de cada nova conexão SQLite do engine (WAL, busy_timeout, mmap)."""
+    @event.listens_for(engine, 'connect')
+    def ajustar_conexao(conexao_dbapi, registro_conexao):
+        # WAL permite leituras enquanto outra conexão grava; NORMAL é seguro com WAL
+        if not isinstance(conexao_dbapi, sqlite3.Connection):
+            return
+        cursor = conexao_dbapi.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute('PRAGMA busy_timeout=%d' % config['SQLITE_BUSY_TIMEOUT_MS'])
+        cursor.execute('PRAGMA mmap_size=%d' % config['SQLITE_MMAP_SIZE'])
+        cursor.close()
@@ -0,0 +1,150 @@
+"""Histórico das reservas e da disponibilidade dos títulos (só inclusões).
+
+O status da reserva é sobrescrito a cada mudança; o histórico guarda cada passo
+(solicitada, aceita, recusada, devolvida, expirada) e o estado do título depois
+de cada alteração. As linhas são montadas no commit da própria alteração, a
+partir do que os eventos ao vivo já leem (servicos.preparar_eventos), e vão
+para uma fila em memória. Uma thread do processo as grava em lotes, um INSERT
+por lote numa transação própria: a requisição não espera pela gravação.
+
+A fila é limitada. Se o banco ficar indisponível por muito tempo as linhas
+que não cabem são descartadas (e contadas) em vez de acumular memória. Ao
+encerrar o processo a fila é gravada antes de sair. A limpeza por idade e por
+quantidade de linhas roda com a manutenção do banco (rotinas.py).
+"""
+from datetime import datetime, timedelta
+import json
+import logging
+import queue
+import threading
+import time
+
+from sqlalchemy import delete, insert, select
+
+from .extensoes import db
+from .modelos import HistoricoReserva
+
+logger = logging.getLogger('biblioteca.historico')
+
+# Colocado na fila por `parar`: acorda a thread que espera para completar um lote
+DESPERTAR = object()
+
+
+def linha_de_historico(tipo, momento, reserva_id=None, livro_id=None, usuario_id=None, status=None, dados=None):
+    """Linha pronta para o INSERT (todas com as mesmas chaves, para irem no mesmo lote)."""
+    return {
+        'momento': momento, 'tipo': tipo, 'reserva_id': reserva_id, 'livro_id': livro_id,
+        'usuario_id': usuario_id, 'status': status,
+        'dados': None if dados is None else json.dumps(dados, ensure_ascii=False),
+    }
+
+
+class GravadorDeHistorico:
+    """Fila limitada e thread que grava o histórico em lotes."""
+
+    def __init__(self, app, max_fila=10000, lote=500, intervalo=1.0):
+        self.app = app
+        self.lote = lote
+        self.intervalo = intervalo  # Espera máxima para juntar um lote (s)
+        self.descartadas = 0
+        self._avisadas = 0
+        self._fila = queue.Queue(max_fila)
+        self._parar = threading.Event()
+        self._thread = None
+        self._trava = threading.Lock()
+
+    def registrar(self, linhas):
+        """Coloca as linhas na fila sem esperar (chamado depois do commit)."""
+        self.iniciar()
+        for linha in linhas:
+            try:
+                self._fila.put_nowait(linha)
+            except queue.Full:
+                with self._trava:
+                    self.descartadas += 1
+
+    def gravar(self, linhas):
+        with self.app.app_context():
+            with db.engine.begin() as conexao:
+                conexao.execute(insert(HistoricoReserva.__table__), linhas)
+
+    # Thread #
+
+    def iniciar(self):
+        """Inicia a thread na primeira linha registrada (já no worker, depois do fork do --preload)."""
+        with self._trava:
+            if self._thread is not None or self._parar.is_set():
+                return
+            self._thread = threading.Thread(target=self._laco, name='historico', daemon=True)
+            self._thread.start()
+
+    def parar(self, espera=None):
+        """Grava o que está na fila e encerra a thread."""
+        self._parar.set()
+        try:
+            self._fila.put_nowait(DESPERTAR)
+        except queue.Full:
+            pass  # Fila cheia: a thread não está esperando
+        if self._thread is not None:
+            self._thread.join(espera)
+            self._thread = None
+
+    def _coletar(self, quantidade, espera):
+        """Até `quantidade` linhas, esperando no máximo `espera` segundos para completar o lote."""
+        linhas = []
+        prazo = time.monotonic() + espera
+        while len(linhas) < quantidade:
+            restante = prazo - time.monotonic()
+            try:
+                linha = self._fila.get(timeout=restante) if restante > 0 else self._fila.get_nowait()
+            except queue.Empty:
+                break
+            if linha is DESPERTAR:
+                break
+            linhas.append(linha)
+        return linhas
+
+    def _laco(self):
+        linhas = []
+        while True:
+            parando = self._parar.is_set()
+            # Encerrando: esvazia a fila sem esperar lotes cheios
+            linhas.extend(self._coletar(self.lote - len(linhas), 0 if parando else self.intervalo))
+            if not linhas:
+                if parando:
+                    return
+                continue
+            try:
+                self.gravar(linhas)
+                linhas = []
+            except Exception:
+                logger.exception('Erro ao gravar %d linha(s) do histórico', len(linhas))
+                if parando:
+                    logger.error('%d linha(s) do histórico perdidas ao encerrar', len(linhas) + self._fila.qsize())
+                    return
+                # O lote espera a próxima tentativa; enquanto isso a fila (limitada) continua recebendo
+                self._parar.wait(self.intervalo)
+            with self._trava:
+                novas, self._avisadas = self.descartadas - self._avisadas, self.descartadas
+            if novas:
+                logger.warning('%d linha(s) do histórico descartadas: fila cheia', novas)
+
+
+def limpar_historico(sessao, dias, max_linhas):
+    """Apaga linhas com mais de `dias` e, acima de `max_linhas`, as mais antigas (0 desliga cada regra)."""
+    h = HistoricoReserva
+    apagadas = 0
+    if dias:
+        apagadas += sessao.execute(
+            delete(h).where(h.momento < datetime.utcnow() - timedelta(days=dias))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+    if max_linhas:
+        # Os ids crescem com o momento: tudo até a (max_linhas + 1)ª linha mais nova sai
+        corte = sessao.scalar(select(h.id).order_by(h.id.desc()).offset(max_linhas).limit(1))
+        if corte is not None:
+            apagadas += sessao.execute(
+                delete(h).where(h.id <= corte).execution_options(synchronize_session=False)
+            ).rowcount
+    sessao.commit()
+    return apagadas
@@ -0,0 +1,375 @@
+"""Importação e exportação em CSV / JSON Lines: catálogo e matrículas de alunos."""
+from collections import Counter
+from datetime import datetime
+from itertools import chain, islice
+import csv
+import io
+import json
+import re
+import time
+
+from flask import Response, abort, current_app, request, stream_with_context
+from sqlalchemy.dialects import postgresql, sqlite
+
+from .extensoes import db
+from .modelos import Aluno, Exemplar, Livro, Usuario
+from .senhas import SENHA_INUTILIZAVEL
+
+############################################################################################################################
+
+# IMPORTAÇÃO DE LIVROS (CSV / JSON Lines)
+
+COLUNAS_LIVRO = ('autor', 'titulo', 'isbn', 'editora', 'assunto', 'edicao')
+
+class RegistroInvalido(ValueError):
+    """Linha do arquivo de importação que não pode ser gravada."""
+
+def digito_isbn13(doze):
+    """Dígito verificador do ISBN-13 (EAN-13) para os 12 primeiros dígitos."""
+    soma = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(doze))
+    return str(-soma % 10)
+
+def normalizar_isbn(valor):
+    """Remove hífens/espaços, confere o dígito verificador e devolve sempre o ISBN-13.
+
+    O ISBN-10 (dígito final 0-9 ou X) vira 978 + os 9 primeiros dígitos + novo dígito
+    verificador: as duas formas do mesmo livro caem na mesma linha do upsert, e o número
+    começa por 978/979, sem zero à esquerda a perder na coluna inteira.
+    """
+    digitos = re.sub(r'[\s-]', '', str(valor or '')).upper()
+    if re.fullmatch(r'\d{13}', digitos):
+        if digito_isbn13(digitos[:12]) != digitos[12]:
+            raise RegistroInvalido(f'ISBN com dígito verificador incorreto: {valor!r}')
+        return int(digitos)
+    if re.fullmatch(r'\d{9}[\dX]', digitos):
+        soma = sum(int(d) * (10 - i) for i, d in enumerate(digitos[:9])) + (10 if digitos[9] == 'X' else int(digitos[9]))
+        if soma % 11:
+            raise RegistroInvalido(f'ISBN com dígito verificador incorreto: {valor!r}')
+        doze = '978' + digitos[:9]
+        return int(doze + digito_isbn13(doze))
+    raise RegistroInvalido(f'ISBN inválido: {valor!r}')
+
+def ler_registros(arquivo, formato):
+    """Lê o arquivo (texto) aos poucos, uma linha por vez, gerando dicionários."""
+    if formato == 'jsonl':
+        for numero, linha in enumerate(arquivo, start=1):
+            if linha.strip():
+                try:
+                    yield numero, json.loads(linha)
+                except ValueError:
+                    yield numero, None
+        return
+
+    primeira = arquivo.readline()
+    try:
+        dialeto = csv.Sniffer().sniff(primeira, delimiters=',;\t')
+    except csv.Error:
+        dialeto = csv.excel
+    leitor = csv.DictReader(chain([primeira], arquivo), dialect=dialeto)
+    leitor.fieldnames = [(nome or '').strip().lower() for nome in leitor.fieldnames or []]
+    for numero, registro in enumerate(leitor, start=2):
+        yield numero, registro
+
+def validar_registro(registro):
+    if not isinstance(registro, dict):
+        raise RegistroInvalido('linha mal formada')
+    livro = {}
+    for coluna in COLUNAS_LIVRO:
+        valor = str(registro.get(coluna) or '').strip()
+        if not valor:
+            raise RegistroInvalido(f'coluna obrigatória vazia: {coluna}')
+        livro[coluna] = valor
+    livro['isbn'] = normalizar_isbn(livro['isbn'])
+    for coluna, tamanho in (('autor', 100), ('titulo', 100), ('editora', 100), ('assunto', 100), ('edicao', 20)):
+        livro[coluna] = livro[coluna][:tamanho]
+    return livro
+
+def instrucao_upsert_livros(sessao):
+    """INSERT ... ON CONFLICT (isbn) DO UPDATE, no dialeto do banco em uso."""
+    dialeto = postgresql if sessao.get_bind().dialect.name == 'postgresql' else sqlite
+    instrucao = dialeto.insert(Livro.__table__)
+    return instrucao.on_conflict_do_update(
+        index_elements=['isbn'],
+        set_={coluna: instrucao.excluded[coluna] for coluna in COLUNAS_LIVRO if coluna != 'isbn'},
+    )
+
+def importar_livros(registros, tamanho_lote=None, sessao=None, max_erros=20):
+    """Grava os livros em lotes, atualizando os que já existem pelo ISBN.
+
+    Cada lote é uma transação com um único executemany; a memória usada depende
+    apenas do tamanho do lote, não do tamanho do arquivo. Títulos novos entram com
+    um exemplar, criado no mesmo lote por um INSERT ... SELECT.
+    """
+    sessao = sessao or db.session
+    tamanho_lote = tamanho_lote or current_app.config['IMPORTACAO_TAMANHO_LOTE']
+    relatorio = Counter()
+    erros = []
+    instrucao = instrucao_upsert_livros(sessao)
+    agora = datetime.utcnow()
+    inicio = time.perf_counter()
+
+    registros = iter(registros)
+    while True:
+        bloco = list(islice(registros, tamanho_lote))
+        if not bloco:
+            break
+
+        lote = {}
+        for numero, registro in bloco:
+            relatorio['lidos'] += 1
+            try:
+                livro = validar_registro(registro)
+            except RegistroInvalido as erro:
+                relatorio['rejeitados'] += 1
+                if len(erros) < max_erros:
+                    erros.append(f'linha {numero}: {erro}')
+                continue
+            if livro['isbn'] in lote:
+                relatorio['duplicados'] += 1  # Repetido dentro do lote: vale a última linha
+            livro.update(data_inclusao=agora, disponivel=True, reservado=False, exemplares_disponiveis=1)
+            lote[livro['isbn']] = livro
+        if not lote:
+            continue
+
+        existentes = set(sessao.scalars(db.select(Livro.isbn).where(Livro.isbn.in_(list(lote)))))
+        sessao.execute(instrucao, list(lote.values()))
+        novos = [isbn for isbn in lote if isbn not in existentes]
+        if novos:
+            sessao.execute(db.insert(Exemplar.__table__).from_select(
+                ['livro_id', 'data_inclusao', 'disponivel', 'reservado'],
+                db.select(Livro.id, db.literal(agora), db.true(), db.false()).where(Livro.isbn.in_(novos)),
+            ))
+        sessao.commit()
+        relatorio['atualizados'] += len(existentes)
+        relatorio['inseridos'] += len(lote) - len(existentes)
+
+    relatorio['segundos'] = time.perf_counter() - inicio
+    return relatorio, erros
+
+def descrever_importacao(relatorio):
+    segundos = relatorio['segundos'] or 1e-9
+    return (f'{relatorio["lidos"]} linhas em {relatorio["segundos"]:.2f}s '
+            f'({relatorio["lidos"] / segundos:.0f} linhas/s): {relatorio["inseridos"]} inseridos, '
+            f'{relatorio["atualizados"]} atualizados, {relatorio["duplicados"]} duplicados, '
+            f'{relatorio["rejeitados"]} rejeitados')
+
+def formato_do_arquivo(nome):
+    return 'jsonl' if nome.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+############################################################################################################################
+
+# SINCRONIZAÇÃO DE MATRÍCULAS (arquivo da secretaria)
+
+COLUNAS_MATRICULA = ('matricula', 'curso', 'email', 'nome')
+DOMINIO_ALUNO = '@aluno-faeterj.com'
+
+def validar_matricula(registro):
+    if not isinstance(registro, dict):
+        raise RegistroInvalido('linha mal formada')
+    aluno = {}
+    for coluna in COLUNAS_MATRICULA:
+        valor = str(registro.get(coluna) or '').strip()
+        if not valor:
+            raise RegistroInvalido(f'coluna obrigatória vazia: {coluna}')
+        aluno[coluna] = valor
+    if len(aluno['matricula']) > 20:
+        raise RegistroInvalido(f'matrícula longa demais: {aluno["matricula"]!r}')
+    if not aluno['email'].endswith(DOMINIO_ALUNO) or len(aluno['email']) > 120:
+        raise RegistroInvalido(f'e-mail deve ser do domínio {DOMINIO_ALUNO}: {aluno["email"]!r}')
+    aluno['nome'] = aluno['nome'][:100]
+    aluno['curso'] = aluno['curso'][:50]
+    aluno['cpf'] = re.sub(r'\D', '', str(registro.get('cpf') or ''))[:11]  # Opcional: vazio mantém o atual
+    return aluno
+
+def tabela_de_matriculas():
+    """Tabela temporária (só da conexão atual) com as linhas válidas do arquivo."""
+    return db.Table(
+        'matricula_importada', db.MetaData(),
+        db.Column('matricula', db.String(20), primary_key=True),
+        db.Column('curso', db.String(50), nullable=False),
+        db.Column('email', db.String(120), nullable=False, index=True),
+        db.Column('nome', db.String(100), nullable=False),
+        db.Column('cpf', db.String(11), nullable=False),
+        db.Column('linha', db.Integer, nullable=False),
+        prefixes=['TEMPORARY'],
+    )
+
+def sincronizar_matriculas(registros, bloquear_ausentes=True, simular=False, tamanho_lote=None, sessao=None,
+                           max_erros=20):
+    """Reconcilia os alunos com o arquivo da secretaria numa única transação.
+
+    O arquivo é carregado em lotes numa tabela temporária; a partir dela, poucos
+    comandos em conjunto (sem um SELECT por aluno) atualizam nome/e-mail/CPF e
+    curso de quem já existe (pela matrícula), inserem os novos em usuario e
+    aluno e bloqueiam os alunos ausentes do arquivo. Alunos novos recebem uma
+    senha inutilizável (nenhum hash é calculado aqui) e definem a senha no
+    primeiro acesso pela tela de cadastro. Ninguém é desbloqueado: um bloqueio
+    do administrador não é desfeito pela secretaria.
+
+    Linhas com e-mail repetido no arquivo ou de outro usuário são recusadas.
+    Com simular=True tudo é desfeito no final e só o relatório vale.
+    """
+    sessao = sessao or db.session
+    tamanho_lote = tamanho_lote or current_app.config['IMPORTACAO_TAMANHO_LOTE']
+    relatorio = Counter()
+    erros = []
+    inicio = time.perf_counter()
+
+    def recusar(linhas, motivo):
+        relatorio['conflitos'] += len(linhas)
+        for linha, email in linhas[:max(max_erros - len(erros), 0)]:
+            erros.append(f'linha {linha}: {motivo}: {email!r}')
+
+    importada = tabela_de_matriculas()
+    # O pysqlite não abre transação antes de DDL: uma simulação ou falha anterior
+    # na mesma conexão do pool pode ter deixado a tabela para trás
+    importada.drop(sessao.connection(), checkfirst=True)
+    importada.create(sessao.connection())
+    dialeto = postgresql if sessao.get_bind().dialect.name == 'postgresql' else sqlite
+    instrucao = dialeto.insert(importada)
+    instrucao = instrucao.on_conflict_do_update(  # Matrícula repetida em outro lote: vale a última linha
+        index_elements=['matricula'],
+        set_={coluna: instrucao.excluded[coluna] for coluna in ('curso', 'email', 'nome', 'cpf', 'linha')},
+    )
+    registros = iter(registros)
+    while True:
+        bloco = list(islice(registros, tamanho_lote))
+        if not bloco:
+            break
+        lote = {}
+        for numero, registro in bloco:
+            relatorio['lidos'] += 1
+            try:
+                aluno = validar_matricula(registro)
+            except RegistroInvalido as erro:
+                relatorio['rejeitados'] += 1
+                if len(erros) < max_erros:
+                    erros.append(f'linha {numero}: {erro}')
+                continue
+            if aluno['matricula'] in lote:
+                relatorio['duplicados'] += 1  # Repetida dentro do lote: vale a última linha
+            lote[aluno['matricula']] = dict(aluno, linha=numero)
+        if lote:
+            sessao.execute(instrucao, list(lote.values()))
+
+    usuario, aluno, m = Usuario.__table__, Aluno.__table__, importada.c
+    mesma_matricula = db.exists().where(aluno.c.matricula == m.matricula)
+
+    # E-mail em duas matrículas do arquivo, ou de um usuário que não é o aluno dessa matrícula
+    repetidos = db.select(m.email).group_by(m.email).having(db.func.count() > 1).correlate(None)
+    recusar(sessao.execute(db.select(m.linha, m.email).where(m.email.in_(repetidos)).order_by(m.linha)).all(),
+            'e-mail repetido no arquivo')
+    sessao.execute(db.delete(importada).where(m.email.in_(repetidos)))
+    de_outro = (db.select(m.matricula).join(usuario, usuario.c.email == m.email)
+                .where(~db.exists().where(aluno.c.id == usuario.c.id, aluno.c.matricula == m.matricula))
+                .correlate(None))
+    recusar(sessao.execute(db.select(m.linha, m.email).where(m.matricula.in_(de_outro)).order_by(m.linha)).all(),
+            'e-mail já pertence a outro usuário')
+    sessao.execute(db.delete(importada).where(m.matricula.in_(de_outro)))
+    carregados = sessao.scalar(db.select(db.func.count()).select_from(importada))
+
+    # Alunos existentes: dados pessoais e curso que mudaram (UPDATE ... FROM)
+    relatorio['atualizados'] = sessao.execute(
+        db.update(usuario)
+        .where(aluno.c.id == usuario.c.id, aluno.c.matricula == m.matricula,
+               db.or_(usuario.c.nome != m.nome, usuario.c.email != m.email,
+                      db.and_(m.cpf != '', usuario.c.cpf != m.cpf)))
+        .values(nome=m.nome, email=m.email, cpf=db.case((m.cpf != '', m.cpf), else_=usuario.c.cpf))
+    ).rowcount
+    relatorio['trocas de curso'] = sessao.execute(
+        db.update(aluno).where(aluno.c.matricula == m.matricula, aluno.c.curso != m.curso).values(curso=m.curso)
+    ).rowcount
+
+    # Alunos novos: usuario primeiro, depois aluno com o id gerado (ligados pelo e-mail, que é único)
+    sessao.execute(db.insert(usuario).from_select(
+        ['nome', 'email', 'cpf', 'senha', 'tipo_usuario', 'status'],
+        db.select(m.nome, m.email, m.cpf, db.literal(SENHA_INUTILIZAVEL), db.literal('aluno'), db.false())
+        .where(~mesma_matricula).order_by(m.linha),
+    ))
+    relatorio['inseridos'] = sessao.execute(db.insert(aluno).from_select(
+        ['id', 'matricula', 'curso'],
+        db.select(usuario.c.id, m.matricula, m.curso).join(usuario, usuario.c.email == m.email).where(~mesma_matricula),
+    )).rowcount
+
+    # Ausentes do arquivo; um arquivo sem nenhuma linha aproveitável não bloqueia ninguém
+    if bloquear_ausentes and carregados:
+        relatorio['bloqueados'] = sessao.execute(
+            db.update(usuario)
+            .where(usuario.c.id.in_(db.select(aluno.c.id).where(
+                       ~db.exists().where(m.matricula == aluno.c.matricula))),
+                   usuario.c.status == db.false())
+            .values(status=True)
+        ).rowcount
+
+    importada.drop(sessao.connection())
+    if simular:
+        sessao.rollback()
+    else:
+        sessao.commit()
+    relatorio['segundos'] = time.perf_counter() - inicio
+    return relatorio, erros
+
+def descrever_sincronizacao(relatorio):
+    segundos = relatorio['segundos'] or 1e-9
+    return (f'{relatorio["lidos"]} linhas em {relatorio["segundos"]:.2f}s '
+            f'({relatorio["lidos"] / segundos:.0f} linhas/s): {relatorio["inseridos"]} inseridos, '
+            f'{relatorio["atualizados"]} atualizados, {relatorio["trocas de curso"]} trocas de curso, '
+            f'{relatorio["bloqueados"]} bloqueados, {relatorio["duplicados"]} duplicados, '
+            f'{relatorio["conflitos"]} conflitos, {relatorio["rejeitados"]} rejeitados')
+
+############################################################################################################################
+
+# EXPORTAÇÃO (CSV / NDJSON)
+
+def data_do_filtro(nome):
+    """Lê um parâmetro de data (AAAA-MM-DD) da requisição; 400 se mal formado."""
+    valor = request.args.get(nome)
+    if not valor:
+        return None
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d')
+    except ValueError:
+        abort(400, f'Data inválida em "{nome}", use AAAA-MM-DD.')
+
+def valor_exportado(valor):
+    return valor.isoformat() if isinstance(valor, datetime) else valor
+
+def gerar_exportacao(consulta, formato):
+    """Gera o arquivo em pedaços, à medida que as linhas chegam do banco.
+
+    yield_per busca as linhas em lotes (cursor do lado do servidor no PostgreSQL),
+    então a memória fica constante e os primeiros bytes saem imediatamente.
+    """
+    resultado = db.session.execute(
+        consulta.execution_options(yield_per=current_app.config['EXPORTACAO_TAMANHO_LOTE'])
+    )
+    colunas = list(resultado.keys())
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+
+    if formato == 'csv':
+        escritor.writerow(colunas)
+    for linhas in resultado.partitions():
+        for linha in linhas:
+            if formato == 'csv':
+                escritor.writerow([valor_exportado(v) for v in linha])
+            else:
+                buffer.write(json.dumps({c: valor_exportado(v) for c, v in zip(colunas, linha)},
+                                        ensure_ascii=False))
+                buffer.write('\n')
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def resposta_de_exportacao(consulta, nome):
+    formato = request.args.get('formato', 'csv')
+    if formato not in ('csv', 'ndjson'):
+        abort(400, 'Formato deve ser csv ou ndjson.')
+    tipo = 'text/csv' if formato == 'csv' else 'application/x-ndjson'
+    return Response(
+        stream_with_context(gerar_exportacao(consulta, formato)),
+        mimetype=tipo,
+        headers={'Content-Disposition': f'attachment; filename={nome}.{formato}'},
+    )
@@ -0,0 +1,116 @@
+"""Limite de tentativas (janela deslizante) com bloqueio temporário.
+
+Cada chave (ex.: o IP ou o e-mail de quem tenta entrar) pode registrar até
+`limite` eventos em `janela` segundos; ao atingir o limite, fica bloqueada por
+`bloqueio` segundos. A consulta ao bloqueio não toca no banco de dados, então
+uma rajada de tentativas é recusada antes de qualquer SELECT.
+"""
+from collections import OrderedDict, deque
+import threading
+import time
+
+
+class LimitadorLocal:
+    """Limitador do próprio processo, com quantidade de chaves limitada (LRU)."""
+
+    def __init__(self, limite=5, janela=300, bloqueio=900, max_chaves=10000):
+        self.limite = limite
+        self.janela = janela
+        self.bloqueio = bloqueio
+        self.max_chaves = max_chaves
+        # chave -> instantes dos últimos eventos (no máximo `limite` deles)
+        self._eventos = OrderedDict()
+        # chave -> instante em que o bloqueio termina
+        self._bloqueios = OrderedDict()
+        self._trava = threading.Lock()
+
+    def bloqueado(self, chave):
+        """Segundos que faltam para o bloqueio da chave terminar (0 se não está bloqueada)."""
+        with self._trava:
+            fim = self._bloqueios.get(chave)
+            if fim is None:
+                return 0
+            restante = fim - time.monotonic()
+            if restante <= 0:
+                del self._bloqueios[chave]
+                return 0
+            return restante
+
+    def registrar(self, chave):
+        """Registra um evento; devolve os segundos de bloqueio se o limite foi atingido (senão 0)."""
+        agora = time.monotonic()
+        with self._trava:
+            eventos = self._eventos.get(chave)
+            if eventos is None:
+                eventos = self._eventos[chave] = deque(maxlen=self.limite)
+            self._eventos.move_to_end(chave)
+            eventos.append(agora)
+            # Com a fila cheia, o evento mais antigo diz se houve `limite` eventos dentro da janela
+            if len(eventos) == self.limite and agora - eventos[0] <= self.janela:
+                del self._eventos[chave]
+                self._bloqueios[chave] = agora + self.bloqueio
+                self._bloqueios.move_to_end(chave)
+                self._descartar_excesso(self._bloqueios)
+                return self.bloqueio
+            self._descartar_excesso(self._eventos)
+            return 0
+
+    def limpar(self, chave):
+        with self._trava:
+            self._eventos.pop(chave, None)
+            self._bloqueios.pop(chave, None)
+
+    def _descartar_excesso(self, itens):
+        while len(itens) > self.max_chaves:
+            itens.popitem(last=False)
+
+
+class LimitadorCompartilhado:
+    """Limitador compartilhado entre workers, sobre um cliente no estilo Redis.
+
+    A janela deslizante é aproximada por duas janelas fixas (a atual e a
+    anterior, ponderada pelo quanto dela ainda cai dentro da janela). O cliente
+    precisa de get, set(ex=), incr, expire e delete; qualquer objeto com essa
+    interface (ex.: um dublê em memória nos testes) pode substituí-lo.
+    """
+
+    def __init__(self, cliente, limite=5, janela=300, bloqueio=900, prefixo='biblioteca:limite:'):
+        self.cliente = cliente
+        self.limite = limite
+        self.janela = janela
+        self.bloqueio = bloqueio
+        self.prefixo = prefixo
+
+    def bloqueado(self, chave):
+        fim = self.cliente.get(self.prefixo + 'bloqueio:' + chave)
+        if fim is None:
+            return 0
+        return max(float(fim) - time.time(), 0)
+
+    def registrar(self, chave):
+        agora = time.time()
+        numero, decorrido = divmod(agora, self.janela)
+        atual = f'{self.prefixo}{chave}:{int(numero)}'
+        contagem = self.cliente.incr(atual)
+        if contagem == 1:
+            self.cliente.expire(atual, int(self.janela * 2))
+        anterior = int(self.cliente.get(f'{self.prefixo}{chave}:{int(numero) - 1}') or 0)
+        if contagem + anterior * (1 - decorrido / self.janela) >= self.limite:
+            self.cliente.set(self.prefixo + 'bloqueio:' + chave, agora + self.bloqueio, ex=int(self.bloqueio))
+            self.cliente.delete(atual)
+            return self.bloqueio
+        return 0
+
+    def limpar(self, chave):
+        numero = int(time.time() // self.janela)
+        self.cliente.delete(self.prefixo + 'bloqueio:' + chave, f'{self.prefixo}{chave}:{numero}',
+                            f'{self.prefixo}{chave}:{numero - 1}')
+
+
+def criar_limitador(url=None, limite=5, janela=300, bloqueio=900, max_chaves=10000, prefixo='biblioteca:limite:'):
+    """Cria o limitador a partir de LIMITE_URL: vazio para memória local, redis://... para compartilhado."""
+    if not url:
+        return LimitadorLocal(limite=limite, janela=janela, bloqueio=bloqueio, max_chaves=max_chaves)
+    import redis  # Dependência opcional, só necessária com LIMITE_URL
+    return LimitadorCompartilhado(redis.Redis.from_url(url), limite=limite, janela=janela, bloqueio=bloqueio,
+                                  prefixo=prefixo)
@@ -0,0 +1,180 @@
+"""Instrumentação das requisições e das consultas SQL.
+
+Registra, por rota, a latência (histograma), a quantidade e o tempo das
+consultas SQL; avisa no log sobre consultas lentas e sobre o padrão N+1 (a mesma
+consulta repetida muitas vezes numa requisição). Os números ficam na memória do
+processo e são expostos no formato texto do Prometheus. Nas respostas em fluxo
+a requisição só é contada quando o corpo termina de ser enviado, com as consultas
+feitas durante o envio.
+"""
+from bisect import bisect_left
+from collections import Counter, defaultdict
+import logging
+import threading
+import time
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+
+logger = logging.getLogger('biblioteca.metricas')
+
+# Limites (em segundos) dos baldes do histograma de latência
+BALDES_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Limites dos baldes de consultas SQL por requisição
+BALDES_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 500)
+
+
+class Histograma:
+    def __init__(self, baldes):
+        self.baldes = baldes
+        self.contagens = [0] * (len(baldes) + 1)  # O último é o +Inf
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.contagens[bisect_left(self.baldes, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+    def linhas(self, nome, rotulos):
+        acumulado = 0
+        for limite, contagem in zip(self.baldes + ('+Inf',), self.contagens):
+            acumulado += contagem
+            yield f'{nome}_bucket{{{rotulos},le="{limite}"}} {acumulado}'
+        yield f'{nome}_sum{{{rotulos}}} {self.soma}'
+        yield f'{nome}_count{{{rotulos}}} {self.total}'
+
+
+def _rotulo(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+class Metricas:
+    def __init__(self, consulta_lenta=0.1, limite_n_mais_um=10, server_timing=False):
+        self.consulta_lenta = consulta_lenta
+        self.limite_n_mais_um = limite_n_mais_um
+        self.server_timing = server_timing
+        self._trava = threading.Lock()
+        self._latencia = defaultdict(lambda: Histograma(BALDES_LATENCIA))
+        self._consultas_por_requisicao = defaultdict(lambda: Histograma(BALDES_CONSULTAS))
+        self._respostas = Counter()
+        self._sql_total = Counter()
+        self._sql_segundos = Counter()
+        self._sql_lentas = Counter()
+        self._n_mais_um = Counter()
+
+    def instalar(self, app, engine):
+        """Liga os ganchos do Flask e do SQLAlchemy e registra a rota /metrics."""
+        event.listen(engine, 'before_cursor_execute', self._antes_da_consulta)
+        event.listen(engine, 'after_cursor_execute', self._depois_da_consulta)
+        app.before_request(self._inicio_da_requisicao)
+        app.after_request(self._fim_da_requisicao)
+        app.add_url_rule('/metrics', 'metricas', self.exportar)
+
+    # SQLAlchemy #
+
+    def _antes_da_consulta(self, conexao, cursor, instrucao, parametros, contexto, executemany):
+        conexao.info.setdefault('inicio_consulta', []).append(time.perf_counter())
+
+    def _depois_da_consulta(self, conexao, cursor, instrucao, parametros, contexto, executemany):
+        duracao = time.perf_counter() - conexao.info['inicio_consulta'].pop()
+        rota = (request.endpoint or 'desconhecida') if has_request_context() else '-'
+
+        if duracao >= self.consulta_lenta:
+            with self._trava:
+                self._sql_lentas[rota] += 1
+            logger.warning('Consulta lenta (%.1f ms) em %s: %s', duracao * 1000, rota, instrucao)
+
+        if not has_request_context() or not hasattr(g, 'sql_total'):
+            return
+        g.sql_total += 1
+        g.sql_segundos += duracao
+        g.sql_repeticoes[instrucao] += 1
+        if g.sql_repeticoes[instrucao] == self.limite_n_mais_um:
+            with self._trava:
+                self._n_mais_um[rota] += 1
+            logger.warning('Possível N+1 em %s: a mesma consulta rodou %d vezes na requisição: %s',
+                           rota, self.limite_n_mais_um, instrucao)
+
+    # Flask #
+
+    def _inicio_da_requisicao(self):
+        g.inicio_requisicao = time.perf_counter()
+        g.sql_total = 0
+        g.sql_segundos = 0.0
+        g.sql_repeticoes = Counter()
+
+    def _fim_da_requisicao(self, resposta):
+        if not hasattr(g, 'inicio_requisicao'):
+            return resposta
+        chave = (request.endpoint or 'desconhecida', request.method)
+        estado = g._get_current_object()
+        parcial = resposta.is_streamed
+        if parcial:
+            # Corpo em fluxo (stream_template, exportações): as linhas ainda vão ser lidas
+            # e enviadas; a medição fecha quando o servidor termina de enviar a resposta
+            resposta.call_on_close(lambda: self._registrar(chave, resposta.status_code, estado))
+        else:
+            self._registrar(chave, resposta.status_code, estado)
+
+        if self.server_timing:
+            # Em fluxo os cabeçalhos saem antes do corpo: o valor cobre só até aqui
+            duracao = time.perf_counter() - estado.inicio_requisicao
+            descricao = ';desc="até os cabeçalhos"' if parcial else ''
+            resposta.headers.add('Server-Timing', f'app;dur={duracao * 1000:.1f}{descricao}')
+            resposta.headers.add('Server-Timing',
+                                 f'db;dur={estado.sql_segundos * 1000:.1f};desc="{estado.sql_total} consultas"')
+        return resposta
+
+    def _registrar(self, chave, codigo, estado):
+        duracao = time.perf_counter() - estado.inicio_requisicao
+        with self._trava:
+            self._latencia[chave].observar(duracao)
+            self._consultas_por_requisicao[chave].observar(estado.sql_total)
+            self._respostas[chave + (codigo,)] += 1
+            self._sql_total[chave] += estado.sql_total
+            self._sql_segundos[chave] += estado.sql_segundos
+
+    # Exportação #
+
+    def exportar(self):
+        return Response('\n'.join(self.linhas()) + '\n', mimetype='text/plain; version=0.0.4')
+
+    def linhas(self):
+        with self._trava:
+            yield '# HELP biblioteca_requisicao_segundos Latência das requisições por rota.'
+            yield '# TYPE biblioteca_requisicao_segundos histogram'
+            for (rota, metodo), histograma in sorted(self._latencia.items()):
+                yield from histograma.linhas('biblioteca_requisicao_segundos',
+                                             f'rota="{_rotulo(rota)}",metodo="{metodo}"')
+
+            yield '# HELP biblioteca_respostas_total Respostas por rota e código HTTP.'
+            yield '# TYPE biblioteca_respostas_total counter'
+            for (rota, metodo, codigo), total in sorted(self._respostas.items()):
+                yield f'biblioteca_respostas_total{{rota="{_rotulo(rota)}",metodo="{metodo}",codigo="{codigo}"}} {total}'
+
+            yield '# HELP biblioteca_sql_consultas_por_requisicao Consultas SQL em cada requisição.'
+            yield '# TYPE biblioteca_sql_consultas_por_requisicao histogram'
+            for (rota, metodo), histograma in sorted(self._consultas_por_requisicao.items()):
+                yield from histograma.linhas('biblioteca_sql_consultas_por_requisicao',
+                                             f'rota="{_rotulo(rota)}",metodo="{metodo}"')
+
+            yield '# HELP biblioteca_sql_consultas_total Consultas SQL executadas por rota.'
+            yield '# TYPE biblioteca_sql_consultas_total counter'
+            for (rota, metodo), total in sorted(self._sql_total.items()):
+                yield f'biblioteca_sql_consultas_total{{rota="{_rotulo(rota)}",metodo="{metodo}"}} {total}'
+
+            yield '# HELP biblioteca_sql_segundos_total Tempo gasto em SQL por rota.'
+            yield '# TYPE biblioteca_sql_segundos_total counter'
+            for (rota, metodo), total in sorted(self._sql_segundos.items()):
+                yield f'biblioteca_sql_segundos_total{{rota="{_rotulo(rota)}",metodo="{metodo}"}} {total}'
+
+            yield '# HELP biblioteca_sql_lentas_total Consultas acima do limite de consulta lenta.'
+            yield '# TYPE biblioteca_sql_lentas_total counter'
+            for rota, total in sorted(self._sql_lentas.items()):
+                yield f'biblioteca_sql_lentas_total{{rota="{_rotulo(rota)}"}} {total}'
+
+            yield '# HELP biblioteca_n_mais_um_total Requisições em que uma consulta se repetiu (N+1).'
+            yield '# TYPE biblioteca_n_mais_um_total counter'
+            for rota, total in sorted(self._n_mais_um.items()):
+                yield f'biblioteca_n_mais_um_total{{rota="{_rotulo(rota)}"}} {total}'
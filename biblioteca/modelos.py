@@ -0,0 +1,247 @@
+from datetime import datetime
+
+from sqlalchemy import column, table, text
+
+from .extensoes import db
+
+
+class Usuario(db.Model):
+    __tablename__ = 'usuario'
+    __table_args__ = (
+        # Usuários de um tipo, paginados pelo id (API, bloqueio em lote)
+        db.Index('ix_usuario_tipo_usuario_id', 'tipo_usuario', 'id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    nome = db.Column(db.String(100), nullable=False)
+    email = db.Column(db.String(120), unique=True, nullable=False)
+    cpf = db.Column(db.String(11), nullable=False)
+    senha = db.Column(db.String(200), nullable=False)
+    tipo_usuario = db.Column(db.String(10), default='aluno')
+    status = db.Column(db.Boolean, default=False)  # Status (True ou False)
+
+class Aluno(Usuario):
+    __tablename__ = 'aluno'
+    id = db.Column(db.Integer, db.ForeignKey('usuario.id'), primary_key=True)
+    matricula = db.Column(db.String(20), nullable=False, index=True)
+    curso = db.Column(db.String(50), nullable=False, index=True)  # Bloqueio em lote por curso
+
+class Externo(Usuario):
+    __tablename__ = 'externo'
+    id = db.Column(db.Integer, db.ForeignKey('usuario.id'), primary_key=True)  # Chave estrangeira referenciando Usuario
+
+    
+class Livro(db.Model):
+    __tablename__ = 'livro'
+    __table_args__ = (
+        # Catálogo filtrado por disponibilidade, paginado pelo id
+        db.Index('ix_livro_disponivel_id', 'disponivel', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    autor = db.Column(db.String(100), nullable=False)
+    titulo = db.Column(db.String(100), nullable=False)
+    isbn = db.Column(db.BigInteger, unique=True, nullable=False)  # ISBN-13 não cabe em INTEGER no PostgreSQL
+    editora = db.Column(db.String(100), nullable=False)
+    assunto = db.Column(db.String(100), nullable=False, index=True)  # Disponibilidade em lote e estatísticas por assunto
+    edicao = db.Column(db.String(20), nullable=False)
+    data_inclusao = db.Column(db.DateTime, default=datetime.utcnow)  # Data de inclusão
+    disponivel = db.Column(db.Boolean, default=True)  # Disponibilidade (True ou False)
+    reservado = db.Column(db.Boolean, default=False)  # Todos os exemplares estão reservados/emprestados
+    # Contador de exemplares livres, mantido na mesma transação que reserva/devolve um exemplar
+    exemplares_disponiveis = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # Relacionamento com Exemplares
+    exemplares = db.relationship('Exemplar', backref='livro', lazy=True)
+
+# Modelo de Exemplar (cópia física de um título)
+class Exemplar(db.Model):
+    __tablename__ = 'exemplar'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    data_inclusao = db.Column(db.DateTime, default=datetime.utcnow)  # Data de inclusão
+    disponivel = db.Column(db.Boolean, default=True)  # Na estante (False enquanto emprestado)
+    reservado = db.Column(db.Boolean, default=False)  # Separado para uma reserva pendente
+
+    # Relacionamento com Título
+    livro_id = db.Column(db.Integer, db.ForeignKey('livro.id'), nullable=False, index=True)
+
+    def __init__(self, livro_id, disponivel=True):
+        self.livro_id = livro_id
+        self.disponivel = disponivel
+        self.reservado = False  # Inicialmente, não está reservado
+
+class Reserva(db.Model):
+    __table_args__ = (
+        # Um usuário não pode ter duas solicitações pendentes para o mesmo livro
+        db.Index('uq_reserva_pendente', 'usuario_id', 'livro_id', unique=True,
+                 sqlite_where=text("status = 'pendente'"),
+                 postgresql_where=text("status = 'pendente'")),
+        # Reservas de um título / de um usuário; no PostgreSQL o índice parcial acima
+        # não atende consultas com o status passado como parâmetro
+        db.Index('ix_reserva_livro_status', 'livro_id', 'status'),
+        db.Index('ix_reserva_usuario_livro_status', 'usuario_id', 'livro_id', 'status'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    livro_id = db.Column(db.Integer, db.ForeignKey('livro.id'))
+    livro = db.relationship('Livro', backref='reservas')
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id'))
+    usuario = db.relationship('Usuario', backref='reservas')
+    exemplar_id = db.Column(db.Integer, db.ForeignKey('exemplar.id'))  # Cópia separada para esta reserva
+    exemplar = db.relationship('Exemplar')
+    status = db.Column(db.String(20), default='pendente', index=True)  # 'pendente', 'aceito', 'recusado', 'devolvido' ou 'expirado'
+    # Datas indexadas: a atualização das estatísticas busca o que mudou desde a última rodada
+    data_inclusao = db.Column(db.DateTime, default=datetime.utcnow, index=True)  # Data da solicitação
+    data_decisao = db.Column(db.DateTime, index=True)  # Última mudança de status
+    data_lembrete = db.Column(db.DateTime)  # Lembrete de devolução atrasada já enviado
+
+    def __init__(self, livro_id, usuario_id, exemplar_id=None):
+        self.livro_id = livro_id
+        self.usuario_id = usuario_id
+        self.exemplar_id = exemplar_id
+        self.status = 'pendente'
+
+# Fila de espera por um título sem exemplares livres
+class FilaEspera(db.Model):
+    __tablename__ = 'fila_espera'
+    __table_args__ = (
+        # Um lugar por usuário em cada fila
+        db.UniqueConstraint('usuario_id', 'livro_id', name='uq_fila_espera_usuario_livro'),
+        # Ordem de atendimento: próximo da fila e posição são buscas neste índice
+        db.Index('ix_fila_espera_ordem', 'livro_id', 'prioridade', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)  # Crescente: garante o FIFO
+    livro_id = db.Column(db.Integer, db.ForeignKey('livro.id'), nullable=False)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id'), nullable=False)
+    prioridade = db.Column(db.Integer, nullable=False)
+    data_inclusao = db.Column(db.DateTime, default=datetime.utcnow)
+
+    
+
+# Tarefa em segundo plano (ver biblioteca/tarefas.py)
+class Tarefa(db.Model):
+    __tablename__ = 'tarefa'
+    __table_args__ = (
+        # Busca das tarefas vencidas
+        db.Index('ix_tarefa_fila', 'status', 'executar_em'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(50), nullable=False)
+    dados = db.Column(db.Text)  # JSON
+    status = db.Column(db.String(20), nullable=False, default='pendente')  # 'pendente', 'executando', 'concluida' ou 'falhou'
+    tentativas = db.Column(db.Integer, nullable=False, default=0)
+    executar_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    dono = db.Column(db.String(32))  # Worker que está executando
+    erro = db.Column(db.Text)
+    data_inclusao = db.Column(db.DateTime, default=datetime.utcnow)
+    atualizada_em = db.Column(db.DateTime)
+
+# Histórico das reservas e da disponibilidade dos títulos: só recebe inclusões,
+# gravadas em lote por uma thread (ver biblioteca/historico.py)
+class HistoricoReserva(db.Model):
+    __tablename__ = 'historico_reserva'
+    __table_args__ = (
+        # Linha do tempo de uma reserva / de um título
+        db.Index('ix_historico_reserva_reserva', 'reserva_id', 'id'),
+        db.Index('ix_historico_reserva_livro', 'livro_id', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    momento = db.Column(db.DateTime, nullable=False, index=True)  # Commit da alteração; a limpeza apaga pelos mais antigos
+    tipo = db.Column(db.String(20), nullable=False)  # 'reserva', 'livro' ou 'assunto' (disponibilidade em lote)
+    # Sem chaves estrangeiras: o histórico não trava nem impede a exclusão das linhas de origem
+    reserva_id = db.Column(db.Integer)
+    livro_id = db.Column(db.Integer)
+    usuario_id = db.Column(db.Integer)
+    status = db.Column(db.String(20))  # Status da reserva, ou 'disponivel'/'indisponivel' do título
+    dados = db.Column(db.Text)  # JSON com o restante do estado
+
+# ESTATÍSTICAS (agregados recalculados por dia; ver biblioteca/estatisticas.py) #
+
+# Reservas solicitadas em cada dia, por título
+class ResumoReservaLivro(db.Model):
+    __tablename__ = 'resumo_reserva_livro'
+
+    dia = db.Column(db.Date, primary_key=True)
+    livro_id = db.Column(db.Integer, db.ForeignKey('livro.id'), primary_key=True)
+    solicitadas = db.Column(db.Integer, nullable=False, default=0)
+    aceitas = db.Column(db.Integer, nullable=False, default=0)  # 'aceito' ou 'devolvido'
+    recusadas = db.Column(db.Integer, nullable=False, default=0)
+    expiradas = db.Column(db.Integer, nullable=False, default=0)
+
+# Reservas solicitadas em cada dia, por curso (ou tipo de usuário, para quem não é aluno)
+class ResumoReservaCurso(db.Model):
+    __tablename__ = 'resumo_reserva_curso'
+
+    dia = db.Column(db.Date, primary_key=True)
+    curso = db.Column(db.String(50), primary_key=True)
+    solicitadas = db.Column(db.Integer, nullable=False, default=0)
+    aceitas = db.Column(db.Integer, nullable=False, default=0)
+    recusadas = db.Column(db.Integer, nullable=False, default=0)
+    expiradas = db.Column(db.Integer, nullable=False, default=0)
+
+# Reservas solicitadas em cada hora (UTC) do dia
+class ResumoReservaHora(db.Model):
+    __tablename__ = 'resumo_reserva_hora'
+
+    dia = db.Column(db.Date, primary_key=True)
+    hora = db.Column(db.Integer, primary_key=True)
+    solicitadas = db.Column(db.Integer, nullable=False, default=0)
+
+# Até quando cada agregado está atualizado (marca d'água da atualização incremental)
+class MarcaDeAtualizacao(db.Model):
+    __tablename__ = 'marca_de_atualizacao'
+
+    nome = db.Column(db.String(50), primary_key=True)
+    atualizado_ate = db.Column(db.DateTime, nullable=False)
+
+# ÍNDICE DE BUSCA (SQLite FTS5) #
+
+# Tabela virtual com conteúdo externo: o texto fica apenas em `livro`, o índice é
+# mantido pelos gatilhos abaixo (mesma DDL da migração 3a1c5e7b9d20).
+LIVRO_FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS livro_fts USING fts5(
+        titulo, autor, assunto, editora, isbn,
+        content='livro', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS livro_fts_ai AFTER INSERT ON livro BEGIN
+        INSERT INTO livro_fts(rowid, titulo, autor, assunto, editora, isbn)
+        VALUES (new.id, new.titulo, new.autor, new.assunto, new.editora, new.isbn);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS livro_fts_ad AFTER DELETE ON livro BEGIN
+        INSERT INTO livro_fts(livro_fts, rowid, titulo, autor, assunto, editora, isbn)
+        VALUES ('delete', old.id, old.titulo, old.autor, old.assunto, old.editora, old.isbn);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS livro_fts_au AFTER UPDATE OF titulo, autor, assunto, editora, isbn ON livro BEGIN
+        INSERT INTO livro_fts(livro_fts, rowid, titulo, autor, assunto, editora, isbn)
+        VALUES ('delete', old.id, old.titulo, old.autor, old.assunto, old.editora, old.isbn);
+        INSERT INTO livro_fts(rowid, titulo, autor, assunto, editora, isbn)
+        VALUES (new.id, new.titulo, new.autor, new.assunto, new.editora, new.isbn);
+    END""",
+]
+
+livro_fts = table('livro_fts', column('rowid'), column('rank'))
+
+def usa_fts():
+    return db.engine.dialect.name == 'sqlite'
+
+def criar_indice_busca():
+    """Cria o índice FTS5 (se ainda não existir) e o popula a partir de `livro`."""
+    if not usa_fts():
+        return
+    with db.engine.begin() as conexao:
+        existe = conexao.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'livro_fts'"
+        )).first()
+        for comando in LIVRO_FTS_DDL:
+            conexao.execute(text(comando))
+        if not existe:
+            conexao.execute(text("INSERT INTO livro_fts(livro_fts) VALUES ('rebuild')"))
+
+def criar_esquema():
+    """Cria as tabelas e o índice de busca num banco vazio (sem passar pelas migrações)."""
+    db.create_all()
+    criar_indice_busca()
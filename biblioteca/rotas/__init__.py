@@ -0,0 +1,4 @@
+"""Blueprints das telas e da API."""
+from . import admin, api, auth, catalogo, eventos, reservas
+
+BLUEPRINTS = (auth.bp, catalogo.bp, reservas.bp, admin.bp, api.bp, eventos.bp)
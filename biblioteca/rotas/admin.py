@@ -0,0 +1,240 @@
+"""Telas e ações de administração: livros, usuários, importação e exportação."""
+from datetime import timedelta
+import io
+
+from flask import Blueprint, current_app, flash, redirect, render_template, request, stream_template, url_for
+from sqlalchemy.exc import IntegrityError
+
+from ..consultas import paginar_em_fluxo
+from ..estatisticas import painel_de_estatisticas
+from ..extensoes import db
+from ..importacao import (RegistroInvalido, data_do_filtro, descrever_importacao, formato_do_arquivo, importar_livros,
+                          ler_registros, normalizar_isbn, resposta_de_exportacao)
+from ..modelos import Aluno, Livro, Reserva, Usuario
+from ..senhas import gerar_hash_senha
+from ..servicos import adicionar_exemplares, alterar_bloqueio, alterar_disponibilidade, anunciar_livros, atender_fila
+from .auth import exigir_bibliotecario
+
+bp = Blueprint('admin', __name__)
+
+@bp.route('/painel-admin')
+def painelAdmin():
+    return render_template('painel-admin.html')
+
+@bp.route('/painel-admin/estatisticas')
+def painelEstatisticas():
+    # Lê só as tabelas de resumo, atualizadas pela tarefa 'atualizar-estatisticas'
+    dias = min(max(request.args.get('dias', current_app.config['ESTATISTICAS_DIAS'], type=int), 1), 366)
+    return render_template('painel-estatisticas.html', painel=painel_de_estatisticas(dias), dias=dias)
+
+@bp.route('/listar-usuarios')
+def listarUsuarios():
+    # Buscando uma página de usuários; as linhas são enviadas conforme chegam do banco
+    pagina = paginar_em_fluxo(Usuario.query, Usuario.id)
+    return stream_template('lib-usuarios.html', usuarios=pagina.itens, pagina=pagina)
+
+@bp.route('/painel-lib')
+def painelLib():
+    pagina = paginar_em_fluxo(Livro.query, Livro.id)  # Buscando uma página de livros
+    return stream_template('painel-lib.html', livros=pagina.itens, pagina=pagina)
+
+@bp.route('/tela-cadastro-livro')
+def telaCadastroLivro():
+    return render_template('tela-cadastro-livro.html')
+
+@bp.route('/tela-cadastro-usuario')
+def telaCadastroUsuario():
+    return render_template('tela-cadastro-usuario.html')
+
+@bp.route('/cadastrar-usuario', methods=['GET', 'POST'])
+def cadastrarUsuario():
+    if request.method == 'POST':
+        nome = request.form['nome']
+        cpf = request.form['cpf']
+        email = request.form['email']
+        senha = request.form['senha']
+        tipo_usuario = request.form['tipo_usuario']
+
+        usuario = Usuario(nome=nome, cpf=cpf, email=email, senha=gerar_hash_senha(senha), tipo_usuario=tipo_usuario)
+        db.session.add(usuario)
+        db.session.commit()
+
+        return redirect(url_for('admin.painelAdmin'))
+
+    return render_template('tela-cadastro-usuario.html')
+
+@bp.route('/cadastrar-livro', methods=['GET', 'POST'])
+def cadastrarLivro():
+    if request.method == 'POST':
+        autor = request.form['autor']
+        titulo = request.form['titulo']
+        editora = request.form['editora']
+        assunto = request.form['assunto']
+        edicao = request.form['edicao']
+        quantidade = request.form.get('quantidade', 1, type=int) or 1
+        # Mesma chave da importação: ISBN-13 numérico (ISBN-10 convertido)
+        try:
+            isbn = normalizar_isbn(request.form['isbn'])
+        except RegistroInvalido as erro:
+            flash(str(erro), 'error')
+            return redirect(url_for('admin.telaCadastroLivro'))
+
+        livro = Livro(autor=autor, titulo=titulo, isbn=isbn, editora=editora, assunto=assunto, edicao=edicao)
+        db.session.add(livro)
+        try:
+            db.session.flush()
+        except IntegrityError:
+            db.session.rollback()
+            flash(f'Já existe um livro com o ISBN {isbn}.', 'error')
+            return redirect(url_for('admin.telaCadastroLivro'))
+        adicionar_exemplares(livro.id, max(quantidade, 1))
+
+        return redirect(url_for('admin.painelLib'))
+
+    return render_template('tela-cadastro-livro.html')
+
+@bp.route('/importar-livros', methods=['POST'])
+def importarLivros():
+    arquivo = request.files.get('arquivo')
+    if not arquivo or not arquivo.filename:
+        flash('Selecione um arquivo CSV ou JSON Lines.', 'error')
+        return redirect(url_for('admin.telaCadastroLivro'))
+
+    # O upload é lido em fluxo, lote por lote, sem carregar o arquivo inteiro
+    texto = io.TextIOWrapper(arquivo.stream, encoding='utf-8-sig', errors='replace', newline='')
+    relatorio, erros = importar_livros(ler_registros(texto, formato_do_arquivo(arquivo.filename)))
+    flash(f'Importação concluída: {descrever_importacao(relatorio)}.', 'success')
+    for erro in erros:
+        flash(erro, 'error')
+    return redirect(url_for('admin.painelLib'))
+
+@bp.route('/disponibilizar-livro/<int:livro_id>', methods=['POST'])
+def disponibilizarLivro(livro_id):
+    livro = Livro.query.get(livro_id)
+    if livro:
+        livro.disponivel = True
+        db.session.flush()
+        anunciar_livros(db.session, [livro.id])
+        atender_fila(db.session, [livro.id])
+        db.session.commit()
+        flash(f'O livro "{livro.titulo}" foi marcado como disponível.', 'success')
+    else:
+        flash('Livro não encontrado.', 'error')
+    return redirect(url_for('admin.painelLib'))
+
+@bp.route('/adicionar-exemplares/<int:livro_id>', methods=['POST'])
+def adicionarExemplares(livro_id):
+    livro = Livro.query.get_or_404(livro_id)
+    quantidade = request.form.get('quantidade', 1, type=int) or 0
+    if quantidade < 1:
+        flash('Informe uma quantidade de exemplares maior que zero.', 'error')
+        return redirect(url_for('admin.painelLib'))
+    adicionar_exemplares(livro.id, quantidade)
+    flash(f'{quantidade} exemplar(es) adicionado(s) a "{livro.titulo}".', 'success')
+    return redirect(url_for('admin.painelLib'))
+
+@bp.route('/indisponibilizar-livro/<int:livro_id>', methods=['POST'])
+def indisponibilizarLivro(livro_id):
+    livro = Livro.query.get(livro_id)
+    if livro:
+        livro.disponivel = False
+        anunciar_livros(db.session, [livro.id])
+        db.session.commit()
+        flash(f'O livro "{livro.titulo}" foi marcado como indisponível.', 'success')
+    else:
+        flash('Livro não encontrado.', 'error')
+    return redirect(url_for('admin.painelLib'))
+
+@bp.route('/bloquear-usuario/<int:usuario_id>', methods=['POST'])
+def bloquearUsuario(usuario_id):
+    usuario = Usuario.query.get(usuario_id)
+    if usuario:
+        usuario.status = True  # Marcando como bloqueado
+        db.session.commit()
+        flash(f'O usuário "{usuario.nome}" foi bloqueado com sucesso.', 'success')
+    else:
+        flash('Usuário não encontrado.', 'error')
+    return redirect(url_for('admin.listarUsuarios'))
+
+@bp.route('/desbloquear-usuario/<int:usuario_id>', methods=['POST'])
+def desbloquearUsuario(usuario_id):
+    usuario = Usuario.query.get(usuario_id)
+    if usuario:
+        usuario.status = False  # Marcando como desbloqueado
+        db.session.commit()
+        flash(f'O usuário "{usuario.nome}" foi desbloqueado com sucesso.', 'success')
+    else:
+        flash('Usuário não encontrado.', 'error')
+    return redirect(url_for('admin.listarUsuarios'))
+
+@bp.route('/livros/disponibilidade-em-lote', methods=['POST'])
+def disponibilidadeEmLote():
+    acao = request.form.get('acao')
+    livro_ids = request.form.getlist('livro_ids', type=int)
+    assunto = request.form.get('assunto', '').strip()
+    if acao not in ('disponibilizar', 'indisponibilizar'):
+        flash('Ação inválida.', 'error')
+    elif not livro_ids and not assunto:
+        flash('Selecione livros ou informe um assunto.', 'error')
+    else:
+        total = alterar_disponibilidade(acao == 'disponibilizar', livro_ids=livro_ids, assunto=assunto)
+        situacao = 'disponíveis' if acao == 'disponibilizar' else 'indisponíveis'
+        flash(f'{total} livro(s) marcado(s) como {situacao}.', 'success')
+    return redirect(url_for('admin.painelLib'))
+
+@bp.route('/usuarios/bloqueio-em-lote', methods=['POST'])
+def bloqueioEmLote():
+    acao = request.form.get('acao')
+    usuario_ids = request.form.getlist('usuario_ids', type=int)
+    curso = request.form.get('curso', '').strip()
+    tipo_usuario = request.form.get('tipo_usuario', '').strip()
+    if acao not in ('bloquear', 'desbloquear'):
+        flash('Ação inválida.', 'error')
+    elif not usuario_ids and not curso and not tipo_usuario:
+        flash('Selecione usuários ou informe um curso/tipo de usuário.', 'error')
+    else:
+        total = alterar_bloqueio(acao == 'bloquear', usuario_ids=usuario_ids, curso=curso, tipo_usuario=tipo_usuario)
+        situacao = 'bloqueado(s)' if acao == 'bloquear' else 'desbloqueado(s)'
+        flash(f'{total} usuário(s) {situacao} com sucesso.', 'success')
+    return redirect(url_for('admin.listarUsuarios'))
+
+@bp.before_request
+def protegerExportacoes():
+    # As exportações levam dados pessoais dos usuários: só com sessão de bibliotecário/administrador
+    if request.endpoint and request.endpoint.startswith('admin.exportar'):
+        exigir_bibliotecario()
+
+@bp.route('/exportar/livros')
+def exportarLivros():
+    consulta = db.select(Livro.id, Livro.autor, Livro.titulo, Livro.isbn, Livro.editora, Livro.assunto,
+                         Livro.edicao, Livro.data_inclusao, Livro.disponivel, Livro.reservado,
+                         Livro.exemplares_disponiveis).order_by(Livro.id)
+    de, ate = data_do_filtro('de'), data_do_filtro('ate')
+    if de:
+        consulta = consulta.where(Livro.data_inclusao >= de)
+    if ate:
+        consulta = consulta.where(Livro.data_inclusao < ate + timedelta(days=1))  # Dia final inclusivo
+    return resposta_de_exportacao(consulta, 'livros')
+
+@bp.route('/exportar/usuarios')
+def exportarUsuarios():
+    # Senha e CPF nunca são exportados; matrícula e curso vêm da tabela aluno, quando houver
+    consulta = (db.select(Usuario.id, Usuario.nome, Usuario.email, Usuario.tipo_usuario,
+                          Usuario.status.label('bloqueado'), Aluno.matricula, Aluno.curso)
+                .select_from(Usuario.__table__)
+                .outerjoin(Aluno.__table__, Aluno.id == Usuario.id)
+                .order_by(Usuario.id))
+    return resposta_de_exportacao(consulta, 'usuarios')
+
+@bp.route('/exportar/reservas')
+def exportarReservas():
+    consulta = (db.select(Reserva.id, Reserva.status, Reserva.livro_id, Livro.titulo, Livro.isbn,
+                          Reserva.usuario_id, Usuario.nome, Usuario.email)
+                .select_from(Reserva)
+                .join(Livro, Livro.id == Reserva.livro_id)
+                .join(Usuario.__table__, Usuario.id == Reserva.usuario_id)
+                .order_by(Reserva.id))
+    status = request.args.get('status')
+    if status:
+        consulta = consulta.where(Reserva.status == status)
+    return resposta_de_exportacao(consulta, 'reservas')
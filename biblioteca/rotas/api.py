@@ -0,0 +1,128 @@
+"""API JSON (v1): leitura paginada e operações em lote, restrita a bibliotecários e administradores."""
+import hmac
+import json
+
+from flask import Blueprint, Response, abort, current_app, jsonify, request
+from werkzeug.exceptions import HTTPException
+
+from ..consultas import cache_do_catalogo, filtrar_disponibilidade, paginar_por_chave
+from ..extensoes import db
+from ..importacao import valor_exportado
+from ..modelos import Aluno, Livro, Reserva, Usuario
+from ..servicos import ReservaIndisponivel, TRANSICOES_DE_RESERVA, alterar_disponibilidade, decidir_reservas
+from .auth import exigir_bibliotecario
+
+bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+# Campos que podem ser pedidos em ?campos=; senha e CPF nunca saem pela API
+CAMPOS_API = {
+    'livros': {c.key: c for c in (Livro.id, Livro.autor, Livro.titulo, Livro.isbn, Livro.editora, Livro.assunto,
+                                  Livro.edicao, Livro.data_inclusao, Livro.disponivel, Livro.reservado,
+                                  Livro.exemplares_disponiveis)},
+    'usuarios': {c.key: c for c in (Usuario.id, Usuario.nome, Usuario.email, Usuario.tipo_usuario,
+                                    Usuario.status, Aluno.matricula, Aluno.curso)},
+    'reservas': {c.key: c for c in (Reserva.id, Reserva.livro_id, Reserva.usuario_id, Reserva.exemplar_id,
+                                    Reserva.status)},
+}
+
+@bp.app_errorhandler(HTTPException)
+def erroHttp(erro):
+    # Na API os erros também são JSON; nas telas segue a página padrão
+    if request.path.startswith('/api/'):
+        return jsonify(erro=erro.description), erro.code
+    return erro
+
+@bp.before_request
+def exigirAcesso():
+    token = current_app.config['API_TOKEN']
+    autorizacao = request.headers.get('Authorization', '')
+    if token and autorizacao.startswith('Bearer ') and hmac.compare_digest(autorizacao[7:].encode(), token.encode()):
+        return
+    # Sem token: sessão de bibliotecário ou administrador
+    exigir_bibliotecario()
+
+def para_json(dados):
+    return json.dumps(dados, ensure_ascii=False, default=valor_exportado)
+
+def colunas_pedidas(recurso):
+    """Colunas do ?campos=a,b,c (o id sempre vem, pois é o cursor da paginação)."""
+    campos = CAMPOS_API[recurso]
+    pedidos = [c.strip() for c in request.args.get('campos', '').split(',') if c.strip()]
+    if not pedidos:
+        return list(campos.values())
+    invalidos = [c for c in pedidos if c not in campos]
+    if invalidos:
+        abort(400, f'Campos desconhecidos: {", ".join(invalidos)}. Disponíveis: {", ".join(campos)}.')
+    return [campos['id']] + [campos[c] for c in pedidos if c != 'id']
+
+def pagina_json(consulta, coluna):
+    pagina = paginar_por_chave(consulta, coluna)
+    return {
+        'itens': [dict(linha._mapping) for linha in pagina.itens],
+        'anterior': pagina.anterior,
+        'proximo': pagina.proximo,
+        'por_pagina': pagina.por_pagina,
+    }
+
+def ids_do_lote(dados):
+    ids = dados.get('ids')
+    if not isinstance(ids, list) or not ids or not all(isinstance(i, int) for i in ids):
+        abort(400, 'Informe "ids" como uma lista de números.')
+    if len(ids) > current_app.config['API_LOTE_MAX']:
+        abort(400, f'No máximo {current_app.config["API_LOTE_MAX"]} ids por requisição.')
+    return ids
+
+@bp.route('/livros')
+@cache_do_catalogo(mimetype='application/json')
+def apiLivros():
+    consulta = filtrar_disponibilidade(db.session.query(*colunas_pedidas('livros')))
+    return para_json(pagina_json(consulta, Livro.id))
+
+@bp.route('/livros/<int:livro_id>')
+@cache_do_catalogo(mimetype='application/json')
+def apiLivro(livro_id):
+    linha = db.session.query(*colunas_pedidas('livros')).filter(Livro.id == livro_id).first()
+    if linha is None:
+        abort(404, 'Livro não encontrado.')
+    return para_json(dict(linha._mapping))
+
+@bp.route('/livros/disponibilidade', methods=['POST'])
+def apiDisponibilidade():
+    dados = request.get_json(silent=True) or {}
+    ids = ids_do_lote(dados)
+    if not isinstance(dados.get('disponivel'), bool):
+        abort(400, 'Informe "disponivel" como true ou false.')
+    return jsonify(alterados=alterar_disponibilidade(dados['disponivel'], livro_ids=ids))
+
+@bp.route('/usuarios')
+def apiUsuarios():
+    consulta = (db.session.query(*colunas_pedidas('usuarios'))
+                .select_from(Usuario)
+                .outerjoin(Aluno.__table__, Aluno.id == Usuario.id))
+    if request.args.get('tipo_usuario'):
+        consulta = consulta.filter(Usuario.tipo_usuario == request.args['tipo_usuario'])
+    # Usuários não entram na versão do catálogo: o ETag vem do próprio conteúdo
+    resposta = Response(para_json(pagina_json(consulta, Usuario.id)), mimetype='application/json')
+    resposta.add_etag()
+    return resposta.make_conditional(request)
+
+@bp.route('/reservas')
+@cache_do_catalogo(mimetype='application/json')
+def apiReservas():
+    consulta = db.session.query(*colunas_pedidas('reservas'))
+    if request.args.get('status'):
+        consulta = consulta.filter(Reserva.status == request.args['status'])
+    return para_json(pagina_json(consulta, Reserva.id))
+
+@bp.route('/reservas/lote', methods=['POST'])
+def apiDecidirReservas():
+    dados = request.get_json(silent=True) or {}
+    ids = ids_do_lote(dados)
+    if dados.get('acao') not in TRANSICOES_DE_RESERVA:
+        abort(400, 'Informe "acao" como ' + ', '.join(f'"{acao}"' for acao in TRANSICOES_DE_RESERVA) + '.')
+    try:
+        processadas = decidir_reservas(ids, dados['acao'])
+    except ReservaIndisponivel as erro:
+        abort(409, str(erro))
+    alteradas = {reserva_id for reserva_id, _ in processadas}
+    return jsonify(processadas=len(alteradas), ignoradas=[i for i in ids if i not in alteradas])
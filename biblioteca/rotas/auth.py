@@ -0,0 +1,184 @@
+"""Login, saída e cadastro de alunos."""
+import math
+
+from flask import Blueprint, abort, current_app, flash, redirect, render_template, request, session, url_for
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+from ..extensoes import db
+from ..modelos import Aluno, Usuario
+from ..senhas import SENHA_INUTILIZAVEL, ServidorOcupado, gerar_hash_senha, verificar_senha
+
+bp = Blueprint('auth', __name__)
+
+# Tipos de usuário que acessam a API e as exportações
+TIPOS_DA_BIBLIOTECA = ('bibliotecario', 'admin')
+
+def exigir_bibliotecario():
+    """Interrompe com 401 sem login e com 403 para quem não é bibliotecário/administrador ativo."""
+    if 'usuario_id' not in session:
+        abort(401, 'Entre como bibliotecário ou administrador.')
+    usuario = db.session.execute(
+        db.select(Usuario.tipo_usuario, Usuario.status).where(Usuario.id == session['usuario_id'])
+    ).first()
+    if usuario is None or usuario.status or usuario.tipo_usuario not in TIPOS_DA_BIBLIOTECA:
+        abort(403, 'Restrito a bibliotecários e administradores.')
+
+# Tela devolvida com o 503 quando não há vaga para o hash da senha
+TELAS_COM_SENHA = {
+    'auth.telaLogin': 'tela-login.html',
+    'auth.entrar': 'tela-login.html',
+    'auth.cadastrarAluno': 'tela-cadastro-aluno.html',
+    'admin.cadastrarUsuario': 'tela-cadastro-usuario.html',
+}
+
+@bp.app_errorhandler(ServidorOcupado)
+def servidorOcupado(erro):
+    # Responde na hora em vez de segurar a thread esperando uma vaga de hash
+    db.session.rollback()
+    flash(str(erro), 'error')
+    return render_template(TELAS_COM_SENHA.get(request.endpoint, 'tela-login.html')), 503, {'Retry-After': '1'}
+
+def login_bloqueado(espera):
+    flash(f'Muitas tentativas de login. Tente novamente em {math.ceil(espera / 60)} minuto(s).', 'error')
+    return render_template('tela-login.html'), 429, {'Retry-After': str(math.ceil(espera))}
+
+@bp.route('/',  methods=['GET', 'POST'])
+def telaLogin():
+    if request.method == 'POST':
+        return entrar()  # Chama a função de login
+    return render_template('tela-login.html')
+
+@bp.route('/entrar', methods=['POST'])
+def entrar():
+    email = request.form['email']
+    senha = request.form['senha']
+    ip = request.remote_addr or '-'
+    chave_email = email.strip().lower()
+    limite_por_ip = current_app.extensions['limite_por_ip']
+    limite_por_email = current_app.extensions['limite_por_email']
+
+    # IP ou e-mail bloqueados são recusados aqui, sem consultar o banco
+    espera = max(limite_por_ip.bloqueado(ip), limite_por_email.bloqueado(chave_email))
+    if espera:
+        return login_bloqueado(espera)
+
+    usuario = Usuario.query.filter_by(email=email).first()
+    if usuario:
+        if usuario.status:  # Verifica se o usuário está bloqueado
+            flash('Seu acesso está bloqueado. Entre em contato com o administrador.', 'error')
+            return redirect(url_for('auth.telaLogin'))
+        if usuario.senha == SENHA_INUTILIZAVEL:  # Aluno carregado pela secretaria, sem senha ainda
+            flash('Conclua seu cadastro com sua matrícula para definir a senha.', 'error')
+            return redirect(url_for('auth.telaCadastro'))
+        if verificar_senha(usuario, senha):
+            db.session.commit()  # Grava o hash atualizado, se houve troca
+            limite_por_email.limpar(chave_email)
+            session['usuario_id'] = usuario.id
+            flash(f'Bem-vindo, {usuario.email}!', 'success')
+
+            # Redireciona com base no tipo de usuário
+            if email.endswith('@aluno-faeterj.com') or email.endswith('@prof-faeterj.com'):
+                return redirect(url_for('catalogo.painelPrincipal'))
+            elif email.endswith('@admin-faeterj.com'):
+                return redirect(url_for('admin.painelAdmin'))
+            elif email.endswith('@lib-faeterj.com'):
+                return redirect(url_for('admin.painelLib'))
+        else:
+            flash('Email ou senha incorretos.', 'error')
+    else:
+        flash('Email não encontrado.', 'error')
+    # Só as falhas contam: logins certos de muitos alunos atrás do mesmo NAT não bloqueiam o IP
+    espera = max(limite_por_ip.registrar(ip), limite_por_email.registrar(chave_email))
+    if espera:
+        return login_bloqueado(espera)
+    return redirect(url_for('auth.telaLogin'))
+
+@bp.route('/sair')
+def sair():
+    session.pop('usuario_id', None)
+    flash('Você saiu do sistema.', 'success')
+    return redirect(url_for('auth.telaLogin'))
+
+@bp.route('/tela-cadastro')
+def telaCadastro():
+    return render_template('tela-cadastro-aluno.html')
+
+@bp.route('/cadastrar-aluno', methods=['GET', 'POST'])
+def cadastrarAluno():
+    if request.method == 'POST':
+        nome = request.form['nome']
+        cpf = request.form['cpf']
+        matricula = request.form['matricula']
+        curso = request.form['curso']
+        email = request.form['email']
+        senha = request.form['senha']
+        
+        if Usuario.query.filter_by(email=email).first():
+            # Aluno já carregado pela sincronização de matrículas: e-mail e matrícula não bastam
+            # (são quase públicos); a senha só é definida pelo link enviado ao e-mail institucional
+            pre_cadastrado = Aluno.query.filter_by(email=email, matricula=matricula, senha=SENHA_INUTILIZAVEL).first()
+            if pre_cadastrado:
+                enviar_link_de_cadastro(pre_cadastrado)
+                db.session.commit()
+                flash('Enviamos um link para o seu e-mail institucional. Abra-o para definir a senha.', 'success')
+                return redirect(url_for('auth.telaLogin'))
+            flash('Esse email já está cadastrado. Por favor, utilize outro.', 'error')
+            return redirect(url_for('auth.telaCadastro'))
+
+        if email.endswith('@aluno-faeterj.com'):
+            novo_aluno = Aluno(nome=nome, cpf=cpf, matricula=matricula, curso=curso, email=email,
+                               senha=gerar_hash_senha(senha))
+            db.session.add(novo_aluno)
+            db.session.commit()
+            flash('Cadastrado com sucesso!', 'success')
+            return redirect(url_for('auth.telaLogin'))
+        else:
+            flash('O email deve ter o domínio @aluno-faeterj.com', 'error')
+
+    return render_template('tela-cadastro-aluno.html')
+
+def assinador_de_cadastro():
+    return URLSafeTimedSerializer(current_app.secret_key, salt='concluir-cadastro')
+
+def enviar_link_de_cadastro(aluno):
+    """Agenda o e-mail com o link de uso único para o aluno pré-cadastrado definir a senha."""
+    token = assinador_de_cadastro().dumps({'id': aluno.id, 'email': aluno.email})
+    link = url_for('auth.concluirCadastro', token=token, _external=True)
+    horas = current_app.config['CADASTRO_LINK_HORAS']
+    current_app.extensions['tarefas'].agendar_varias('email', [{
+        'para': aluno.email,
+        'assunto': 'Conclua seu cadastro na biblioteca',
+        'texto': f'Para definir sua senha acesse {link} (válido por {horas} horas). '
+                 'Se você não pediu o cadastro, ignore este e-mail.',
+    }], sessao=db.session)
+
+@bp.route('/concluir-cadastro/<token>', methods=['GET', 'POST'])
+def concluirCadastro(token):
+    try:
+        dados = assinador_de_cadastro().loads(token, max_age=current_app.config['CADASTRO_LINK_HORAS'] * 3600)
+    except BadSignature:  # Inclui o link expirado
+        flash('Link inválido ou expirado. Peça um novo pelo cadastro.', 'error')
+        return redirect(url_for('auth.telaCadastro'))
+    # Uso único: depois que a senha é definida o aluno deixa de ter SENHA_INUTILIZAVEL
+    aluno = Aluno.query.filter_by(id=dados['id'], email=dados['email'], senha=SENHA_INUTILIZAVEL).first()
+    if aluno is None:
+        flash('Este link já foi usado. Entre com sua senha.', 'error')
+        return redirect(url_for('auth.telaLogin'))
+
+    if request.method == 'POST':
+        senha = gerar_hash_senha(request.form['senha'])
+        # Condicional: dois envios do mesmo link não definem a senha duas vezes
+        definida = db.session.execute(
+            db.update(Usuario)
+            .where(Usuario.id == aluno.id, Usuario.senha == SENHA_INUTILIZAVEL)
+            .values(senha=senha)
+            .execution_options(synchronize_session=False)
+        ).rowcount == 1
+        db.session.commit()
+        if definida:
+            flash('Cadastro concluído! Entre com sua nova senha.', 'success')
+        else:
+            flash('Este link já foi usado. Entre com sua senha.', 'error')
+        return redirect(url_for('auth.telaLogin'))
+
+    return render_template('tela-concluir-cadastro.html', token=token, nome=aluno.nome)
@@ -0,0 +1,26 @@
+"""Catálogo de livros (painel do aluno e busca)."""
+from flask import Blueprint, current_app, redirect, render_template, request, url_for
+
+from ..consultas import Pagina, buscar_livros, cache_do_catalogo, filtrar_disponibilidade, paginar_por_chave
+from ..modelos import Livro
+
+bp = Blueprint('catalogo', __name__)
+
+@bp.route('/painel-principal')
+@cache_do_catalogo
+def painelPrincipal():
+    consulta = filtrar_disponibilidade(Livro.query)
+    pagina = paginar_por_chave(consulta, Livro.id)  # Buscando uma página de livros
+    return render_template('painel-principal.html', livros=pagina.itens, pagina=pagina)
+
+@bp.route('/buscar')
+@cache_do_catalogo
+def buscarLivros():
+    termo = request.args.get('q', '').strip()
+    if not termo:
+        return redirect(url_for('catalogo.painelPrincipal'))
+    limite = max(1, min(request.args.get('por_pagina', type=int) or current_app.config['LIVROS_POR_PAGINA'],
+                        current_app.config['LIVROS_POR_PAGINA_MAX']))
+    livros = buscar_livros(termo, limite)
+    pagina = Pagina(livros, None, None, limite)
+    return render_template('painel-principal.html', livros=livros, pagina=pagina, termo=termo)
@@ -0,0 +1,57 @@
+"""Atualizações ao vivo do catálogo e das solicitações (Server-Sent Events)."""
+import json
+
+from flask import Blueprint, Response, abort, current_app, request, session
+
+from ..eventos import LimiteDeConexoes
+from ..extensoes import db
+from ..modelos import Usuario
+
+bp = Blueprint('eventos', __name__)
+
+# canal -> tipos de usuário que podem assinar (None: qualquer usuário logado)
+CANAIS = {
+    'catalogo': None,
+    'solicitacoes': ('bibliotecario', 'admin'),  # Leva o nome de quem pediu a reserva
+}
+
+def formatar_evento(evento):
+    linhas = [f'id: {evento.id}'] if evento.id else []
+    linhas.append(f'event: {evento.tipo}')
+    linhas.append('data: ' + json.dumps(evento.dados, ensure_ascii=False))
+    return '\n'.join(linhas) + '\n\n'
+
+@bp.route('/eventos')
+def transmitirEventos():
+    if 'usuario_id' not in session:
+        abort(401)
+    canais = [canal for canal in request.args.get('canais', 'catalogo').split(',') if canal]
+    if not canais or any(canal not in CANAIS for canal in canais):
+        abort(400, 'Canal inválido.')
+    permitidos = [CANAIS[canal] for canal in canais if CANAIS[canal]]
+    if permitidos:
+        tipo_usuario = db.session.scalar(db.select(Usuario.tipo_usuario).where(Usuario.id == session['usuario_id']))
+        if any(tipo_usuario not in tipos for tipos in permitidos):
+            abort(403)
+
+    try:
+        assinatura = current_app.extensions['eventos'].assinar(canais, request.headers.get('Last-Event-ID'))
+    except LimiteDeConexoes as erro:
+        return Response(str(erro), status=503, headers={'Retry-After': '30'})
+    pulsacao = current_app.config['EVENTOS_PULSACAO']
+    reconexao = current_app.config['EVENTOS_RECONEXAO_MS']
+
+    # Sem stream_with_context: o contexto da requisição (e a conexão com o banco)
+    # é liberado antes da transmissão, que só lê a fila da assinatura
+    def transmitir():
+        yield f'retry: {reconexao}\n\n'
+        while True:
+            evento = assinatura.proximo(pulsacao)
+            # O comentário mantém proxies abertos e revela clientes desconectados
+            yield formatar_evento(evento) if evento else ': pulsacao\n\n'
+
+    resposta = Response(transmitir(), mimetype='text/event-stream')
+    resposta.headers['Cache-Control'] = 'no-cache'
+    resposta.headers['X-Accel-Buffering'] = 'no'  # nginx: não acumular o fluxo
+    resposta.call_on_close(assinatura.cancelar)
+    return resposta
@@ -0,0 +1,92 @@
+"""Solicitações de reserva, fila de espera e decisões do bibliotecário."""
+from flask import Blueprint, abort, flash, redirect, render_template, request, session, url_for
+
+from ..extensoes import db
+from ..modelos import Livro, Reserva, Usuario
+from ..servicos import (ReservaIndisponivel, TRANSICOES_DE_RESERVA, decidir_reserva, entrar_na_fila, reservar_livro,
+                        sair_da_fila)
+
+bp = Blueprint('reservas', __name__)
+
+@bp.route('/lib-solicitacoes')
+def painelSolicitacoes():
+    return lib_solicitacoes()  # Mesma fila de solicitações pendentes
+
+@bp.route('/lib/solicitacoes', methods=['GET'])
+def lib_solicitacoes():
+    # ?status=aceito lista os empréstimos em aberto (para registrar a devolução)
+    status = request.args.get('status', 'pendente')
+    if status not in ('pendente', 'aceito'):
+        abort(400, 'Status inválido.')
+    # Obter as reservas com usuário e livro na mesma consulta
+    # (evita um SELECT por linha ao acessar reserva.usuario/reserva.livro no template)
+    reservas_pendentes = (
+        Reserva.query
+        .filter_by(status=status)
+        .options(
+            db.load_only(Reserva.id, Reserva.status),
+            db.joinedload(Reserva.usuario, innerjoin=True).load_only(Usuario.nome),
+            db.joinedload(Reserva.livro, innerjoin=True).load_only(Livro.titulo),
+        )
+        .order_by(Reserva.id)
+        .all()
+    )
+    
+    return render_template('lib-solicitacoes.html', reservas=reservas_pendentes, status=status)
+
+@bp.route('/solicitar-reserva/<int:livro_id>', methods=['POST'])
+def solicitar_reserva(livro_id):
+    if 'usuario_id' not in session:
+        flash('Você precisa estar logado para reservar um livro.', 'error')
+        return redirect(url_for('auth.telaLogin'))
+
+    usuario_id = session['usuario_id']
+
+    # Verificação e reserva acontecem em um único UPDATE condicional
+    try:
+        reservar_livro(livro_id, usuario_id)
+    except ReservaIndisponivel as erro:
+        livro = Livro.query.get_or_404(livro_id)
+        pendente = Reserva.query.filter_by(livro_id=livro_id, usuario_id=usuario_id, status='pendente').first()
+        if not livro.disponivel or pendente:
+            flash(str(erro), 'error')
+            return redirect(url_for('catalogo.painelPrincipal'))
+        # Sem exemplar livre: entra na fila e é atendido na próxima devolução
+        posicao = entrar_na_fila(livro_id, usuario_id)
+        if posicao is not None:
+            flash(f'Nenhum exemplar livre no momento. Você está na posição {posicao} da fila de espera.', 'success')
+            return redirect(url_for('catalogo.painelPrincipal'))
+
+    flash('Solicitação de reserva enviada com sucesso!', 'success')
+    return redirect(url_for('catalogo.painelPrincipal'))
+
+@bp.route('/sair-da-fila/<int:livro_id>', methods=['POST'])
+def sairDaFila(livro_id):
+    if 'usuario_id' not in session:
+        flash('Você precisa estar logado.', 'error')
+        return redirect(url_for('auth.telaLogin'))
+
+    if sair_da_fila(livro_id, session['usuario_id']):
+        flash('Você saiu da fila de espera.', 'success')
+    else:
+        flash('Você não está na fila de espera deste livro.', 'error')
+    return redirect(url_for('catalogo.painelPrincipal'))
+
+@bp.route('/gerenciar-reserva/<int:reserva_id>/<string:acao>', methods=['POST'])
+def gerenciar_reserva(reserva_id, acao):
+    if acao not in TRANSICOES_DE_RESERVA:
+        abort(404)
+    Reserva.query.get_or_404(reserva_id)
+    origem = TRANSICOES_DE_RESERVA[acao][0]
+
+    try:
+        decidir_reserva(reserva_id, acao)
+    except ReservaIndisponivel as erro:
+        flash(str(erro), 'error')
+        return redirect(url_for('reservas.lib_solicitacoes', status=origem))
+
+    if acao == 'devolver':
+        flash('Devolução registrada com sucesso!', 'success')
+    else:
+        flash(f'Solicitação {acao} com sucesso!', 'success')
+    return redirect(url_for('reservas.lib_solicitacoes', status=origem))  # Redireciona para a página de solicitações
@@ -0,0 +1,81 @@
+"""Tarefas em segundo plano: e-mails, expiração de reservas, estatísticas e manutenção do banco.
+
+Os intervalos das tarefas periódicas são registrados por create_app.
+"""
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+import smtplib
+
+from flask import current_app
+from sqlalchemy import text
+
+from .estatisticas import atualizar_estatisticas
+from .extensoes import db
+from .historico import limpar_historico
+from .modelos import Reserva, Tarefa
+from .servicos import decidir_reservas, notificar_reservas
+from .tarefas import tarefa
+
+
+@tarefa('email', lote=True)
+def enviar_emails(mensagens):
+    """Envia um lote de e-mails numa única conexão SMTP."""
+    with smtplib.SMTP(current_app.config['EMAIL_SMTP_HOST'], current_app.config['EMAIL_SMTP_PORT'], timeout=10) as smtp:
+        for dados in mensagens:
+            mensagem = EmailMessage()
+            mensagem['From'] = current_app.config['EMAIL_REMETENTE']
+            mensagem['To'] = dados['para']
+            mensagem['Subject'] = dados['assunto']
+            mensagem.set_content(dados['texto'])
+            smtp.send_message(mensagem)
+
+@tarefa('expirar-reservas')
+def expirar_reservas():
+    """Expira reservas pendentes fora do prazo e avisa sobre empréstimos atrasados."""
+    agora = datetime.utcnow()
+    vencidas = db.session.scalars(
+        db.select(Reserva.id)
+        .where(Reserva.status == 'pendente',
+               Reserva.data_inclusao < agora - timedelta(hours=current_app.config['RESERVA_PRAZO_HORAS']))
+        .order_by(Reserva.id)
+    ).all()
+    # Em lotes, para não segurar o banco numa transação longa
+    for inicio in range(0, len(vencidas), current_app.config['API_LOTE_MAX']):
+        decidir_reservas(vencidas[inicio:inicio + current_app.config['API_LOTE_MAX']], 'expirar')
+
+    atrasadas = db.session.scalars(
+        db.select(Reserva.id)
+        .where(Reserva.status == 'aceito', Reserva.data_lembrete.is_(None),
+               Reserva.data_decisao < agora - timedelta(days=current_app.config['EMPRESTIMO_PRAZO_DIAS']))
+        .order_by(Reserva.id)
+    ).all()
+    if atrasadas:
+        db.session.execute(
+            db.update(Reserva).where(Reserva.id.in_(atrasadas)).values(data_lembrete=agora)
+            .execution_options(synchronize_session=False)
+        )
+        notificar_reservas(db.session, atrasadas, 'lembrete')
+        db.session.commit()
+
+@tarefa('atualizar-estatisticas')
+def atualizar_resumos():
+    """Recalcula os resumos do painel de estatísticas nos dias que mudaram."""
+    atualizar_estatisticas()
+
+@tarefa('manutencao-do-banco')
+def manutencao_do_banco():
+    """Atualiza as estatísticas do planejador, compacta o banco e apaga tarefas e histórico antigos."""
+    limite = datetime.utcnow() - timedelta(days=current_app.config['TAREFAS_RETENCAO_DIAS'])
+    db.session.execute(db.delete(Tarefa).where(Tarefa.status.in_(['concluida', 'falhou']),
+                                               Tarefa.atualizada_em < limite))
+    db.session.commit()
+    limpar_historico(db.session, current_app.config['HISTORICO_RETENCAO_DIAS'],
+                     current_app.config['HISTORICO_MAX_LINHAS'])
+    # VACUUM não roda dentro de transação
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conexao:
+        if conexao.dialect.name == 'sqlite':
+            conexao.execute(text('ANALYZE'))
+            conexao.execute(text('VACUUM'))
+            conexao.execute(text('PRAGMA wal_checkpoint(TRUNCATE)'))
+        else:
+            conexao.execute(text('VACUUM (ANALYZE)'))
@@ -0,0 +1,58 @@
+"""Hash e verificação de senhas."""
+from contextlib import contextmanager
+import hmac
+import re
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class ServidorOcupado(Exception):
+    """Não havia vaga para calcular o hash da senha dentro do tempo de espera."""
+
+# Limita os hashes simultâneos: uma rajada de logins não ocupa todas as threads
+# do servidor com trabalho de CPU, e as demais páginas continuam respondendo.
+# A espera por uma vaga é curta (SENHA_HASH_ESPERA, padrão 0,1s): uma espera longa
+# deixaria as threads paradas no semáforo, o mesmo problema por outro caminho.
+# Sem vaga a requisição recebe 503 na hora (auth.servidorOcupado).
+# O semáforo é criado por create_app (SENHA_HASH_CONCORRENCIA).
+@contextmanager
+def vaga_de_hash():
+    vagas = current_app.extensions['vagas_de_hash']
+    if not vagas.acquire(timeout=current_app.config['SENHA_HASH_ESPERA']):
+        raise ServidorOcupado('Muitos acessos simultâneos. Tente novamente em instantes.')
+    try:
+        yield
+    finally:
+        vagas.release()
+
+# Senha de quem ainda não definiu a própria (ex.: alunos da sincronização de matrículas); nunca confere
+SENHA_INUTILIZAVEL = '!'
+
+def senha_tem_hash(valor):
+    """Hashes do werkzeug têm o formato 'metodo$sal$hash'; o resto é senha antiga em texto puro."""
+    return re.match(r'^(scrypt|pbkdf2):[^$]+\$[^$]+\$[0-9a-f]+$', valor or '') is not None
+
+def gerar_hash_senha(senha):
+    with vaga_de_hash():
+        return generate_password_hash(senha, method=current_app.config['SENHA_METODO'])
+
+def verificar_senha(usuario, senha):
+    """Confere a senha do usuário e, se correta, atualiza o hash quando necessário.
+
+    Senhas antigas em texto puro e hashes com método/custo diferente do configurado
+    são regravados com o método atual (o chamador faz o commit).
+    """
+    if usuario.senha == SENHA_INUTILIZAVEL:
+        return False
+    if not senha_tem_hash(usuario.senha):
+        if not hmac.compare_digest(usuario.senha.encode(), senha.encode()):
+            return False
+        usuario.senha = gerar_hash_senha(senha)
+        return True
+
+    with vaga_de_hash():
+        correta = check_password_hash(usuario.senha, senha)
+    if correta and usuario.senha.split('$', 1)[0] != current_app.config['SENHA_METODO']:
+        usuario.senha = gerar_hash_senha(senha)
+    return correta
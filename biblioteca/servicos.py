@@ -0,0 +1,458 @@
+"""Regras de reserva, fila de espera e alterações em lote."""
+from collections import Counter
+from datetime import datetime
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .extensoes import db
+from .historico import linha_de_historico
+from .modelos import Aluno, Exemplar, FilaEspera, Livro, Reserva, Usuario
+
+############################################################################################################################
+
+# EVENTOS AO VIVO
+
+def anunciar_livros(sessao, livro_ids):
+    """Marca títulos cuja disponibilidade mudou; o estado final é publicado no commit."""
+    sessao.info.setdefault('livros_anunciados', set()).update(livro_ids)
+
+def anunciar_reservas(sessao, reserva_ids):
+    """Marca reservas criadas ou com status alterado; publicadas no commit."""
+    sessao.info.setdefault('reservas_anunciadas', set()).update(reserva_ids)
+
+def anunciar_catalogo(sessao):
+    """Alteração em lote sem ids conhecidos: as páginas do catálogo recarregam os dados."""
+    sessao.info['catalogo_anunciado'] = True
+
+def anotar_historico(sessao, linhas):
+    """Linhas do histórico entregues ao gravador depois do commit (descartadas no rollback)."""
+    sessao.info.setdefault('historico', []).extend(linhas)
+
+@event.listens_for(Session, 'before_commit')
+def preparar_eventos(sessao):
+    # Lê o estado final ainda dentro da transação; a publicação e o histórico esperam o commit
+    livros = sessao.info.pop('livros_anunciados', None)
+    reservas = sessao.info.pop('reservas_anunciadas', None)
+    catalogo = sessao.info.pop('catalogo_anunciado', False)
+    momento = datetime.utcnow()
+    eventos = []
+    historico = []
+    if catalogo:
+        eventos.append(('catalogo', 'recarregar', {}))
+    if livros:
+        for livro in sessao.execute(
+            db.select(Livro.id, Livro.disponivel, Livro.reservado, Livro.exemplares_disponiveis)
+            .where(Livro.id.in_(sorted(livros)))
+        ):
+            if not catalogo:
+                eventos.append(('catalogo', 'livro', dict(livro._mapping)))
+            historico.append(linha_de_historico(
+                'livro', momento, livro_id=livro.id, status='disponivel' if livro.disponivel else 'indisponivel',
+                dados={'reservado': livro.reservado, 'exemplares_disponiveis': livro.exemplares_disponiveis},
+            ))
+    if reservas:
+        for reserva in sessao.execute(
+            db.select(Reserva.id, Reserva.status, Reserva.livro_id, Livro.titulo, Usuario.nome.label('usuario'),
+                      Reserva.usuario_id, Reserva.exemplar_id)
+            .join(Livro, Livro.id == Reserva.livro_id)
+            .join(Usuario, Usuario.id == Reserva.usuario_id)
+            .where(Reserva.id.in_(sorted(reservas)))
+        ):
+            dados = dict(reserva._mapping)
+            usuario_id, exemplar_id = dados.pop('usuario_id'), dados.pop('exemplar_id')
+            eventos.append(('solicitacoes', 'reserva', dados))
+            historico.append(linha_de_historico(
+                'reserva', momento, reserva_id=reserva.id, livro_id=reserva.livro_id, usuario_id=usuario_id,
+                status=reserva.status, dados={'exemplar_id': exemplar_id},
+            ))
+    if eventos:
+        sessao.info.setdefault('eventos', []).extend(eventos)
+    if historico:
+        anotar_historico(sessao, historico)
+
+@event.listens_for(Session, 'after_commit')
+def publicar_eventos(sessao):
+    eventos = sessao.info.pop('eventos', None)
+    if eventos and has_app_context() and 'eventos' in current_app.extensions:
+        barramento = current_app.extensions['eventos']
+        for canal, tipo, dados in eventos:
+            barramento.publicar(canal, tipo, dados)
+    historico = sessao.info.pop('historico', None)
+    if historico and has_app_context() and 'historico' in current_app.extensions:
+        current_app.extensions['historico'].registrar(historico)
+
+@event.listens_for(Session, 'after_rollback')
+def descartar_eventos(sessao):
+    for chave in ('livros_anunciados', 'reservas_anunciadas', 'catalogo_anunciado', 'eventos', 'historico'):
+        sessao.info.pop(chave, None)
+
+############################################################################################################################
+
+# SERVIÇOS DE RESERVA
+
+class ReservaIndisponivel(Exception):
+    """A reserva não pôde ser feita ou alterada (livro ocupado, pedido duplicado ou já processado)."""
+
+def devolver_ao_contador(sessao, livros):
+    """Soma exemplares liberados ao contador de cada título (`livros`: Counter livro_id -> quantidade)."""
+    if not livros:
+        return
+    tabela = Livro.__table__
+    sessao.execute(
+        db.update(tabela)
+        .where(tabela.c.id == db.bindparam('b_livro_id'))
+        .values(exemplares_disponiveis=tabela.c.exemplares_disponiveis + db.bindparam('b_quantidade'),
+                reservado=False),
+        [{'b_livro_id': livro_id, 'b_quantidade': quantidade} for livro_id, quantidade in livros.items()],
+    )
+
+def separar_exemplar(sessao, livro_id, tentativas=5):
+    """Marca um exemplar livre do título como reservado e devolve o id (ou None)."""
+    for _ in range(tentativas):
+        exemplar_id = sessao.scalar(
+            db.select(Exemplar.id)
+            .where(Exemplar.livro_id == livro_id, Exemplar.disponivel == True, Exemplar.reservado == False)  # noqa: E712
+            .order_by(Exemplar.id)
+            .limit(1)
+        )
+        if exemplar_id is None:
+            return None
+        # Condicional: se outra transação pegou o mesmo exemplar, tenta o próximo
+        resultado = sessao.execute(
+            db.update(Exemplar)
+            .where(Exemplar.id == exemplar_id, Exemplar.reservado == False)  # noqa: E712
+            .values(reservado=True)
+            .execution_options(synchronize_session=False)
+        )
+        if resultado.rowcount == 1:
+            return exemplar_id
+    return None
+
+def reservar_livro(livro_id, usuario_id, sessao=None):
+    """Reserva um exemplar do livro de forma atômica.
+
+    Primeiro um UPDATE condicional desconta um exemplar do contador do título,
+    somente se o título estiver disponível e ainda tiver exemplares livres; depois
+    um exemplar específico é separado e a reserva é inserida, tudo na mesma
+    transação. Entre requisições (ou workers) concorrentes, o contador nunca fica
+    negativo e um exemplar nunca é separado duas vezes.
+    """
+    sessao = sessao or db.session
+    resultado = sessao.execute(
+        db.update(Livro)
+        .where(Livro.id == livro_id, Livro.disponivel == True, Livro.exemplares_disponiveis > 0)  # noqa: E712
+        .values(exemplares_disponiveis=Livro.exemplares_disponiveis - 1,
+                reservado=Livro.exemplares_disponiveis <= 1)
+        .execution_options(synchronize_session=False)
+    )
+    if resultado.rowcount != 1:
+        sessao.rollback()
+        raise ReservaIndisponivel('O livro não está disponível para reserva.')
+
+    exemplar_id = separar_exemplar(sessao, livro_id)
+    if exemplar_id is None:
+        sessao.rollback()
+        raise ReservaIndisponivel('O livro não está disponível para reserva.')
+
+    # Quem conseguiu o exemplar direto deixa a fila desse título (antes do add: o
+    # DELETE faria o autoflush da reserva fora do try abaixo)
+    sessao.execute(db.delete(FilaEspera).where(FilaEspera.livro_id == livro_id, FilaEspera.usuario_id == usuario_id))
+    reserva = Reserva(livro_id=livro_id, usuario_id=usuario_id, exemplar_id=exemplar_id)
+    sessao.add(reserva)
+    try:
+        sessao.flush()
+        anunciar_livros(sessao, [livro_id])
+        anunciar_reservas(sessao, [reserva.id])
+        sessao.commit()
+    except IntegrityError:
+        sessao.rollback()
+        raise ReservaIndisponivel('Você já possui uma solicitação pendente para este livro.')
+    return reserva
+
+def prioridade_na_fila(tipo_usuario):
+    return current_app.config['FILA_PRIORIDADES'].get(tipo_usuario, current_app.config['FILA_PRIORIDADE_PADRAO'])
+
+def posicao_na_fila(livro_id, usuario_id, sessao=None):
+    """Posição (1 = próximo) do usuário na fila do título, ou None se não estiver nela."""
+    sessao = sessao or db.session
+    lugar = sessao.execute(
+        db.select(FilaEspera.id, FilaEspera.prioridade)
+        .where(FilaEspera.livro_id == livro_id, FilaEspera.usuario_id == usuario_id)
+    ).first()
+    if lugar is None:
+        return None
+    # Conta quem está à frente: intervalo do índice (livro_id, prioridade, id)
+    return 1 + sessao.scalar(
+        db.select(db.func.count()).select_from(FilaEspera).where(
+            FilaEspera.livro_id == livro_id,
+            db.or_(FilaEspera.prioridade < lugar.prioridade,
+                   db.and_(FilaEspera.prioridade == lugar.prioridade, FilaEspera.id < lugar.id)),
+        )
+    )
+
+def entrar_na_fila(livro_id, usuario_id, sessao=None):
+    """Coloca o usuário na fila do título e devolve a posição.
+
+    Se um exemplar foi liberado entre a reserva recusada e a entrada na fila, a
+    fila é atendida na mesma transação; nesse caso devolve None (o usuário já
+    recebeu a reserva).
+    """
+    sessao = sessao or db.session
+    tipo_usuario = sessao.scalar(db.select(Usuario.tipo_usuario).where(Usuario.id == usuario_id))
+    sessao.add(FilaEspera(livro_id=livro_id, usuario_id=usuario_id, prioridade=prioridade_na_fila(tipo_usuario)))
+    try:
+        sessao.flush()
+    except IntegrityError:
+        sessao.rollback()  # Já estava na fila
+        return posicao_na_fila(livro_id, usuario_id, sessao)
+    atender_fila(sessao, [livro_id])
+    sessao.commit()
+    return posicao_na_fila(livro_id, usuario_id, sessao)
+
+def sair_da_fila(livro_id, usuario_id, sessao=None):
+    sessao = sessao or db.session
+    resultado = sessao.execute(
+        db.delete(FilaEspera).where(FilaEspera.livro_id == livro_id, FilaEspera.usuario_id == usuario_id)
+    )
+    sessao.commit()
+    return resultado.rowcount == 1
+
+def atender_fila(sessao, livro_ids):
+    """Transforma exemplares livres em reservas para os primeiros da fila de cada título.
+
+    Roda dentro da transação de quem liberou exemplares (recusa, devolução, novos
+    exemplares), antes do commit: o exemplar vai direto para o próximo da fila e
+    nunca fica livre para quem só atualiza a página. Cada passo é um UPDATE/DELETE
+    condicional, então dois processos não entregam o mesmo exemplar nem atendem o
+    mesmo lugar da fila. Devolve a quantidade de reservas criadas.
+    """
+    promovidos = 0
+    for livro_id in livro_ids:
+        while True:
+            # Próximo da fila que ainda não tem reserva pendente do título
+            proximo = sessao.execute(
+                db.select(FilaEspera.id, FilaEspera.usuario_id)
+                .where(FilaEspera.livro_id == livro_id,
+                       ~db.exists().where(Reserva.livro_id == livro_id,
+                                          Reserva.usuario_id == FilaEspera.usuario_id,
+                                          Reserva.status == 'pendente'))
+                .order_by(FilaEspera.prioridade, FilaEspera.id)
+                .limit(1)
+            ).first()
+            if proximo is None:
+                break
+            resultado = sessao.execute(
+                db.update(Livro)
+                .where(Livro.id == livro_id, Livro.disponivel == True, Livro.exemplares_disponiveis > 0)  # noqa: E712
+                .values(exemplares_disponiveis=Livro.exemplares_disponiveis - 1,
+                        reservado=Livro.exemplares_disponiveis <= 1)
+                .execution_options(synchronize_session=False)
+            )
+            if resultado.rowcount != 1:
+                break  # Nenhum exemplar livre: a fila espera a próxima devolução
+            # O exemplar é separado antes de tirar o usuário da fila: sem exemplar ele mantém o lugar
+            exemplar_id = separar_exemplar(sessao, livro_id)
+            if exemplar_id is None:
+                devolver_ao_contador(sessao, Counter({livro_id: 1}))
+                break  # Contador sem exemplar correspondente; não insiste
+            if sessao.execute(db.delete(FilaEspera).where(FilaEspera.id == proximo.id)).rowcount != 1:
+                # Outro processo atendeu este lugar: o exemplar volta a ficar livre e tenta o seguinte
+                sessao.execute(
+                    db.update(Exemplar)
+                    .where(Exemplar.id == exemplar_id)
+                    .values(reservado=False)
+                    .execution_options(synchronize_session=False)
+                )
+                devolver_ao_contador(sessao, Counter({livro_id: 1}))
+                continue
+            reserva = Reserva(livro_id=livro_id, usuario_id=proximo.usuario_id, exemplar_id=exemplar_id)
+            sessao.add(reserva)
+            sessao.flush()
+            notificar_reservas(sessao, [reserva.id], 'promover')
+            anunciar_livros(sessao, [livro_id])
+            anunciar_reservas(sessao, [reserva.id])
+            promovidos += 1
+    return promovidos
+
+# acao -> (status de origem, novo status)
+TRANSICOES_DE_RESERVA = {
+    'aceitar': ('pendente', 'aceito'),
+    'recusar': ('pendente', 'recusado'),
+    'devolver': ('aceito', 'devolvido'),
+    'expirar': ('pendente', 'expirado'),
+}
+
+# Texto do e-mail enviado ao usuário em cada ação
+MENSAGENS_DE_RESERVA = {
+    'aceitar': ('Reserva aceita', 'Sua reserva de "{titulo}" foi aceita. Retire o exemplar na biblioteca.'),
+    'recusar': ('Reserva recusada', 'Sua reserva de "{titulo}" foi recusada.'),
+    'devolver': ('Devolução registrada', 'Recebemos a devolução de "{titulo}". Obrigado!'),
+    'expirar': ('Reserva expirada', 'Sua reserva de "{titulo}" expirou e o exemplar foi liberado.'),
+    'promover': ('Exemplar separado', 'Um exemplar de "{titulo}" foi separado para você na fila de espera.'),
+    'lembrete': ('Devolução atrasada', 'O prazo de devolução de "{titulo}" terminou. Devolva o exemplar na biblioteca.'),
+}
+
+def notificar_reservas(sessao, reserva_ids, mensagem):
+    """Agenda um e-mail por reserva, na mesma transação da alteração (enviado pela thread de tarefas)."""
+    if not reserva_ids:
+        return
+    assunto, texto = MENSAGENS_DE_RESERVA[mensagem]
+    destinos = sessao.execute(
+        db.select(Usuario.email, Livro.titulo)
+        .select_from(Reserva)
+        .join(Usuario, Usuario.id == Reserva.usuario_id)
+        .join(Livro, Livro.id == Reserva.livro_id)
+        .where(Reserva.id.in_(reserva_ids))
+    ).all()
+    current_app.extensions['tarefas'].agendar_varias('email', [
+        {'para': email, 'assunto': assunto, 'texto': texto.format(titulo=titulo)} for email, titulo in destinos
+    ], sessao=sessao)
+
+def decidir_reserva(reserva_id, acao, sessao=None):
+    """Aceita, recusa ou registra a devolução de uma reserva.
+
+    A troca de status só acontece se a reserva ainda estiver no status esperado
+    (UPDATE condicional), então dois bibliotecários não processam a mesma
+    solicitação. Aceitar empresta o exemplar separado; recusar ou devolver
+    libera o exemplar e o devolve ao contador do título.
+    """
+    processadas = decidir_reservas([reserva_id], acao, sessao)
+    if not processadas:
+        raise ReservaIndisponivel('Essa solicitação já foi processada.')
+    return processadas[0][1]
+
+def decidir_reservas(reserva_ids, acao, sessao=None):
+    """Aplica a mesma ação a várias reservas numa única transação.
+
+    Usa um UPDATE para as reservas, um para os exemplares e um (executemany)
+    para os contadores dos títulos, qualquer que seja a quantidade. Reservas que
+    não estão mais no status de origem são ignoradas. Devolve a lista de
+    (reserva_id, novo_status) efetivamente alteradas.
+    """
+    sessao = sessao or db.session
+    if acao not in TRANSICOES_DE_RESERVA:
+        raise ValueError(f'Ação inválida: {acao}')
+    origem, novo_status = TRANSICOES_DE_RESERVA[acao]
+
+    alvos = sessao.execute(
+        db.select(Reserva.id, Reserva.livro_id, Reserva.exemplar_id)
+        .where(Reserva.id.in_(reserva_ids), Reserva.status == origem)
+    ).all()
+    if not alvos:
+        sessao.rollback()
+        return []
+
+    resultado = sessao.execute(
+        db.update(Reserva)
+        .where(Reserva.id.in_([r.id for r in alvos]), Reserva.status == origem)
+        .values(status=novo_status, data_decisao=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    if resultado.rowcount != len(alvos):
+        # Outra requisição processou parte delas entre o SELECT e o UPDATE
+        sessao.rollback()
+        raise ReservaIndisponivel('Algumas solicitações já foram processadas. Tente novamente.')
+
+    exemplares = sorted({r.exemplar_id for r in alvos if r.exemplar_id is not None})
+    if exemplares:
+        if acao == 'aceitar':
+            valores = {'disponivel': False, 'reservado': False}  # O exemplar sai emprestado
+        else:
+            valores = {'disponivel': True, 'reservado': False}  # O exemplar volta para a estante
+        # Só muda o exemplar que está de fato com a reserva: separado (pendente) ou
+        # emprestado (aceita). O contador sobe pelas linhas alteradas, nunca por reserva.
+        com_a_reserva = Exemplar.reservado == True if origem == 'pendente' else Exemplar.disponivel == False  # noqa: E712
+        alterados = sessao.scalars(
+            db.update(Exemplar).where(Exemplar.id.in_(exemplares), com_a_reserva).values(**valores)
+            .returning(Exemplar.livro_id)
+            .execution_options(synchronize_session=False)
+        ).all()
+        liberados = Counter(alterados)
+        if acao != 'aceitar' and liberados:
+            devolver_ao_contador(sessao, liberados)
+            anunciar_livros(sessao, liberados)
+            atender_fila(sessao, sorted(liberados))
+    notificar_reservas(sessao, [r.id for r in alvos], acao)
+    anunciar_reservas(sessao, [r.id for r in alvos])
+    sessao.commit()
+    return [(r.id, novo_status) for r in alvos]
+
+def adicionar_exemplares(livro_id, quantidade, sessao=None):
+    """Cadastra exemplares de um título e soma ao contador na mesma transação."""
+    sessao = sessao or db.session
+    agora = datetime.utcnow()
+    sessao.execute(
+        db.insert(Exemplar.__table__),
+        [{'livro_id': livro_id, 'data_inclusao': agora, 'disponivel': True, 'reservado': False}] * quantidade,
+    )
+    devolver_ao_contador(sessao, Counter({livro_id: quantidade}))
+    anunciar_livros(sessao, [livro_id])
+    atender_fila(sessao, [livro_id])
+    sessao.commit()
+
+def alterar_disponibilidade(disponivel, livro_ids=None, assunto=None, sessao=None):
+    """Marca livros como disponíveis/indisponíveis com um único UPDATE.
+
+    Seleciona os ids marcados e/ou todos do assunto (os critérios informados são
+    alternativas, como um OU); sem nenhum critério nada é alterado.
+    Devolve a quantidade de livros afetados.
+    """
+    sessao = sessao or db.session
+    criterios = []
+    if livro_ids:
+        criterios.append(Livro.id.in_(livro_ids))
+    if assunto:
+        criterios.append(Livro.assunto == assunto)
+    if not criterios:
+        return 0
+    selecao = db.or_(*criterios)
+    resultado = sessao.execute(
+        db.update(Livro).where(selecao).values(disponivel=disponivel)
+        .execution_options(synchronize_session=False)
+    )
+    if assunto:
+        anunciar_catalogo(sessao)
+        # Os títulos do assunto não são listados um a um: uma linha registra a alteração em lote
+        anotar_historico(sessao, [linha_de_historico(
+            'assunto', datetime.utcnow(), status='disponivel' if disponivel else 'indisponivel',
+            dados={'assunto': assunto, 'livro_ids': livro_ids or None, 'livros': resultado.rowcount},
+        )])
+    else:
+        anunciar_livros(sessao, livro_ids)
+    if disponivel:
+        # Títulos que voltaram com exemplares livres atendem quem estava na fila
+        atender_fila(sessao, sessao.scalars(
+            db.select(FilaEspera.livro_id).distinct()
+            .join(Livro, Livro.id == FilaEspera.livro_id)
+            .where(selecao, Livro.exemplares_disponiveis > 0)
+            .order_by(FilaEspera.livro_id)
+        ).all())
+    sessao.commit()
+    return resultado.rowcount
+
+def alterar_bloqueio(bloqueado, usuario_ids=None, curso=None, tipo_usuario=None, sessao=None):
+    """Bloqueia/desbloqueia usuários com um único UPDATE.
+
+    Seleciona os ids marcados e/ou todos do curso (alunos) e/ou todos do tipo de
+    usuário (os critérios informados são alternativas, como um OU); sem nenhum
+    critério nada é alterado. Devolve a quantidade de usuários afetados.
+    """
+    sessao = sessao or db.session
+    criterios = []
+    if usuario_ids:
+        criterios.append(Usuario.id.in_(usuario_ids))
+    if curso:
+        criterios.append(Usuario.id.in_(db.select(Aluno.__table__.c.id).where(Aluno.curso == curso)))
+    if tipo_usuario:
+        criterios.append(Usuario.tipo_usuario == tipo_usuario)
+    if not criterios:
+        return 0
+    resultado = sessao.execute(
+        db.update(Usuario).where(db.or_(*criterios)).values(status=bloqueado)
+        .execution_options(synchronize_session=False)
+    )
+    sessao.commit()
+    return resultado.rowcount
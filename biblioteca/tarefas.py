@@ -0,0 +1,192 @@
+"""Tarefas em segundo plano, guardadas numa tabela do próprio banco.
+
+Cada tarefa é uma linha (tipo, dados em JSON, quando executar). Uma thread do
+processo busca as tarefas vencidas, marca-as com um UPDATE condicional (vários
+workers podem rodar juntos sem executar a mesma tarefa duas vezes), chama a
+função registrada para o tipo e, se ela falhar, reagenda com espera exponencial
+até o limite de tentativas. Tarefas periódicas são reagendadas pela própria
+thread; agendar dentro da transação de quem pede garante que a tarefa só existe
+se a alteração que a originou foi gravada.
+
+As funções de cada tipo são registradas uma vez no módulo (@tarefa, ver
+rotinas.py); cada app tem o seu executor, criado por create_app e guardado em
+app.extensions['tarefas'].
+"""
+from datetime import datetime, timedelta
+import json
+import logging
+import threading
+import uuid
+
+from sqlalchemy import and_, insert, or_, select, update
+
+logger = logging.getLogger('biblioteca.tarefas')
+
+# tipo -> (função, recebe lote): comum a todos os apps do processo
+FUNCOES = {}
+
+
+def tarefa(tipo, lote=False):
+    """Registra a função de um tipo; com lote=True ela recebe a lista de dados de várias tarefas."""
+    def registrar(funcao):
+        FUNCOES[tipo] = (funcao, lote)
+        return funcao
+    return registrar
+
+
+class ExecutorDeTarefas:
+    """Fila de tarefas de um app; lê as opções TAREFAS_* da configuração."""
+
+    def __init__(self, app, db, modelo, tempo_limite=600):
+        self.app = app
+        self.db = db
+        self.modelo = modelo
+        self.intervalo = app.config.get('TAREFAS_INTERVALO', 5)
+        self.lote = app.config.get('TAREFAS_LOTE', 50)
+        self.max_tentativas = app.config.get('TAREFAS_MAX_TENTATIVAS', 5)
+        self.espera_base = app.config.get('TAREFAS_ESPERA_BASE', 30)
+        self.tempo_limite = tempo_limite  # Tarefa 'executando' há mais tempo que isso volta para a fila
+        self._funcoes = FUNCOES
+        self._periodicas = {}
+        self._parar = threading.Event()
+        self._thread = None
+        self._trava = threading.Lock()
+
+    # Registro #
+
+    def periodica(self, tipo, intervalo):
+        """Executa o tipo a cada `intervalo` segundos (a função é registrada com `tarefa`)."""
+        self._periodicas[tipo] = intervalo
+
+    # Agendamento #
+
+    def agendar(self, tipo, dados=None, em=None, sessao=None):
+        """Inclui a tarefa na transação da sessão (quem chama faz o commit)."""
+        self.agendar_varias(tipo, [dados], em, sessao)
+
+    def agendar_varias(self, tipo, lista_de_dados, em=None, sessao=None):
+        if not lista_de_dados:
+            return
+        sessao = sessao or self.db.session
+        agora = datetime.utcnow()
+        sessao.execute(insert(self.modelo.__table__), [
+            {'tipo': tipo, 'dados': json.dumps(dados, ensure_ascii=False), 'status': 'pendente', 'tentativas': 0,
+             'executar_em': em or agora, 'data_inclusao': agora}
+            for dados in lista_de_dados
+        ])
+
+    def _agendar_periodicas(self, sessao):
+        if not self._periodicas:
+            return
+        m = self.modelo
+        agendadas = set(sessao.scalars(
+            select(m.tipo).where(m.tipo.in_(list(self._periodicas)), m.status.in_(['pendente', 'executando']))
+        ))
+        agora = datetime.utcnow()
+        for tipo, intervalo in self._periodicas.items():
+            if tipo not in agendadas:
+                self.agendar(tipo, em=agora + timedelta(seconds=intervalo), sessao=sessao)
+        sessao.commit()
+
+    # Execução #
+
+    def executar_pendentes(self):
+        """Executa uma rodada: reserva até `lote` tarefas vencidas e roda cada uma. Devolve quantas rodou."""
+        m = self.modelo
+        with self.app.app_context():
+            sessao = self.db.session
+            self._agendar_periodicas(sessao)
+
+            agora = datetime.utcnow()
+            vencidas = or_(
+                and_(m.status == 'pendente', m.executar_em <= agora),
+                and_(m.status == 'executando', m.atualizada_em < agora - timedelta(seconds=self.tempo_limite)),
+            )
+            ids = sessao.scalars(select(m.id).where(vencidas).order_by(m.executar_em, m.id).limit(self.lote)).all()
+            if not ids:
+                return 0
+            # A marca `dono` diz quais dessas linhas este worker conseguiu pegar
+            dono = uuid.uuid4().hex
+            sessao.execute(
+                update(m).where(m.id.in_(ids), vencidas)
+                .values(status='executando', dono=dono, tentativas=m.tentativas + 1, atualizada_em=agora)
+                .execution_options(synchronize_session=False)
+            )
+            sessao.commit()
+            tarefas = sessao.execute(
+                select(m.id, m.tipo, m.dados, m.tentativas).where(m.dono == dono, m.status == 'executando')
+                .order_by(m.id)
+            ).all()
+
+            por_tipo = {}
+            for tarefa in tarefas:
+                por_tipo.setdefault(tarefa.tipo, []).append(tarefa)
+            for tipo, grupo in por_tipo.items():
+                funcao, em_lote = self._funcoes.get(tipo, (None, False))
+                if funcao is None:
+                    self._concluir(sessao, grupo, erro=f'Tipo de tarefa desconhecido: {tipo}', definitivo=True)
+                elif em_lote:
+                    self._rodar(sessao, grupo, funcao, [json.loads(t.dados) for t in grupo])
+                else:
+                    for tarefa in grupo:
+                        dados = json.loads(tarefa.dados)
+                        self._rodar(sessao, [tarefa], funcao, *([] if dados is None else [dados]))
+            return len(tarefas)
+
+    def _rodar(self, sessao, grupo, funcao, *argumentos):
+        try:
+            funcao(*argumentos)
+        except Exception as erro:
+            sessao.rollback()
+            logger.exception('Tarefa %s falhou (ids %s)', grupo[0].tipo, [t.id for t in grupo])
+            self._concluir(sessao, grupo, erro=repr(erro))
+        else:
+            self._concluir(sessao, grupo)
+
+    def _concluir(self, sessao, grupo, erro=None, definitivo=False):
+        m = self.modelo
+        agora = datetime.utcnow()
+        if erro is None:
+            sessao.execute(
+                update(m).where(m.id.in_([t.id for t in grupo]))
+                .values(status='concluida', dono=None, erro=None, atualizada_em=agora)
+                .execution_options(synchronize_session=False)
+            )
+        else:
+            for tarefa in grupo:
+                esgotada = definitivo or tarefa.tentativas >= self.max_tentativas
+                sessao.execute(
+                    update(m).where(m.id == tarefa.id)
+                    .values(status='falhou' if esgotada else 'pendente', dono=None, erro=erro, atualizada_em=agora,
+                            executar_em=agora + timedelta(seconds=self.espera_base * 2 ** (tarefa.tentativas - 1)))
+                    .execution_options(synchronize_session=False)
+                )
+        sessao.commit()
+
+    # Thread #
+
+    def iniciar(self):
+        """Inicia a thread do processo (só na primeira chamada)."""
+        with self._trava:
+            if self._thread is not None:
+                return
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._laco, name='tarefas', daemon=True)
+            self._thread.start()
+
+    def parar(self, espera=None):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(espera)
+            self._thread = None
+
+    def _laco(self):
+        while not self._parar.is_set():
+            try:
+                executadas = self.executar_pendentes()
+            except Exception:
+                logger.exception('Erro ao buscar tarefas')
+                executadas = 0
+            # Com o lote cheio provavelmente há mais tarefas esperando
+            if executadas < self.lote:
+                self._parar.wait(self.intervalo)
@@ -1,9 +1,10 @@
- import logging
+import logging
 from logging.config import fileConfig
 
 from flask import current_app
 
 from alembic import context
+import sqlalchemy as sa
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -51,6 +52,28 @@ def get_metadata():
     return target_db.metadata
 
 
+def include_object(object, name, type_, reflected, compare_to):
+    # livro_fts* são a tabela virtual FTS5 da busca e as tabelas internas dela, criadas
+    # pela migração 3a1c5e7b9d20 e fora do metadata: o autogenerate não pode apagá-las
+    if type_ == 'table' and name.startswith('livro_fts'):
+        return False
+    # No SQLite a FK de reserva.exemplar_id não é criada (b1d7e3f5a9c2): incluí-la
+    # geraria um batch que recria reserva e perde o índice parcial uq_reserva_pendente
+    if (type_ == 'foreign_key_constraint' and not reflected and compare_to is None
+            and object.parent.name == 'reserva' and object.column_keys == ['exemplar_id']
+            and context.get_context().dialect.name == 'sqlite'):
+        return False
+    return True
+
+
+def compare_type(context, inspected_column, metadata_column, inspected_type, metadata_type):
+    # INTEGER e BIGINT são o mesmo inteiro de 64 bits no SQLite (livro.isbn)
+    if context.dialect.name == 'sqlite' and isinstance(inspected_type, sa.Integer) \
+            and isinstance(metadata_type, sa.Integer):
+        return False
+    return None
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -65,7 +88,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=get_metadata(), literal_binds=True
+        url=url, target_metadata=get_metadata(), literal_binds=True,
+        include_object=include_object, compare_type=compare_type
     )
 
     with context.begin_transaction():
@@ -93,6 +117,11 @@ def run_migrations_online():
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    conf_args.setdefault("include_object", include_object)
+    # Flask-Migrate passa compare_type=True; a função acima compara do mesmo jeito,
+    # menos INTEGER/BIGINT no SQLite
+    if not callable(conf_args.get("compare_type")):
+        conf_args["compare_type"] = compare_type
 
     connectable = get_engine()
 
@@ -0,0 +1,61 @@
+"""Indice de busca FTS5 do livro
+
+Revision ID: 3a1c5e7b9d20
+Revises: d82e1ba6dd3b
+Create Date: 2026-10-18 10:12:41.502113
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3a1c5e7b9d20'
+down_revision = 'd82e1ba6dd3b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # FTS5 existe apenas no SQLite; nos outros bancos a busca usa ILIKE
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS livro_fts USING fts5(
+            titulo, autor, assunto, editora, isbn,
+            content='livro', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+    """)
+    op.execute("""
+        CREATE TRIGGER IF NOT EXISTS livro_fts_ai AFTER INSERT ON livro BEGIN
+            INSERT INTO livro_fts(rowid, titulo, autor, assunto, editora, isbn)
+            VALUES (new.id, new.titulo, new.autor, new.assunto, new.editora, new.isbn);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER IF NOT EXISTS livro_fts_ad AFTER DELETE ON livro BEGIN
+            INSERT INTO livro_fts(livro_fts, rowid, titulo, autor, assunto, editora, isbn)
+            VALUES ('delete', old.id, old.titulo, old.autor, old.assunto, old.editora, old.isbn);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER IF NOT EXISTS livro_fts_au AFTER UPDATE OF titulo, autor, assunto, editora, isbn ON livro BEGIN
+            INSERT INTO livro_fts(livro_fts, rowid, titulo, autor, assunto, editora, isbn)
+            VALUES ('delete', old.id, old.titulo, old.autor, old.assunto, old.editora, old.isbn);
+            INSERT INTO livro_fts(rowid, titulo, autor, assunto, editora, isbn)
+            VALUES (new.id, new.titulo, new.autor, new.assunto, new.editora, new.isbn);
+        END
+    """)
+    # Indexa os livros já cadastrados
+    op.execute("INSERT INTO livro_fts(livro_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute("DROP TRIGGER IF EXISTS livro_fts_au")
+    op.execute("DROP TRIGGER IF EXISTS livro_fts_ad")
+    op.execute("DROP TRIGGER IF EXISTS livro_fts_ai")
+    op.execute("DROP TABLE IF EXISTS livro_fts")
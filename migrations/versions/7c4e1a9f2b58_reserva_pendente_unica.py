@@ -0,0 +1,31 @@
+"""Reserva pendente unica por usuario e livro
+
+Revision ID: 7c4e1a9f2b58
+Revises: 5b2d8f4a6c31
+Create Date: 2026-10-18 11:48:05.630927
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c4e1a9f2b58'
+down_revision = '5b2d8f4a6c31'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Livros que ficaram sem valor antes das colunas existirem
+    op.execute("UPDATE livro SET reservado = false WHERE reservado IS NULL")
+
+    with op.batch_alter_table('reserva', schema=None) as batch_op:
+        batch_op.create_index('uq_reserva_pendente', ['usuario_id', 'livro_id'], unique=True,
+                              sqlite_where=sa.text("status = 'pendente'"),
+                              postgresql_where=sa.text("status = 'pendente'"))
+
+
+def downgrade():
+    with op.batch_alter_table('reserva', schema=None) as batch_op:
+        batch_op.drop_index('uq_reserva_pendente')
@@ -0,0 +1,39 @@
+"""ISBN como BigInteger
+
+Revision ID: 9e6f3b2c7a14
+Revises: 7c4e1a9f2b58
+Create Date: 2026-10-18 12:31:52.114306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e6f3b2c7a14'
+down_revision = '7c4e1a9f2b58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # No SQLite INTEGER já tem 64 bits; recriar a tabela (batch) apagaria os gatilhos de busca
+    if op.get_bind().dialect.name == 'sqlite':
+        return
+
+    with op.batch_alter_table('livro', schema=None) as batch_op:
+        batch_op.alter_column('isbn',
+               existing_type=sa.Integer(),
+               type_=sa.BigInteger(),
+               existing_nullable=False)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        return
+
+    with op.batch_alter_table('livro', schema=None) as batch_op:
+        batch_op.alter_column('isbn',
+               existing_type=sa.BigInteger(),
+               type_=sa.Integer(),
+               existing_nullable=False)
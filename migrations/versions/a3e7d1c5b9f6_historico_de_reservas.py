@@ -0,0 +1,40 @@
+"""Historico de reservas e disponibilidade
+
+Revision ID: a3e7d1c5b9f6
+Revises: f2a6c9d1e8b4
+Create Date: 2026-10-18 19:12:44.207315
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3e7d1c5b9f6'
+down_revision = 'f2a6c9d1e8b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('historico_reserva',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('momento', sa.DateTime(), nullable=False),
+    sa.Column('tipo', sa.String(length=20), nullable=False),
+    sa.Column('reserva_id', sa.Integer(), nullable=True),
+    sa.Column('livro_id', sa.Integer(), nullable=True),
+    sa.Column('usuario_id', sa.Integer(), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=True),
+    sa.Column('dados', sa.Text(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_historico_reserva_momento', 'historico_reserva', ['momento'], unique=False)
+    op.create_index('ix_historico_reserva_reserva', 'historico_reserva', ['reserva_id', 'id'], unique=False)
+    op.create_index('ix_historico_reserva_livro', 'historico_reserva', ['livro_id', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_historico_reserva_livro', table_name='historico_reserva')
+    op.drop_index('ix_historico_reserva_reserva', table_name='historico_reserva')
+    op.drop_index('ix_historico_reserva_momento', table_name='historico_reserva')
+    op.drop_table('historico_reserva')
@@ -0,0 +1,94 @@
+"""Exemplares fisicos e contador de exemplares disponiveis
+
+Revision ID: b1d7e3f5a9c2
+Revises: 9e6f3b2c7a14
+Create Date: 2026-10-18 13:20:41.508213
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b1d7e3f5a9c2'
+down_revision = '9e6f3b2c7a14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Versões antigas do app.py rodavam db.create_all() ao iniciar: num banco usado por
+    # elas a tabela nova pode já existir (hoje o app não cria tabelas; veja flask init-db)
+    if not sa.inspect(op.get_bind()).has_table('exemplar'):
+        criar_tabela_exemplar()
+
+    # add_column direto (sem batch): recriar livro/reserva no SQLite apagaria os
+    # gatilhos de busca e o índice parcial uq_reserva_pendente
+    op.add_column('livro', sa.Column('exemplares_disponiveis', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('reserva', sa.Column('exemplar_id', sa.Integer(), nullable=True))
+    if op.get_bind().dialect.name != 'sqlite':
+        op.create_foreign_key('fk_reserva_exemplar_id', 'reserva', 'exemplar', ['exemplar_id'], ['id'])
+
+    # Um exemplar para cada título existente. No modelo antigo cada título era um
+    # único livro, e aceitar uma reserva o deixava indisponível: o exemplar passa a
+    # constar como emprestado. Sem empréstimo, mas com pedido pendente, fica separado.
+    op.execute("""
+        INSERT INTO exemplar (livro_id, data_inclusao, disponivel, reservado)
+        SELECT livro.id, livro.data_inclusao,
+               NOT EXISTS (SELECT 1 FROM reserva WHERE reserva.livro_id = livro.id AND reserva.status = 'aceito'),
+               NOT EXISTS (SELECT 1 FROM reserva WHERE reserva.livro_id = livro.id AND reserva.status = 'aceito')
+               AND EXISTS (SELECT 1 FROM reserva WHERE reserva.livro_id = livro.id AND reserva.status = 'pendente')
+        FROM livro
+    """)
+    op.execute("""
+        UPDATE livro SET disponivel = true
+        WHERE EXISTS (SELECT 1 FROM reserva WHERE reserva.livro_id = livro.id AND reserva.status = 'aceito')
+    """)
+    # O exemplar fica com uma única reserva por título: o empréstimo mais recente
+    # ou, sem empréstimo, o pedido pendente mais antigo
+    op.execute("""
+        UPDATE reserva SET exemplar_id = (SELECT min(exemplar.id) FROM exemplar WHERE exemplar.livro_id = reserva.livro_id)
+        WHERE reserva.id IN (
+            SELECT COALESCE(
+                (SELECT max(a.id) FROM reserva a WHERE a.livro_id = livro.id AND a.status = 'aceito'),
+                (SELECT min(p.id) FROM reserva p WHERE p.livro_id = livro.id AND p.status = 'pendente')
+            )
+            FROM livro
+        )
+    """)
+    # Os outros pedidos pendentes não têm exemplar que os atenda: expiram (quem
+    # pediu pode solicitar de novo). Empréstimos antigos sem exemplar continuam
+    # 'aceito' e, ao serem devolvidos, não alteram o contador.
+    op.execute("UPDATE reserva SET status = 'expirado' WHERE status = 'pendente' AND exemplar_id IS NULL")
+    op.execute("""
+        UPDATE livro SET exemplares_disponiveis = (
+            SELECT count(*) FROM exemplar
+            WHERE exemplar.livro_id = livro.id AND exemplar.disponivel = true AND exemplar.reservado = false
+        )
+    """)
+    op.execute("UPDATE livro SET reservado = (exemplares_disponiveis = 0)")
+
+def criar_tabela_exemplar():
+    op.create_table('exemplar',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('data_inclusao', sa.DateTime(), nullable=True),
+    sa.Column('disponivel', sa.Boolean(), nullable=True),
+    sa.Column('reservado', sa.Boolean(), nullable=True),
+    sa.Column('livro_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['livro_id'], ['livro.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('exemplar', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_exemplar_livro_id'), ['livro_id'], unique=False)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        op.drop_constraint('fk_reserva_exemplar_id', 'reserva', type_='foreignkey')
+    op.drop_column('reserva', 'exemplar_id')
+    op.drop_column('livro', 'exemplares_disponiveis')
+
+    with op.batch_alter_table('exemplar', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_exemplar_livro_id'))
+
+    op.drop_table('exemplar')
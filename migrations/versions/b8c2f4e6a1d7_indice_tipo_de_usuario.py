@@ -0,0 +1,24 @@
+"""Indice do tipo de usuario
+
+Revision ID: b8c2f4e6a1d7
+Revises: a3e7d1c5b9f6
+Create Date: 2026-10-18 20:05:31.774102
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8c2f4e6a1d7'
+down_revision = 'a3e7d1c5b9f6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_usuario_tipo_usuario_id', 'usuario', ['tipo_usuario', 'id'], unique=False)
+    op.execute('ANALYZE')
+
+
+def downgrade():
+    op.drop_index('ix_usuario_tipo_usuario_id', table_name='usuario')
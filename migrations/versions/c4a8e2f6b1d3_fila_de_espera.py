@@ -0,0 +1,44 @@
+"""Fila de espera por titulo
+
+Revision ID: c4a8e2f6b1d3
+Revises: b1d7e3f5a9c2
+Create Date: 2026-10-18 14:05:12.872604
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4a8e2f6b1d3'
+down_revision = 'b1d7e3f5a9c2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Versões antigas do app.py rodavam db.create_all() ao iniciar: num banco usado por
+    # elas a tabela nova pode já existir (hoje o app não cria tabelas; veja flask init-db)
+    if sa.inspect(op.get_bind()).has_table('fila_espera'):
+        return
+
+    op.create_table('fila_espera',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('livro_id', sa.Integer(), nullable=False),
+    sa.Column('usuario_id', sa.Integer(), nullable=False),
+    sa.Column('prioridade', sa.Integer(), nullable=False),
+    sa.Column('data_inclusao', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['livro_id'], ['livro.id'], ),
+    sa.ForeignKeyConstraint(['usuario_id'], ['usuario.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('usuario_id', 'livro_id', name='uq_fila_espera_usuario_livro')
+    )
+    with op.batch_alter_table('fila_espera', schema=None) as batch_op:
+        batch_op.create_index('ix_fila_espera_ordem', ['livro_id', 'prioridade', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('fila_espera', schema=None) as batch_op:
+        batch_op.drop_index('ix_fila_espera_ordem')
+
+    op.drop_table('fila_espera')
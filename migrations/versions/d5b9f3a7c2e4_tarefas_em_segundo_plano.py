@@ -0,0 +1,57 @@
+"""Tarefas em segundo plano e datas da reserva
+
+Revision ID: d5b9f3a7c2e4
+Revises: c4a8e2f6b1d3
+Create Date: 2026-10-18 14:52:37.190446
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5b9f3a7c2e4'
+down_revision = 'c4a8e2f6b1d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Versões antigas do app.py rodavam db.create_all() ao iniciar: num banco usado por
+    # elas a tabela nova pode já existir (hoje o app não cria tabelas; veja flask init-db)
+    if not sa.inspect(op.get_bind()).has_table('tarefa'):
+        op.create_table('tarefa',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tipo', sa.String(length=50), nullable=False),
+        sa.Column('dados', sa.Text(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('tentativas', sa.Integer(), nullable=False),
+        sa.Column('executar_em', sa.DateTime(), nullable=False),
+        sa.Column('dono', sa.String(length=32), nullable=True),
+        sa.Column('erro', sa.Text(), nullable=True),
+        sa.Column('data_inclusao', sa.DateTime(), nullable=True),
+        sa.Column('atualizada_em', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('tarefa', schema=None) as batch_op:
+            batch_op.create_index('ix_tarefa_fila', ['status', 'executar_em'], unique=False)
+
+    # add_column direto (sem batch) para o SQLite manter o índice parcial uq_reserva_pendente
+    op.add_column('reserva', sa.Column('data_inclusao', sa.DateTime(), nullable=True))
+    op.add_column('reserva', sa.Column('data_decisao', sa.DateTime(), nullable=True))
+    op.add_column('reserva', sa.Column('data_lembrete', sa.DateTime(), nullable=True))
+
+    # Reservas antigas não têm data: os prazos passam a contar a partir de agora
+    op.execute("UPDATE reserva SET data_inclusao = CURRENT_TIMESTAMP")
+    op.execute("UPDATE reserva SET data_decisao = CURRENT_TIMESTAMP WHERE status <> 'pendente'")
+
+
+def downgrade():
+    op.drop_column('reserva', 'data_lembrete')
+    op.drop_column('reserva', 'data_decisao')
+    op.drop_column('reserva', 'data_inclusao')
+
+    with op.batch_alter_table('tarefa', schema=None) as batch_op:
+        batch_op.drop_index('ix_tarefa_fila')
+
+    op.drop_table('tarefa')
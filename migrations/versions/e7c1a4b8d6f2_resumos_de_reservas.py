@@ -0,0 +1,61 @@
+"""Resumos de reservas para o painel de estatisticas
+
+Revision ID: e7c1a4b8d6f2
+Revises: d5b9f3a7c2e4
+Create Date: 2026-10-18 16:40:18.350927
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7c1a4b8d6f2'
+down_revision = 'd5b9f3a7c2e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('resumo_reserva_livro',
+    sa.Column('dia', sa.Date(), nullable=False),
+    sa.Column('livro_id', sa.Integer(), nullable=False),
+    sa.Column('solicitadas', sa.Integer(), nullable=False),
+    sa.Column('aceitas', sa.Integer(), nullable=False),
+    sa.Column('recusadas', sa.Integer(), nullable=False),
+    sa.Column('expiradas', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['livro_id'], ['livro.id'], ),
+    sa.PrimaryKeyConstraint('dia', 'livro_id')
+    )
+    op.create_table('resumo_reserva_curso',
+    sa.Column('dia', sa.Date(), nullable=False),
+    sa.Column('curso', sa.String(length=50), nullable=False),
+    sa.Column('solicitadas', sa.Integer(), nullable=False),
+    sa.Column('aceitas', sa.Integer(), nullable=False),
+    sa.Column('recusadas', sa.Integer(), nullable=False),
+    sa.Column('expiradas', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('dia', 'curso')
+    )
+    op.create_table('resumo_reserva_hora',
+    sa.Column('dia', sa.Date(), nullable=False),
+    sa.Column('hora', sa.Integer(), nullable=False),
+    sa.Column('solicitadas', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('dia', 'hora')
+    )
+    op.create_table('marca_de_atualizacao',
+    sa.Column('nome', sa.String(length=50), nullable=False),
+    sa.Column('atualizado_ate', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('nome')
+    )
+    # create_index direto (sem batch) para o SQLite manter o índice parcial uq_reserva_pendente
+    op.create_index('ix_reserva_data_inclusao', 'reserva', ['data_inclusao'], unique=False)
+    op.create_index('ix_reserva_data_decisao', 'reserva', ['data_decisao'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_reserva_data_decisao', table_name='reserva')
+    op.drop_index('ix_reserva_data_inclusao', table_name='reserva')
+    op.drop_table('marca_de_atualizacao')
+    op.drop_table('resumo_reserva_hora')
+    op.drop_table('resumo_reserva_curso')
+    op.drop_table('resumo_reserva_livro')
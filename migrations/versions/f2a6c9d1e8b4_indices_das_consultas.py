@@ -0,0 +1,37 @@
+"""Indices das consultas das rotas principais
+
+Revision ID: f2a6c9d1e8b4
+Revises: e7c1a4b8d6f2
+Create Date: 2026-10-18 17:25:03.618240
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a6c9d1e8b4'
+down_revision = 'e7c1a4b8d6f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # create_index direto (sem batch): recriar livro/reserva no SQLite apagaria os
+    # gatilhos de busca e o índice parcial uq_reserva_pendente
+    op.create_index('ix_livro_disponivel_id', 'livro', ['disponivel', 'id'], unique=False)
+    op.create_index('ix_livro_assunto', 'livro', ['assunto'], unique=False)
+    op.create_index('ix_reserva_livro_status', 'reserva', ['livro_id', 'status'], unique=False)
+    op.create_index('ix_reserva_usuario_livro_status', 'reserva', ['usuario_id', 'livro_id', 'status'], unique=False)
+    op.create_index('ix_aluno_matricula', 'aluno', ['matricula'], unique=False)
+    op.create_index('ix_aluno_curso', 'aluno', ['curso'], unique=False)
+    # Estatísticas atualizadas para o planejador escolher os índices novos
+    op.execute('ANALYZE')
+
+
+def downgrade():
+    op.drop_index('ix_aluno_curso', table_name='aluno')
+    op.drop_index('ix_aluno_matricula', table_name='aluno')
+    op.drop_index('ix_reserva_usuario_livro_status', table_name='reserva')
+    op.drop_index('ix_reserva_livro_status', table_name='reserva')
+    op.drop_index('ix_livro_assunto', table_name='livro')
+    op.drop_index('ix_livro_disponivel_id', table_name='livro')
@@ -0,0 +1,44 @@
+// Atualizações ao vivo (Server-Sent Events): a página se atualiza sem precisar recarregar.
+// tratadores: { tipoDoEvento: function (dados) { ... } }
+function assinarEventos(url, tratadores) {
+    if (!window.EventSource) {
+        return;  // Navegador sem suporte: a página continua funcionando, só não se atualiza sozinha
+    }
+    let espera = 30000;
+    let perdeuEventos = false;
+
+    function conectar() {
+        const fonte = new EventSource(url);
+        Object.keys(tratadores).forEach(function (tipo) {
+            fonte.addEventListener(tipo, function (evento) {
+                tratadores[tipo](JSON.parse(evento.data));
+            });
+        });
+        fonte.addEventListener('recarregar', avisarAtualizacao);
+        fonte.onopen = function () {
+            espera = 30000;
+            if (perdeuEventos) {
+                avisarAtualizacao();  // Ficou desconectado: alguma alteração pode ter passado
+                perdeuEventos = false;
+            }
+        };
+        fonte.onerror = function () {
+            // Quedas de rede o navegador reconecta sozinho (com Last-Event-ID);
+            // depois de uma resposta de erro (401, 503...) a conexão é fechada
+            if (fonte.readyState === EventSource.CLOSED) {
+                perdeuEventos = true;
+                setTimeout(conectar, espera);
+                espera = Math.min(espera * 2, 300000);
+            }
+        };
+    }
+    conectar();
+}
+
+// Mostra o aviso para recarregar quando não dá para aplicar a alteração na página
+function avisarAtualizacao() {
+    const aviso = document.getElementById('aviso-atualizacao');
+    if (aviso) {
+        aviso.hidden = false;
+    }
+}